@@ -0,0 +1,7 @@
+from django.contrib import admin
+from .models import HourlySales, DailySales, DailyMenuItemSales, DailyCategorySales
+
+admin.site.register(HourlySales)
+admin.site.register(DailySales)
+admin.site.register(DailyMenuItemSales)
+admin.site.register(DailyCategorySales)
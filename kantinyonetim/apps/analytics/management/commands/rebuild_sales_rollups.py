@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from apps.analytics.rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the pre-aggregated sales tables from completed orders.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        processed = rebuild_rollups(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'{processed} tamamlanmış sipariş özet tablolara işlendi.'))
@@ -0,0 +1,68 @@
+from django.db import models
+
+
+class HourlySales(models.Model):
+    # tamamlanan siparislerin saatlik ozeti (bucket = saatin basi)
+    bucket = models.DateTimeField(unique=True)
+    order_count = models.PositiveIntegerField(default=0)
+    item_quantity = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        ordering = ['bucket']
+
+    def __str__(self):
+        return f"{self.bucket:%Y-%m-%d %H}:00 - {self.revenue}"
+
+
+class DailySales(models.Model):
+    date = models.DateField(unique=True)
+    order_count = models.PositiveIntegerField(default=0)
+    item_quantity = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        ordering = ['date']
+
+    def __str__(self):
+        return f"{self.date} - {self.revenue}"
+
+
+class DailyMenuItemSales(models.Model):
+    date = models.DateField()
+    menu_item = models.ForeignKey('menu.MenuItem', on_delete=models.CASCADE, related_name='daily_sales')
+    order_count = models.PositiveIntegerField(default=0)
+    quantity = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        ordering = ['date']
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'menu_item'], name='uniq_menu_item_sales_per_day'),
+        ]
+        indexes = [
+            models.Index(fields=['menu_item', 'date']),
+        ]
+
+    def __str__(self):
+        return f"{self.date} - {self.menu_item_id}: {self.quantity}"
+
+
+class DailyCategorySales(models.Model):
+    date = models.DateField()
+    category = models.CharField(max_length=20)
+    order_count = models.PositiveIntegerField(default=0)
+    quantity = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        ordering = ['date']
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'category'], name='uniq_category_sales_per_day'),
+        ]
+        indexes = [
+            models.Index(fields=['category', 'date']),
+        ]
+
+    def __str__(self):
+        return f"{self.date} - {self.category}: {self.revenue}"
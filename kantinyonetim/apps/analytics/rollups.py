@@ -0,0 +1,117 @@
+from collections import defaultdict
+from decimal import Decimal
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+from apps.orders.models import Order, OrderItem
+from .models import HourlySales, DailySales, DailyMenuItemSales, DailyCategorySales
+
+
+def _new_bucket():
+    return {'order_count': 0, 'quantity': 0, 'revenue': Decimal('0')}
+
+
+def _increment(model, lookup, deltas):
+    """
+    Add deltas to the rollup row identified by lookup, creating it if missing
+    """
+    increments = {field: F(field) + value for field, value in deltas.items()}
+    if model.objects.filter(**lookup).update(**increments):
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(**lookup, **deltas)
+    except IntegrityError:
+        # baska bir istek ayni satiri once olusturduysa artirarak devam et
+        model.objects.filter(**lookup).update(**increments)
+
+
+def record_completed_orders(orders):
+    """
+    Add completed orders to the sales rollup tables.
+
+    Must be called exactly once per order, when it transitions to 'completed'.
+    """
+    orders = list(orders)
+    if not orders:
+        return
+
+    hourly = defaultdict(_new_bucket)
+    daily = defaultdict(_new_bucket)
+    per_item = defaultdict(_new_bucket)
+    per_category = defaultdict(_new_bucket)
+    order_days = {}
+
+    for order in orders:
+        created = timezone.localtime(order.created_at)
+        hour = created.replace(minute=0, second=0, microsecond=0)
+        day = created.date()
+        order_days[order.id] = day
+        for bucket in (hourly[hour], daily[day]):
+            bucket['order_count'] += 1
+            bucket['revenue'] += order.total or Decimal('0')
+
+    # tum kalemler icin tek sorgu; siparis basina ayri sorgu atilmiyor
+    items = OrderItem.objects.filter(order_id__in=order_days.keys()).values_list(
+        'order_id', 'order__created_at', 'menu_item_id', 'menu_item__category', 'quantity', 'line_total'
+    )
+    seen_item_orders = set()
+    seen_category_orders = set()
+    for order_id, created_at, menu_item_id, category, quantity, line_total in items:
+        created = timezone.localtime(created_at)
+        hour = created.replace(minute=0, second=0, microsecond=0)
+        day = order_days[order_id]
+        hourly[hour]['quantity'] += quantity
+        daily[day]['quantity'] += quantity
+
+        item_bucket = per_item[(day, menu_item_id)]
+        item_bucket['quantity'] += quantity
+        item_bucket['revenue'] += line_total
+        if (order_id, menu_item_id) not in seen_item_orders:
+            seen_item_orders.add((order_id, menu_item_id))
+            item_bucket['order_count'] += 1
+
+        category_bucket = per_category[(day, category)]
+        category_bucket['quantity'] += quantity
+        category_bucket['revenue'] += line_total
+        if (order_id, category) not in seen_category_orders:
+            seen_category_orders.add((order_id, category))
+            category_bucket['order_count'] += 1
+
+    with transaction.atomic():
+        for hour, b in hourly.items():
+            _increment(HourlySales, {'bucket': hour},
+                       {'order_count': b['order_count'], 'item_quantity': b['quantity'], 'revenue': b['revenue']})
+        for day, b in daily.items():
+            _increment(DailySales, {'date': day},
+                       {'order_count': b['order_count'], 'item_quantity': b['quantity'], 'revenue': b['revenue']})
+        for (day, menu_item_id), b in per_item.items():
+            _increment(DailyMenuItemSales, {'date': day, 'menu_item_id': menu_item_id},
+                       {'order_count': b['order_count'], 'quantity': b['quantity'], 'revenue': b['revenue']})
+        for (day, category), b in per_category.items():
+            _increment(DailyCategorySales, {'date': day, 'category': category},
+                       {'order_count': b['order_count'], 'quantity': b['quantity'], 'revenue': b['revenue']})
+
+
+@transaction.atomic
+def rebuild_rollups(batch_size=1000):
+    """
+    Recompute all rollup tables from completed orders. Returns the number of orders processed.
+    """
+    for model in (HourlySales, DailySales, DailyMenuItemSales, DailyCategorySales):
+        model.objects.all().delete()
+
+    processed = 0
+    last_id = 0
+    while True:
+        batch = list(
+            Order.objects.filter(status='completed', id__gt=last_id)
+            .order_by('id')
+            .only('id', 'created_at', 'total')[:batch_size]
+        )
+        if not batch:
+            break
+        record_completed_orders(batch)
+        processed += len(batch)
+        last_id = batch[-1].id
+    return processed
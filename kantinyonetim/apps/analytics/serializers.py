@@ -0,0 +1,50 @@
+from decimal import Decimal
+from rest_framework import serializers
+from .models import HourlySales, DailySales
+
+
+def compute_average_ticket(revenue, order_count):
+    if not order_count:
+        return Decimal('0.00')
+    return (revenue / order_count).quantize(Decimal('0.01'))
+
+
+class HourlySalesSerializer(serializers.ModelSerializer):
+    average_ticket = serializers.SerializerMethodField()
+
+    class Meta:
+        model = HourlySales
+        fields = ['bucket', 'order_count', 'item_quantity', 'revenue', 'average_ticket']
+
+    def get_average_ticket(self, obj):
+        return compute_average_ticket(obj.revenue, obj.order_count)
+
+
+class DailySalesSerializer(serializers.ModelSerializer):
+    average_ticket = serializers.SerializerMethodField()
+
+    class Meta:
+        model = DailySales
+        fields = ['date', 'order_count', 'item_quantity', 'revenue', 'average_ticket']
+
+    def get_average_ticket(self, obj):
+        return compute_average_ticket(obj.revenue, obj.order_count)
+
+
+class MenuItemSalesSerializer(serializers.Serializer):
+    menu_item = serializers.IntegerField()
+    menu_item_name = serializers.CharField()
+    order_count = serializers.IntegerField()
+    quantity = serializers.IntegerField()
+    revenue = serializers.DecimalField(max_digits=14, decimal_places=2)
+
+
+class CategorySalesSerializer(serializers.Serializer):
+    category = serializers.CharField()
+    order_count = serializers.IntegerField()
+    quantity = serializers.IntegerField()
+    revenue = serializers.DecimalField(max_digits=14, decimal_places=2)
+    average_ticket = serializers.SerializerMethodField()
+
+    def get_average_ticket(self, obj):
+        return compute_average_ticket(obj['revenue'], obj['order_count'])
@@ -0,0 +1,180 @@
+import shutil
+import tempfile
+import time
+from collections import Counter
+from decimal import Decimal
+from django.core.exceptions import MiddlewareNotUsed
+from django.test import override_settings
+from rest_framework.test import APIClient, APITestCase
+from rest_framework import status
+from apps.users.models import User
+from apps.menu.models import MenuItem
+from apps.stock.models import Stock
+from apps.orders.models import Order, OrderItem
+from apps.analytics.models import HourlySales, DailySales, DailyMenuItemSales, DailyCategorySales
+from apps.analytics.rollups import rebuild_rollups
+from kantinyonetim.instrumentation import RequestMetrics, metrics
+from kantinyonetim.profiling import ProfilingMiddleware, list_profiles, profile_path, save_profile
+
+
+class SalesRollupTests(APITestCase):
+    def setUp(self):
+        self.staff = User.objects.create(username='staff', role='staff', is_staff=True)
+        self.staff.set_password('staffpass')
+        self.staff.save()
+        self.customer = User.objects.create(username='cust', role='customer')
+
+        self.burger = MenuItem.objects.create(name='Burger', price=Decimal('10.00'), category='ana_yemek')
+        self.tea = MenuItem.objects.create(name='Tea', price=Decimal('2.50'), category='icecek')
+        Stock.objects.create(menu_item=self.burger, quantity=10)
+        Stock.objects.create(menu_item=self.tea, quantity=10)
+
+    def auth(self, username, password):
+        res = self.client.post('/api/token/', {'username': username, 'password': password}, format='json')
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {res.data['access']}")
+
+    def make_order(self):
+        order = Order.objects.create(user=self.customer)
+        OrderItem.objects.create(order=order, menu_item=self.burger, quantity=2, price_at_order_time=self.burger.price)
+        OrderItem.objects.create(order=order, menu_item=self.tea, quantity=4, price_at_order_time=self.tea.price)
+        order.refresh_from_db()
+        return order
+
+    def test_completing_order_updates_rollups_and_report(self):
+        order = self.make_order()
+        self.auth('staff', 'staffpass')
+        res = self.client.patch(f'/api/orders/{order.id}/', {'status': 'completed'}, format='json')
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        daily = DailySales.objects.get()
+        self.assertEqual(daily.order_count, 1)
+        self.assertEqual(daily.item_quantity, 6)
+        self.assertEqual(daily.revenue, Decimal('30.00'))
+        self.assertEqual(HourlySales.objects.get().revenue, Decimal('30.00'))
+        self.assertEqual(DailyMenuItemSales.objects.get(menu_item=self.tea).quantity, 4)
+        self.assertEqual(DailyCategorySales.objects.get(category='ana_yemek').revenue, Decimal('20.00'))
+
+        res = self.client.get('/api/reports/sales/')
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['totals']['order_count'], 1)
+        self.assertEqual(res.data['totals']['average_ticket'], Decimal('30.00'))
+
+        res = self.client.get('/api/reports/menu-items/')
+        self.assertEqual(res.data['results'][0]['menu_item_name'], 'Tea')
+
+    def test_rebuild_matches_incremental(self):
+        first, second = self.make_order(), self.make_order()
+        Order.objects.filter(id__in=[first.id, second.id]).update(status='completed')
+        self.assertEqual(rebuild_rollups(batch_size=1), 2)
+        daily = DailySales.objects.get()
+        self.assertEqual(daily.order_count, 2)
+        self.assertEqual(daily.revenue, Decimal('60.00'))
+        self.assertEqual(DailyCategorySales.objects.get(category='icecek').order_count, 2)
+
+    def test_reports_are_staff_only(self):
+        self.customer.set_password('custpass')
+        self.customer.save()
+        self.auth('cust', 'custpass')
+        res = self.client.get('/api/reports/sales/')
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class InstrumentationTests(APITestCase):
+    def setUp(self):
+        metrics.clear()
+        self.staff = User.objects.create(username='staff', role='staff', is_staff=True)
+        self.staff.set_password('staffpass')
+        self.staff.save()
+        self.customer = User.objects.create(username='cust', role='customer')
+        self.customer.set_password('custpass')
+        self.customer.save()
+        MenuItem.objects.create(name='Tea', price=Decimal('2.50'), category='icecek')
+
+    def auth(self, username, password):
+        res = self.client.post('/api/token/', {'username': username, 'password': password}, format='json')
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {res.data['access']}")
+
+    def test_server_timing_and_route_histogram(self):
+        res = self.client.get('/api/menu-items/')
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        timing = res['Server-Timing']
+        self.assertIn('app;dur=', timing)
+        self.assertIn('db;dur=', timing)
+        self.assertIn('ser;dur=', timing)
+
+        self.auth('staff', 'staffpass')
+        res = self.client.get('/api/metrics/')
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(res['Content-Type'].startswith('text/plain'))
+        body = res.content.decode()
+        self.assertIn('kantin_http_requests_total{method="GET",route="api/menu-items/"} 1', body)
+        self.assertIn('kantin_http_request_duration_seconds_bucket{method="GET",route="api/menu-items/",le="+Inf"} 1', body)
+
+    def test_repeated_query_shape_is_flagged(self):
+        request_metrics = RequestMetrics()
+        run = lambda sql, params, many, context: None
+        for item_id in range(6):
+            request_metrics(run, 'SELECT * FROM stock WHERE menu_item_id = %s', (item_id,), False, {})
+        request_metrics(run, 'SELECT 1', (), False, {})
+        self.assertEqual(request_metrics.query_count, 7)
+        self.assertEqual(request_metrics.repeated_queries(5), [('SELECT * FROM stock WHERE menu_item_id = %s', 6)])
+
+    def test_metrics_endpoint_is_staff_only(self):
+        self.auth('cust', 'custpass')
+        res = self.client.get('/api/metrics/')
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class ProfilingTests(APITestCase):
+    def setUp(self):
+        self.profile_dir = tempfile.mkdtemp(prefix='kantin-profiles-')
+        self.addCleanup(shutil.rmtree, self.profile_dir, ignore_errors=True)
+        self.staff = User.objects.create(username='staff', role='staff', is_staff=True)
+        self.staff.set_password('staffpass')
+        self.staff.save()
+
+    def test_middleware_is_not_loaded_when_nothing_would_be_profiled(self):
+        with override_settings(PROFILING_ENABLED=True, PROFILING_SAMPLE_RATE=0, PROFILING_SLOW_MS=0):
+            with self.assertRaises(MiddlewareNotUsed):
+                ProfilingMiddleware(lambda request: None)
+
+    def test_sampled_request_is_stored_and_listed(self):
+        settings_override = override_settings(
+            PROFILING_ENABLED=True, PROFILING_SAMPLE_RATE=1.0, PROFILING_SLOW_MS=0, PROFILING_DIR=self.profile_dir,
+        )
+        with settings_override:
+            client = APIClient()
+            # password hashing keeps the login busy long enough for several samples
+            res = client.post('/api/token/', {'username': 'staff', 'password': 'staffpass'}, format='json')
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            client.credentials(HTTP_AUTHORIZATION=f"Bearer {res.data['access']}")
+
+            res = client.get('/api/profiles/', {'route': 'api/token/'})
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            self.assertEqual(len(res.data), 1)
+            profile = res.data[0]
+            self.assertEqual((profile['method'], profile['reason'], profile['status']), ('POST', 'sampled', 200))
+            self.assertGreater(profile['samples'], 0)
+
+            res = client.get(f"/api/profiles/{profile['name']}/")
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            lines = b''.join(res.streaming_content).decode().splitlines()
+            self.assertTrue(all(line.rsplit(' ', 1)[1].isdigit() for line in lines))
+            self.assertIn('(apps/users/auth.py:', '\n'.join(lines))
+
+    def test_rotation_keeps_newest_profiles(self):
+        names = []
+        with override_settings(PROFILING_MAX_FILES=2):
+            for _ in range(3):
+                names.append(save_profile(Counter({'main;handler': 3}), {'method': 'GET', 'route': 'api/orders/'}, directory=self.profile_dir))
+                # names sort by their microsecond timestamp
+                time.sleep(0.002)
+        self.assertEqual([p['name'] for p in list_profiles(directory=self.profile_dir)], names[:0:-1])
+        self.assertIsNone(profile_path(names[0], directory=self.profile_dir))
+        self.assertIsNone(profile_path('../../settings', directory=self.profile_dir))
+
+    def test_profiles_are_staff_only(self):
+        customer = User.objects.create(username='cust', role='customer')
+        self.client.force_authenticate(customer)
+        self.assertEqual(self.client.get('/api/profiles/').status_code, status.HTTP_403_FORBIDDEN)
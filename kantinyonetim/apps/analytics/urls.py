@@ -0,0 +1,11 @@
+from django.urls import path
+from .views import sales_report, menu_item_sales_report, category_sales_report, metrics, profiles, profile_detail
+
+urlpatterns = [
+    path('reports/sales/', sales_report, name='reports-sales'),
+    path('reports/menu-items/', menu_item_sales_report, name='reports-menu-items'),
+    path('reports/categories/', category_sales_report, name='reports-categories'),
+    path('metrics/', metrics, name='metrics'),
+    path('profiles/', profiles, name='profiles'),
+    path('profiles/<str:name>/', profile_detail, name='profile-detail'),
+]
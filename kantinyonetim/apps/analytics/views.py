@@ -0,0 +1,140 @@
+from datetime import datetime, time, timedelta
+from django.db.models import Sum
+from django.http import FileResponse, HttpResponse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.response import Response
+from apps.users.permissions import IsStaffOrAdmin
+from kantinyonetim.instrumentation import metrics as request_metrics
+from kantinyonetim.profiling import list_profiles, profile_path
+from .models import HourlySales, DailySales, DailyMenuItemSales, DailyCategorySales
+from .serializers import (
+    HourlySalesSerializer, DailySalesSerializer, MenuItemSalesSerializer, CategorySalesSerializer, compute_average_ticket
+)
+
+
+def _parse_range(request):
+    """
+    Read date_from/date_to (YYYY-MM-DD, inclusive) from the query string. Defaults to the last 30 days.
+    """
+    today = timezone.localdate()
+    date_from = request.query_params.get('date_from', '')
+    date_to = request.query_params.get('date_to', '')
+    start = datetime.strptime(date_from, '%Y-%m-%d').date() if date_from else today - timedelta(days=29)
+    end = datetime.strptime(date_to, '%Y-%m-%d').date() if date_to else today
+    return start, end
+
+
+def _totals(rows):
+    totals = rows.aggregate(order_count=Sum('order_count'), item_quantity=Sum('item_quantity'), revenue=Sum('revenue'))
+    totals = {key: value or 0 for key, value in totals.items()}
+    totals['average_ticket'] = compute_average_ticket(totals['revenue'], totals['order_count'])
+    return totals
+
+
+@api_view(['GET'])
+@permission_classes([IsStaffOrAdmin])
+def sales_report(request):
+    """Revenue, order count, item quantity and average ticket per hour or day"""
+    try:
+        start, end = _parse_range(request)
+    except ValueError:
+        return Response({'detail': 'Dates must be in YYYY-MM-DD format.'}, status=status.HTTP_400_BAD_REQUEST)
+
+    granularity = request.query_params.get('granularity', 'day')
+    daily = DailySales.objects.filter(date__range=(start, end))
+    if granularity == 'hour':
+        tz = timezone.get_current_timezone()
+        rows = HourlySales.objects.filter(
+            bucket__gte=timezone.make_aware(datetime.combine(start, time.min), tz),
+            bucket__lt=timezone.make_aware(datetime.combine(end + timedelta(days=1), time.min), tz),
+        )
+        data = HourlySalesSerializer(rows, many=True).data
+    elif granularity == 'day':
+        data = DailySalesSerializer(daily, many=True).data
+    else:
+        return Response({'granularity': 'Must be "hour" or "day".'}, status=status.HTTP_400_BAD_REQUEST)
+
+    return Response({
+        'date_from': start,
+        'date_to': end,
+        'granularity': granularity,
+        'totals': _totals(daily),
+        'results': data,
+    })
+
+
+@api_view(['GET'])
+@permission_classes([IsStaffOrAdmin])
+def menu_item_sales_report(request):
+    """Per menu item sales over a date range, best sellers first"""
+    try:
+        start, end = _parse_range(request)
+    except ValueError:
+        return Response({'detail': 'Dates must be in YYYY-MM-DD format.'}, status=status.HTTP_400_BAD_REQUEST)
+
+    rows = (
+        DailyMenuItemSales.objects.filter(date__range=(start, end))
+        .values('menu_item', 'menu_item__name')
+        .annotate(order_count=Sum('order_count'), quantity=Sum('quantity'), revenue=Sum('revenue'))
+        .order_by('-quantity')
+    )
+    results = [
+        {**row, 'menu_item_name': row.pop('menu_item__name')} for row in rows
+    ]
+    return Response({
+        'date_from': start,
+        'date_to': end,
+        'results': MenuItemSalesSerializer(results, many=True).data,
+    })
+
+
+@api_view(['GET'])
+@permission_classes([IsStaffOrAdmin])
+def category_sales_report(request):
+    """Per category sales and average ticket over a date range"""
+    try:
+        start, end = _parse_range(request)
+    except ValueError:
+        return Response({'detail': 'Dates must be in YYYY-MM-DD format.'}, status=status.HTTP_400_BAD_REQUEST)
+
+    rows = (
+        DailyCategorySales.objects.filter(date__range=(start, end))
+        .values('category')
+        .annotate(order_count=Sum('order_count'), quantity=Sum('quantity'), revenue=Sum('revenue'))
+        .order_by('-revenue')
+    )
+    return Response({
+        'date_from': start,
+        'date_to': end,
+        'results': CategorySalesSerializer(rows, many=True).data,
+    })
+
+
+@api_view(['GET'])
+@permission_classes([IsStaffOrAdmin])
+def metrics(request):
+    """Per-route request metrics in Prometheus text format"""
+    return HttpResponse(request_metrics.render_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+@api_view(['GET'])
+@permission_classes([IsStaffOrAdmin])
+def profiles(request):
+    """Stored request profiles, newest first, ?route=&limit="""
+    try:
+        limit = min(int(request.query_params.get('limit', 100)), 1000)
+    except ValueError:
+        return Response({'detail': 'limit must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+    return Response(list_profiles(route=request.query_params.get('route') or None, limit=limit))
+
+
+@api_view(['GET'])
+@permission_classes([IsStaffOrAdmin])
+def profile_detail(request, name):
+    """One profile as collapsed stacks (flamegraph.pl / speedscope input)"""
+    path = profile_path(name)
+    if path is None:
+        return Response({'detail': 'Profile not found.'}, status=status.HTTP_404_NOT_FOUND)
+    return FileResponse(open(path, 'rb'), content_type='text/plain; charset=utf-8', as_attachment=True, filename=f'{name}.collapsed')
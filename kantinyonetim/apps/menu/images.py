@@ -0,0 +1,154 @@
+import hashlib
+import io
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connection, transaction
+from django.utils import timezone
+from PIL import Image, ImageOps
+from .models import MenuItem
+
+logger = logging.getLogger(__name__)
+
+# turetilen gorseller: ad -> en uzun kenar (px)
+DEFAULT_VARIANTS = {'thumb': 160, 'card': 480, 'full': 1280}
+
+
+def get_variant_sizes():
+    return getattr(settings, 'MENU_IMAGE_VARIANTS', DEFAULT_VARIANTS)
+
+
+def _encode_webp(image, max_side, quality):
+    resized = image.copy()
+    resized.thumbnail((max_side, max_side), Image.LANCZOS)
+    buffer = io.BytesIO()
+    resized.save(buffer, 'WEBP', quality=quality, method=4)
+    return buffer.getvalue()
+
+
+def generate_variants(menu_item):
+    """
+    Write WebP derivatives of menu_item.image next to the original and store
+    their names in image_variants. Names carry a hash of the encoded bytes, so
+    a new upload never collides with a cached copy. An image that cannot be
+    read or decoded is recorded as {'source': ..., 'error': ...} instead, so it
+    is not retried until the image changes.
+    """
+    if not menu_item.image:
+        return {}
+    storage = menu_item.image.storage
+    source = menu_item.image.name
+    quality = getattr(settings, 'MENU_IMAGE_WEBP_QUALITY', 80)
+
+    try:
+        with storage.open(source, 'rb') as fh:
+            image = ImageOps.exif_transpose(Image.open(fh))
+            image = image.convert('RGBA' if image.mode in ('RGBA', 'LA', 'P') else 'RGB')
+        encoded = {name: _encode_webp(image, max_side, quality) for name, max_side in get_variant_sizes().items()}
+    except (OSError, ValueError, Image.DecompressionBombError) as exc:
+        # eksik dosya, bozuk yukleme veya Pillow hatasi; her istekte yeniden denemeye deymez
+        logger.warning('Menu image variants failed for item %s (%s): %s', menu_item.pk, source, exc)
+        return _store(menu_item, storage, source, {'source': source, 'error': str(exc) or exc.__class__.__name__})
+
+    stem = os.path.splitext(source)[0]
+    variants = {'source': source}
+    for name, data in encoded.items():
+        digest = hashlib.sha256(data).hexdigest()[:12]
+        path = f'{stem}.{name}.{digest}.webp'
+        if not storage.exists(path):
+            path = storage.save(path, ContentFile(data))
+        variants[name] = path
+    return _store(menu_item, storage, source, variants)
+
+
+def _store(menu_item, storage, source, variants):
+    # gorsel bu arada degistiyse eski sonuclari yazma
+    updated = MenuItem.objects.filter(pk=menu_item.pk, image=source).update(image_variants=variants, updated_at=timezone.now())
+    if updated:
+        _delete_stale(storage, menu_item.image_variants, variants)
+        menu_item.image_variants = variants
+    return variants
+
+
+def _delete_stale(storage, old, new):
+    keep = set(new.values())
+    for name, path in (old or {}).items():
+        if name not in ('source', 'error') and path not in keep and storage.exists(path):
+            storage.delete(path)
+
+
+def variants_ready(menu_item):
+    """
+    True once generation finished for the current image, successfully or not
+    """
+    variants = menu_item.image_variants or {}
+    return bool(menu_item.image) and variants.get('source') == menu_item.image.name
+
+
+class VariantWorker:
+    """
+    Background pool generating derivatives off the request thread; each
+    menu item is queued at most once at a time
+    """
+
+    def __init__(self, max_workers=2):
+        self.max_workers = max_workers
+        self._executor = None
+        self._pending = set()
+        self._lock = threading.Lock()
+
+    def schedule(self, menu_item_id):
+        with self._lock:
+            if menu_item_id in self._pending:
+                return False
+            self._pending.add(menu_item_id)
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='menu-images')
+        self._executor.submit(self._run, menu_item_id)
+        return True
+
+    def _run(self, menu_item_id):
+        try:
+            menu_item = MenuItem.objects.filter(pk=menu_item_id).first()
+            if menu_item is not None and not variants_ready(menu_item):
+                generate_variants(menu_item)
+        except Exception:
+            logger.exception('Menu image variants failed for item %s', menu_item_id)
+        finally:
+            with self._lock:
+                self._pending.discard(menu_item_id)
+            connection.close()
+
+
+variant_worker = VariantWorker(max_workers=getattr(settings, 'MENU_IMAGE_WORKERS', 2))
+
+
+def schedule_variants(menu_item):
+    """
+    Queue derivative generation once the current transaction commits
+    """
+    if menu_item.image:
+        transaction.on_commit(lambda: variant_worker.schedule(menu_item.pk))
+
+
+def image_srcset(menu_item, request=None):
+    """
+    {'thumb': url, 'card': url, 'full': url} for the serializer; empty (and
+    generation queued) until the derivatives exist
+    """
+    if not menu_item.image:
+        return {}
+    if not variants_ready(menu_item):
+        schedule_variants(menu_item)
+        return {}
+    storage = menu_item.image.storage
+    urls = {}
+    for name in get_variant_sizes():
+        path = menu_item.image_variants.get(name)
+        if path:
+            url = storage.url(path)
+            urls[name] = request.build_absolute_uri(url) if request is not None else url
+    return urls
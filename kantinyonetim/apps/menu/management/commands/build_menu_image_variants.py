@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from apps.menu.images import generate_variants, variants_ready
+from apps.menu.models import MenuItem
+
+
+class Command(BaseCommand):
+    help = 'Generates WebP thumb/card/full derivatives for menu item images.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Regenerate even if derivatives are up to date.')
+
+    def handle(self, *args, **options):
+        built = failed = 0
+        for item in MenuItem.objects.exclude(image='').exclude(image__isnull=True).iterator():
+            if variants_ready(item) and not options['force']:
+                continue
+            try:
+                generate_variants(item)
+                built += 1
+            except Exception as e:
+                failed += 1
+                self.stdout.write(self.style.WARNING(f"'{item.name}' için görsel türetilemedi: {e}"))
+        self.stdout.write(self.style.SUCCESS(f'{built} menü görseli işlendi, {failed} hata.'))
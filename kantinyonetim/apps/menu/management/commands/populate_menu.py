@@ -1,10 +1,17 @@
 # isobed18/kantinyonetim/kantinyonetim-mobile_app/kantinyonetim/apps/menu/management/commands/populate_menu.py
 
+import hashlib
+import io
+import json
 import os
+from concurrent.futures import ThreadPoolExecutor
 import requests
+from PIL import Image
 from django.core.management.base import BaseCommand
 from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
 from django.conf import settings
+from django.db import transaction
 from apps.menu.models import MenuItem
 from apps.stock.models import Stock
 
@@ -143,48 +150,152 @@ MENU_DATA = [
 
 
 
+class ImageFetchError(Exception):
+    pass
+
+
+class ImageCache:
+    """
+    Content-addressed download cache: <sha256>.<ext> files plus an index.json
+    mapping source URLs to them, so reruns need no network
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.index_path = os.path.join(directory, 'index.json')
+        try:
+            with open(self.index_path, encoding='utf-8') as fh:
+                self.index = json.load(fh)
+        except (OSError, ValueError):
+            self.index = {}
+
+    def get(self, url):
+        name = self.index.get(url)
+        if name:
+            path = os.path.join(self.directory, name)
+            if os.path.exists(path):
+                with open(path, 'rb') as fh:
+                    return fh.read(), os.path.splitext(name)[1].lstrip('.')
+        return None
+
+    def put(self, url, content, ext):
+        name = f'{hashlib.sha256(content).hexdigest()}.{ext}'
+        path = os.path.join(self.directory, name)
+        if not os.path.exists(path):
+            with open(path + '.tmp', 'wb') as fh:
+                fh.write(content)
+            os.replace(path + '.tmp', path)
+        self.index[url] = name
+
+    def save_index(self):
+        with open(self.index_path + '.tmp', 'w', encoding='utf-8') as fh:
+            json.dump(self.index, fh, indent=1, sort_keys=True)
+        os.replace(self.index_path + '.tmp', self.index_path)
+
+
+def validate_image(content, content_type=''):
+    """
+    Return the file extension for content, or raise ImageFetchError if it is not a decodable image
+    """
+    if content_type and not content_type.split(';')[0].strip().startswith('image/'):
+        raise ImageFetchError(f'resim değil ({content_type})')
+    try:
+        with Image.open(io.BytesIO(content)) as image:
+            image_format = image.format
+            image.verify()
+    except Exception as e:
+        raise ImageFetchError(f'resim çözümlenemedi: {e}')
+    return {'JPEG': 'jpg'}.get(image_format, (image_format or 'jpg').lower())
+
+
+def fetch_image(session, url, cache, timeout=10, offline=False):
+    """
+    (content, ext) for url from the cache or the network; only validated images are cached
+    """
+    cached = cache.get(url)
+    if cached:
+        return cached
+    if offline:
+        raise ImageFetchError('önbellekte yok (--offline)')
+    try:
+        response = session.get(url, timeout=timeout)
+        response.raise_for_status()
+    except requests.exceptions.RequestException as e:
+        raise ImageFetchError(str(e))
+    ext = validate_image(response.content, response.headers.get('Content-Type', ''))
+    cache.put(url, response.content, ext)
+    return response.content, ext
+
+
+def file_stem(name):
+    return name.lower().replace(' ', '_').replace('ı', 'i').replace('ü', 'u').replace('ş', 's').replace('ç', 'c').replace('ğ', 'g').replace('ö', 'o')
+
+
 class Command(BaseCommand):
     help = 'Populates the database with a predefined set of menu items and their stock.'
 
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=8, help='Parallel image downloads.')
+        parser.add_argument('--timeout', type=float, default=10)
+        parser.add_argument(
+            '--cache-dir', default=getattr(settings, 'MENU_IMAGE_CACHE_DIR', os.path.join(settings.BASE_DIR, '.image_cache')),
+            help='Content-addressed download cache.',
+        )
+        parser.add_argument('--offline', action='store_true', help='Use cached images only.')
+
     def handle(self, *args, **options):
-        self.stdout.write(self.style.WARNING('Mevcut menü ve stok verileri siliniyor...'))
-        MenuItem.objects.all().delete()
-        Stock.objects.all().delete()
-        self.stdout.write(self.style.SUCCESS('Mevcut veriler başarıyla silindi.'))
+        cache = ImageCache(options['cache_dir'])
+        urls = [
+            item['image_url'] for item in MENU_DATA
+            if item.get('image_url') and 'BURAYA' not in item['image_url']
+        ]
 
-        media_path = os.path.join(settings.MEDIA_ROOT, 'menu_images')
-        os.makedirs(media_path, exist_ok=True)
+        # resimler once ve paralel indiriliyor; veritabanina tek seferde yaziliyor
+        session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=options['workers'], pool_maxsize=options['workers'])
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        session.headers['User-Agent'] = 'kantinyonetim-populate-menu'
 
-        for item_data in MENU_DATA:
-            self.stdout.write(f"'{item_data['name']}' ekleniyor...")
-            
+        def fetch(url):
             try:
-                menu_item = MenuItem(
-                    name=item_data['name'],
-                    description=item_data['description'],
-                    price=item_data['price'],
-                    category=item_data['category'],
-                    is_available=True
-                )
-
-                if item_data.get('image_url') and 'BURAYA' not in item_data['image_url']:
-                    try:
-                        response = requests.get(item_data['image_url'], stream=True, timeout=10)
-                        response.raise_for_status()
-                        
-                        file_name = f"{item_data['name'].lower().replace(' ', '_').replace('ı', 'i').replace('ü', 'u').replace('ş', 's').replace('ç', 'c').replace('ğ', 'g').replace('ö', 'o')}.jpg"
-                        menu_item.image.save(file_name, ContentFile(response.content), save=True)
-                    
-                    except requests.exceptions.RequestException as e:
-                        self.stdout.write(self.style.ERROR(f"'{item_data['name']}' için resim indirilemedi. Hata: {e}"))
-                
-                menu_item.save()
-
-                Stock.objects.create(menu_item=menu_item, quantity=50)
-
-                self.stdout.write(self.style.SUCCESS(f"'{item_data['name']}' başarıyla eklendi."))
-
-            except Exception as e:
-                self.stdout.write(self.style.ERROR(f"'{item_data['name']}' eklenirken bir hata oluştu: {e}"))
-
-        self.stdout.write(self.style.SUCCESS('Veritabanı başarıyla dolduruldu!'))
\ No newline at end of file
+                return url, fetch_image(session, url, cache, timeout=options['timeout'], offline=options['offline']), None
+            except ImageFetchError as e:
+                return url, None, e
+
+        images = {}
+        with ThreadPoolExecutor(max_workers=max(1, options['workers'])) as pool:
+            for url, result, error in pool.map(fetch, urls):
+                if error:
+                    self.stdout.write(self.style.ERROR(f"{url} için resim indirilemedi. Hata: {error}"))
+                else:
+                    images[url] = result
+        cache.save_index()
+        session.close()
+
+        menu_items = []
+        for item_data in MENU_DATA:
+            menu_item = MenuItem(
+                name=item_data['name'],
+                description=item_data['description'],
+                price=item_data['price'],
+                category=item_data['category'],
+                is_available=True
+            )
+            image = images.get(item_data.get('image_url'))
+            if image:
+                content, ext = image
+                menu_item.image = default_storage.save(f"menu_images/{file_stem(item_data['name'])}.{ext}", ContentFile(content))
+            menu_items.append(menu_item)
+
+        with transaction.atomic():
+            self.stdout.write(self.style.WARNING('Mevcut menü ve stok verileri siliniyor...'))
+            MenuItem.objects.all().delete()
+            Stock.objects.all().delete()
+            menu_items = MenuItem.objects.bulk_create(menu_items)
+            Stock.objects.bulk_create([Stock(menu_item=menu_item, quantity=50) for menu_item in menu_items])
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Veritabanı başarıyla dolduruldu! {len(menu_items)} ürün, {len(images)}/{len(urls)} resim.'
+        ))
@@ -14,6 +14,11 @@ class MenuItem(models.Model):
     is_available = models.BooleanField(default=True)
     category = models.CharField(max_length=20, choices=CATEGORY_CHOICES, default='ana_yemek')
     image = models.ImageField(upload_to='menu_images/', blank=True, null=True) # Yeni fotoğraf alanı
+    # images.generate_variants sonucu: {'source': image.name, 'thumb': ..., 'card': ..., 'full': ...}
+    # veya uretilemediyse {'source': image.name, 'error': ...}
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
+    # liste ETag'i max(updated_at) uzerinden hesaplaniyor (kantinyonetim/responses.py)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return self.name
\ No newline at end of file
@@ -3,18 +3,25 @@ from .models import MenuItem
 from apps.stock.models import Stock
 from apps.users.utils import log_user_action
 from django.db import transaction
+from .images import image_srcset, schedule_variants
 
 class MenuItemSerializer(serializers.ModelSerializer):
     image = serializers.ImageField(max_length=None, use_url=True)
+    # WebP turevleri: {'thumb': url, 'card': url, 'full': url}; hazir olana kadar bos
+    image_srcset = serializers.SerializerMethodField()
 
     class Meta:
         model = MenuItem
-        fields = '__all__'
+        exclude = ['image_variants']
+
+    def get_image_srcset(self, obj):
+        return image_srcset(obj, self.context.get('request'))
 
     @transaction.atomic
     def create(self, validated_data):
         menu_item = super().create(validated_data)
         Stock.objects.create(menu_item=menu_item, quantity=0)
+        schedule_variants(menu_item)
 
         # menu ogesi olusturma logu
         request = self.context.get('request')
@@ -39,6 +46,8 @@ class MenuItemSerializer(serializers.ModelSerializer):
         old_image = instance.image
 
         updated_instance = super().update(instance, validated_data)
+        if old_image != updated_instance.image:
+            schedule_variants(updated_instance)
 
         changes = {}
         if old_name != updated_instance.name: changes['name'] = {'old': old_name, 'new': updated_instance.name}
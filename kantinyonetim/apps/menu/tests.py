@@ -1,3 +1,180 @@
-from django.test import TestCase
+import gzip
+import io
+import json
+import os
+import shutil
+import tempfile
+from datetime import datetime, timezone as dt_timezone
+from decimal import Decimal
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from PIL import Image
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory, APITestCase
+from apps.stock.models import Stock
+from apps.users.models import User
+from kantinyonetim.query_budget import QueryBudgetMixin
+from kantinyonetim.renderers import FastJSONRenderer
+from .management.commands.populate_menu import MENU_DATA, ImageCache, ImageFetchError, validate_image
+from .images import generate_variants, image_srcset
+from .models import MenuItem
+from .serializers import MenuItemSerializer
+from .views import MenuItemViewSet
 
-# Create your tests here.
+
+def make_jpeg(size=(2000, 1000)):
+    buffer = io.BytesIO()
+    Image.new('RGB', size, (200, 80, 40)).save(buffer, 'JPEG')
+    return SimpleUploadedFile('tost.jpg', buffer.getvalue(), content_type='image/jpeg')
+
+
+class MenuImageVariantTests(TestCase):
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media)
+        settings_override = override_settings(MEDIA_ROOT=self.media)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.item = MenuItem.objects.create(name='Tost', price=50, image=make_jpeg())
+
+    def test_variants_are_resized_webp_next_to_original(self):
+        variants = generate_variants(self.item)
+        self.assertEqual(set(variants), {'source', 'thumb', 'card', 'full'})
+        for name, max_side in (('thumb', 160), ('card', 480), ('full', 1280)):
+            self.assertEqual(os.path.dirname(variants[name]), os.path.dirname(self.item.image.name))
+            with Image.open(os.path.join(self.media, variants[name])) as image:
+                self.assertEqual(image.format, 'WEBP')
+                self.assertEqual(max(image.size), max_side)
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.image_variants, variants)
+
+    def test_srcset_is_empty_until_generated(self):
+        request = APIRequestFactory().get('/api/menu/')
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            data = MenuItemSerializer(self.item, context={'request': request}).data
+        self.assertEqual(data['image_srcset'], {})
+        self.assertEqual(len(callbacks), 1)
+        self.assertNotIn('image_variants', data)
+
+        generate_variants(self.item)
+        srcset = image_srcset(self.item, request)
+        self.assertTrue(srcset['thumb'].startswith('http://testserver/media/menu_images/'))
+        self.assertTrue(srcset['card'].endswith('.webp'))
+
+    def test_new_upload_replaces_old_derivatives(self):
+        old = generate_variants(self.item)
+        self.item.image = make_jpeg((800, 800))
+        self.item.save()
+        new = generate_variants(self.item)
+        self.assertNotEqual(old['thumb'], new['thumb'])
+        self.assertFalse(os.path.exists(os.path.join(self.media, old['thumb'])))
+
+    def test_failed_generation_is_recorded_and_not_rescheduled(self):
+        self.item.image = SimpleUploadedFile('bozuk.jpg', b'not an image', content_type='image/jpeg')
+        self.item.save()
+        with self.assertLogs('apps.menu.images', 'WARNING'):
+            variants = generate_variants(self.item)
+        self.assertEqual(variants['source'], self.item.image.name)
+        self.assertIn('error', variants)
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.image_variants, variants)
+
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            self.assertEqual(image_srcset(self.item), {})
+        self.assertEqual(callbacks, [])
+
+
+class PopulateMenuTests(TestCase):
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media)
+        self.addCleanup(shutil.rmtree, self.cache_dir)
+
+    def test_html_is_rejected(self):
+        with self.assertRaises(ImageFetchError):
+            validate_image(b'<html></html>', 'text/html; charset=utf-8')
+        with self.assertRaises(ImageFetchError):
+            validate_image(b'not really a jpeg', 'image/jpeg')
+        self.assertEqual(validate_image(make_jpeg().read(), 'image/jpeg'), 'jpg')
+
+    def test_offline_run_uses_cache_and_bulk_inserts(self):
+        cache = ImageCache(self.cache_dir)
+        cache.put(MENU_DATA[0]['image_url'], make_jpeg().read(), 'jpg')
+        cache.save_index()
+        with override_settings(MEDIA_ROOT=self.media):
+            call_command('populate_menu', offline=True, cache_dir=self.cache_dir, stdout=io.StringIO())
+        self.assertEqual(MenuItem.objects.count(), len(MENU_DATA))
+        self.assertEqual(Stock.objects.filter(quantity=50).count(), len(MENU_DATA))
+        self.assertEqual(MenuItem.objects.exclude(image='').count(), 1)
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(prefix='kantin-budget-media-'))
+class MenuQueryBudgetTests(QueryBudgetMixin, APITestCase):
+    def setUp(self):
+        self.addCleanup(shutil.rmtree, settings.MEDIA_ROOT, ignore_errors=True)
+        self.staff = User.objects.create_user(username='staff', password='staffpass', role='staff')
+        self.items = [MenuItem.objects.create(name=f'Item {i}', price=Decimal('5.00')) for i in range(5)]
+        res = self.client.post('/api/token/', {'username': 'staff', 'password': 'staffpass'}, format='json')
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {res.data['access']}")
+
+    def test_actions_stay_within_budget(self):
+        item = self.items[0]
+        self.assertRequestWithinBudget(MenuItemViewSet, 'list', 'get', '/api/menu-items/')
+        self.assertRequestWithinBudget(MenuItemViewSet, 'retrieve', 'get', f'/api/menu-items/{item.id}/')
+        self.assertRequestWithinBudget(
+            MenuItemViewSet, 'create', 'post', '/api/menu-items/',
+            {'name': 'Tost', 'price': '40.00', 'image': make_jpeg((64, 64))}, format='multipart',
+        )
+        self.assertRequestWithinBudget(MenuItemViewSet, 'update', 'put', f'/api/menu-items/{item.id}/', {'price': '6.00'}, format='multipart')
+        self.assertRequestWithinBudget(MenuItemViewSet, 'partial_update', 'patch', f'/api/menu-items/{item.id}/', {'name': 'Ayran'}, format='multipart')
+        self.assertRequestWithinBudget(MenuItemViewSet, 'destroy', 'delete', f'/api/menu-items/{item.id}/')
+
+
+class MenuResponseCachingTests(APITestCase):
+    def setUp(self):
+        self.items = [MenuItem.objects.create(name=f'Item {i}', description='Kasarli tost, domates' * 3, price=Decimal('5.00')) for i in range(30)]
+
+    def test_menu_list_is_public_and_revalidated_with_weak_etag(self):
+        res = self.client.get('/api/menu-items/')
+        self.assertEqual(res.status_code, 200)
+        self.assertIn('public', res['Cache-Control'])
+        self.assertIn(f'max-age={settings.MENU_CACHE_MAX_AGE}', res['Cache-Control'])
+        etag = res['ETag']
+        self.assertTrue(etag.startswith('W/"'))
+
+        # 304 sadece aggregate sorgusuyla donuyor; liste okunmuyor
+        with self.assertNumQueries(1):
+            res = self.client.get('/api/menu-items/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, 304)
+        self.assertEqual(res.content, b'')
+
+        MenuItem.objects.filter(pk=self.items[0].pk).update(price=Decimal('6.00'), updated_at=datetime.now(dt_timezone.utc))
+        res = self.client.get('/api/menu-items/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, 200)
+        self.assertNotEqual(res['ETag'], etag)
+
+    def test_large_responses_are_gzipped(self):
+        res = self.client.get('/api/menu-items/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(res['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', res['Vary'])
+        self.assertEqual(len(json.loads(gzip.decompress(res.content))), 30)
+
+        res = self.client.get(f'/api/menu-items/{self.items[0].id}/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertFalse(res.has_header('Content-Encoding'))
+
+    def test_fast_renderer_matches_drf_output(self):
+        data = {
+            'id': 1, 'name': 'Çay', 'price': Decimal('12.50'), 'tags': ['sıcak', None, True],
+            'created_at': datetime(2026, 1, 2, 3, 4, 5, 678901, tzinfo=dt_timezone.utc), 'nested': {'ratio': 0.5},
+        }
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+
+    def test_fast_renderer_falls_back_for_values_orjson_cannot_encode(self):
+        big = {'id': 2 ** 70, 'name': None}
+        self.assertEqual(FastJSONRenderer().render(big), JSONRenderer().render(big))
+        for value in (float('nan'), float('inf')):
+            with self.assertRaises(ValueError):
+                FastJSONRenderer().render({'ratio': [None, value]})
@@ -6,12 +6,25 @@ from .models import MenuItem
 from .serializers import MenuItemSerializer
 from apps.users.utils import log_user_action
 from rest_framework.parsers import MultiPartParser, FormParser
+from kantinyonetim.instrumentation import InstrumentedViewMixin
+from kantinyonetim.responses import PUBLIC, CachePolicyMixin
 # Create your views here.
 
-class MenuItemViewSet(viewsets.ModelViewSet):
+class MenuItemViewSet(CachePolicyMixin, InstrumentedViewMixin, viewsets.ModelViewSet):
     queryset = MenuItem.objects.all()
     serializer_class = MenuItemSerializer
+    # menu herkes icin ayni; paylasimli cache'ler MENU_CACHE_MAX_AGE boyunca tutabilir
+    cache_policy = PUBLIC
+    etag_field = 'updated_at'
     parser_classes = (MultiPartParser, FormParser)
+    query_budgets = {
+        'list': 3,
+        'retrieve': 2,
+        'create': 6,
+        'update': 6,
+        'partial_update': 6,
+        'destroy': 9,
+    }
     def get_queryset(self):
         queryset = super().get_queryset()
         category = self.request.query_params.get('category')
@@ -0,0 +1,94 @@
+"""
+Optimistic concurrency for orders and order items.
+
+Order and OrderItem carry a `version` that every write bumps. Writes are
+conditional UPDATEs (`WHERE version = n`) instead of long-held row locks: the
+loser of a race matches no row and gets VersionConflict, which the API turns
+into 412 Precondition Failed when the client sent If-Match and 409 otherwise.
+Detail responses carry the version as a strong ETag.
+"""
+from django.db.models import F
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from .transitions import VersionConflict
+
+
+class PreconditionFailed(APIException):
+    status_code = status.HTTP_412_PRECONDITION_FAILED
+    default_detail = 'The resource was modified since you read it; reload and try again.'
+    default_code = 'precondition_failed'
+
+
+class EditConflict(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = 'The resource was modified concurrently; reload and try again.'
+    default_code = 'conflict'
+
+
+def etag_for(version):
+    return f'"v{version}"'
+
+
+def expected_version(request, instance):
+    """
+    The version a write to instance must be conditional on: the one just read,
+    after checking it against If-Match. Raises PreconditionFailed on a mismatch.
+    """
+    header = request.headers.get('If-Match')
+    if header is not None:
+        # GZipMiddleware sikistirdigi yanitlarin ETag'ini W/ ile zayiflatiyor; surum etiketi
+        # kodlamadan bagimsiz oldugu icin zayiflatilmis hali de ayni surumu gosteriyor
+        tags = {tag.strip().removeprefix('W/') for tag in header.split(',')}
+        if '*' not in tags and etag_for(instance.version) not in tags:
+            raise PreconditionFailed()
+    return instance.version
+
+
+def update_if_version(instance, version, **fields):
+    """
+    UPDATE ... SET fields, version = version + 1 WHERE pk = instance.pk AND version = version.
+
+    Raises VersionConflict when the row has moved on; otherwise mirrors the write on instance.
+    """
+    model = type(instance)
+    updated = model.objects.filter(pk=instance.pk, version=version).update(version=F('version') + 1, **fields)
+    if not updated:
+        raise VersionConflict(f'{model.__name__} #{instance.pk} was modified concurrently; reload and try again.')
+    for name, value in fields.items():
+        setattr(instance, name, value)
+    instance.version = version + 1
+    return instance
+
+
+def guard_order_version(order):
+    """
+    Conditional UPDATE on an item's parent order before the item is written: raises
+    VersionConflict if the order changed (e.g. was cancelled) since it was read.
+
+    The version is left alone because Order.update_total() bumps it once the item
+    write is done; until the transaction commits, the updated row keeps other
+    writers of this order waiting.
+    """
+    if not type(order).objects.filter(pk=order.pk, version=order.version).update(updated_at=timezone.now()):
+        raise VersionConflict(f'Order #{order.pk} was modified concurrently; reload and try again.')
+
+
+class VersionedViewMixin:
+    """
+    ViewSet mixin: ETag on single-object responses and VersionConflict -> 412/409
+    """
+
+    def handle_exception(self, exc):
+        if isinstance(exc, VersionConflict):
+            # If-Match gonderen istemci icin on kosul bozuldu; gondermeyen icin okuma ile yazma arasinda yaris
+            conflict = PreconditionFailed if 'If-Match' in self.request.headers else EditConflict
+            exc = conflict(str(exc))
+        return super().handle_exception(exc)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        data = getattr(response, 'data', None)
+        if getattr(self, 'detail', False) and 200 <= response.status_code < 300 and isinstance(data, dict) and 'version' in data:
+            response['ETag'] = etag_for(data['version'])
+        return response
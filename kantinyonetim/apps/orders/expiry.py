@@ -0,0 +1,99 @@
+import logging
+import threading
+from datetime import timedelta
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+from apps.users.models import User
+from .models import Order
+from .transitions import cancel_orders
+
+logger = logging.getLogger(__name__)
+
+_scheduler_started = False
+_scheduler_lock = threading.Lock()
+
+
+def get_expiry_ttls():
+    """
+    Per-status TTLs in minutes from settings.ORDER_EXPIRY_TTL_MINUTES; falsy values disable a status.
+    A TTL counts from when the order was placed (created_at), not from when it entered the status.
+    """
+    ttls = getattr(settings, 'ORDER_EXPIRY_TTL_MINUTES', {})
+    return {order_status: minutes for order_status, minutes in ttls.items() if minutes}
+
+
+def get_system_user():
+    # audit kayitlari icin bir kullanici gerekiyor; ilk admini kullanma
+    return User.objects.filter(role='admin', is_active=True).order_by('id').first()
+
+
+def find_stale_order_ids(order_status, cutoff, batch_size):
+    # (status, created_at) indeksi uzerinden sinirli aralik taramasi
+    return list(
+        Order.objects.filter(status=order_status, created_at__lt=cutoff)
+        .order_by('created_at')
+        .values_list('id', flat=True)[:batch_size]
+    )
+
+
+def expire_stale_orders(now=None, ttls=None, batch_size=200, actor=None, dry_run=False):
+    """
+    Cancel orders still in a non-terminal status more than that status's TTL
+    minutes after they were placed (created_at), whenever they entered it.
+
+    Returns {status: number of expired orders}.
+    """
+    now = now or timezone.now()
+    ttls = get_expiry_ttls() if ttls is None else ttls
+    actor = actor or get_system_user()
+    if actor is None and not dry_run:
+        raise RuntimeError('No active admin user available to attribute expired orders to.')
+
+    expired = {}
+    for order_status, minutes in ttls.items():
+        cutoff = now - timedelta(minutes=minutes)
+        expired[order_status] = 0
+        while True:
+            ids = find_stale_order_ids(order_status, cutoff, batch_size)
+            if not ids:
+                break
+            if dry_run:
+                expired[order_status] = Order.objects.filter(status=order_status, created_at__lt=cutoff).count()
+                break
+            cancelled, _ = cancel_orders(ids, actor, reason=f'expired: still {order_status} {minutes} minutes after placement')
+            expired[order_status] += len(cancelled)
+            if not cancelled:
+                # ayni batch tekrar gelmesin diye dongu sonlandiriliyor
+                break
+    return expired
+
+
+def _run_scheduler(interval):
+    stop = threading.Event()
+    while not stop.wait(interval):
+        close_old_connections()
+        try:
+            expired = expire_stale_orders()
+            if any(expired.values()):
+                logger.info('Expired stale orders: %s', expired)
+        except Exception:
+            logger.exception('Stale order sweep failed')
+        finally:
+            close_old_connections()
+
+
+def start_expiry_scheduler(interval=None):
+    """
+    Run the sweeper every `interval` seconds in a daemon thread (once per process)
+    """
+    global _scheduler_started
+    interval = interval or getattr(settings, 'ORDER_EXPIRY_INTERVAL_SECONDS', 0)
+    if not interval:
+        return False
+    with _scheduler_lock:
+        if _scheduler_started:
+            return False
+        threading.Thread(target=_run_scheduler, args=(interval,), name='order-expiry', daemon=True).start()
+        _scheduler_started = True
+    return True
@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand, CommandError
+from apps.users.models import User
+from apps.orders.expiry import expire_stale_orders, get_expiry_ttls
+
+
+class Command(BaseCommand):
+    help = 'Cancels orders still pending/ready more than their status TTL after placement and releases their stock.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=200)
+        parser.add_argument('--user', help='Username recorded in the audit log (default: first admin).')
+        parser.add_argument(
+            '--ttl', action='append', default=[], metavar='STATUS=MINUTES',
+            help='Override a status TTL, e.g. --ttl pending=60 (0 disables the status). May be repeated.',
+        )
+        parser.add_argument('--dry-run', action='store_true', help='Only count stale orders.')
+
+    def handle(self, *args, **options):
+        ttls = get_expiry_ttls()
+        for override in options['ttl']:
+            try:
+                order_status, minutes = override.split('=', 1)
+                minutes = int(minutes)
+            except ValueError:
+                raise CommandError(f'Invalid --ttl value "{override}", expected STATUS=MINUTES.')
+            if minutes < 0:
+                raise CommandError(f'Invalid --ttl value "{override}", MINUTES must be >= 0.')
+            # 0 disables a status, as in ORDER_EXPIRY_TTL_MINUTES (a 0 minute cutoff would cancel everything)
+            if minutes:
+                ttls[order_status] = minutes
+            else:
+                ttls.pop(order_status, None)
+
+        actor = None
+        if options['user']:
+            try:
+                actor = User.objects.get(username=options['user'])
+            except User.DoesNotExist:
+                raise CommandError(f'User "{options["user"]}" not found.')
+
+        try:
+            expired = expire_stale_orders(ttls=ttls, batch_size=options['batch_size'], actor=actor, dry_run=options['dry_run'])
+        except RuntimeError as e:
+            raise CommandError(str(e))
+
+        for order_status, count in expired.items():
+            verb = 'bulundu' if options['dry_run'] else 'iptal edildi'
+            self.stdout.write(f'{order_status}: {count} sipariş {verb}')
+        self.stdout.write(self.style.SUCCESS('Süresi dolan sipariş taraması tamamlandı.'))
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 18:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0006_order_notes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='version',
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.AddField(
+            model_name='orderitem',
+            name='version',
+            field=models.PositiveIntegerField(default=1),
+        ),
+    ]
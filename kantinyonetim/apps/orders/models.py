@@ -1,4 +1,6 @@
 from django.db import models
+from django.db.models import F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
 from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 from django.utils import timezone
@@ -22,6 +24,9 @@ class Order(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     notes = models.TextField(blank=True, null=True)
+    # her yazmada artiyor; kosullu UPDATE ... WHERE version = n ve ETag/If-Match icin
+    version = models.PositiveIntegerField(default=1)
+
     class Meta:
         ordering = ['-created_at']
         indexes = [
@@ -34,8 +39,14 @@ class Order(models.Model):
         return f"Order {self.id} by {self.user.username} - {self.status}"
 
     def update_total(self):
-        self.total = sum(item.line_total for item in self.order_items.all())
-        self.save(update_fields=['total'])
+        # toplam tek UPDATE icinde veritabaninda hesaplaniyor; eszamanli iki kalem degisikligi birbirinin toplamini ezemez
+        line_totals = OrderItem.objects.filter(order=OuterRef('pk')).values('order').annotate(total=Sum('line_total')).values('total')
+        Order.objects.filter(pk=self.pk).update(
+            total=Coalesce(Subquery(line_totals), Value(Decimal('0')), output_field=models.DecimalField(max_digits=10, decimal_places=2)),
+            version=F('version') + 1,
+            updated_at=timezone.now(),
+        )
+        self.total, self.version, self.updated_at = Order.objects.filter(pk=self.pk).values_list('total', 'version', 'updated_at').get()
 
 
 class OrderItem(models.Model):
@@ -46,6 +57,7 @@ class OrderItem(models.Model):
     price_at_order_time = models.DecimalField(max_digits=10, decimal_places=2)
     line_total = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     created_at = models.DateTimeField(auto_now_add=True)
+    version = models.PositiveIntegerField(default=1)
 
     class Meta:
         indexes = [
@@ -72,6 +84,9 @@ def update_order_total_on_item_save(sender, instance, **kwargs):
     instance.order.update_total()
 
 @receiver(post_delete, sender=OrderItem)
-def update_order_total_on_item_delete(sender, instance, **kwargs):
+def update_order_total_on_item_delete(sender, instance, origin=None, **kwargs):
+    # siparisin kendisi (veya sahibi) siliniyorsa cascade ile gelen her oge icin toplam hesaplamaya gerek yok
+    if isinstance(origin, (Order, User)):
+        return
     # siparis ogesi silindiginde siparis toplamini guncelleme
     instance.order.update_total()
\ No newline at end of file
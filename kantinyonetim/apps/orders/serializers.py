@@ -1,7 +1,8 @@
 from rest_framework import serializers
-from django.db import transaction
+from kantinyonetim.db import write_transaction, retry_on_locked
 from decimal import Decimal
 from .models import Order, OrderItem
+from .concurrency import guard_order_version, update_if_version
 from apps.stock.models import Stock
 from apps.menu.models import MenuItem
 from apps.users.utils import log_user_action
@@ -27,9 +28,12 @@ class OrderSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Order
-        fields = ['id', 'user', 'user_username', 'status', 'created_at', 'updated_at', 'order_items', 'total','notes']
+        fields = ['id', 'user', 'user_username', 'status', 'created_at', 'updated_at', 'order_items', 'total','notes', 'version']
         extra_kwargs = {
             'user': {'read_only': True},
+            'version': {'read_only': True},
+            # status sadece transitions modulu ile degisir
+            'status': {'read_only': True},
         }
 
     def get_total(self, obj: Order):
@@ -47,6 +51,7 @@ class OrderItemSerializer(serializers.ModelSerializer):
         extra_kwargs = {
             # input icin zorunlu degil ama admin/staff yazarsa override eder yeni fiyat olur indirim vb icin
             'price_at_order_time': {'required': False},
+            'version': {'read_only': True},
         }
 
     def validate(self, attrs):
@@ -81,11 +86,14 @@ class OrderItemSerializer(serializers.ModelSerializer):
                 raise serializers.ValidationError({'quantity': f'No stock information for {menu_item.name}.'})
         return attrs
 
-    @transaction.atomic
+    @retry_on_locked()
+    @write_transaction()
     def create(self, validated_data):
         request = self.context.get('request')
         menu_item: MenuItem = validated_data['menu_item']
         quantity: int = validated_data['quantity']
+        # validate() siparisi bu istekte okudu; o zamandan beri iptal/duzenleme olduysa VersionConflict
+        guard_order_version(validated_data['order'])
         stock = Stock.objects.select_for_update().get(menu_item=menu_item)
         if stock.quantity < quantity:
             raise serializers.ValidationError({'quantity': 'Insufficient stock.'})
@@ -107,7 +115,7 @@ class OrderItemSerializer(serializers.ModelSerializer):
             validated_data['price_at_order_time'] = menu_item.price
 
         # varsa varolan line ile birlestir. unique order line
-        existing = OrderItem.objects.select_for_update().filter(order=validated_data['order'], menu_item=menu_item).first()
+        existing = OrderItem.objects.filter(order=validated_data['order'], menu_item=menu_item).first()
         if existing:
             # varolan snapshotla cakisiyor mu check
             new_price = validated_data['price_at_order_time']
@@ -119,8 +127,9 @@ class OrderItemSerializer(serializers.ModelSerializer):
             if stock.quantity < combined_quantity:
                 raise serializers.ValidationError({'quantity': 'Insufficient stock for combined quantity.'})
 
-            existing.quantity = combined_quantity # birlestirilmis quantityi assign et
-            existing.save(update_fields=['quantity'])
+            # birlestirilmis quantity; satir kilidi yerine kosullu UPDATE
+            update_if_version(existing, existing.version, quantity=combined_quantity, line_total=combined_quantity * existing.price_at_order_time)
+            validated_data['order'].update_total()
             # stocktan dusme
             stock.quantity -= quantity
             stock.save()
@@ -149,9 +158,14 @@ class OrderItemSerializer(serializers.ModelSerializer):
         )
         return order_item
 
+    @retry_on_locked()
+    @write_transaction()
     def update(self, instance, validated_data):
         request = self.context.get('request')
-        
+        # view If-Match'ten gelen surumu save(version=...) ile veriyor
+        version = validated_data.pop('version', instance.version)
+        guard_order_version(instance.order)
+
         # Disallow changing the parent order reference via update
         if 'order' in validated_data:
             raise serializers.ValidationError({'order': 'Changing the order reference is not allowed.'})
@@ -205,6 +219,16 @@ class OrderItemSerializer(serializers.ModelSerializer):
         elif new_menu_item != instance.menu_item:
             validated_data['price_at_order_time'] = new_menu_item.price
 
-        return super().update(instance, validated_data)
+        price = validated_data.get('price_at_order_time', instance.price_at_order_time)
+        update_if_version(
+            instance, version,
+            menu_item=new_menu_item,
+            quantity=new_quantity,
+            price_at_order_time=price,
+            line_total=new_quantity * price,
+        )
+        # queryset update sinyal calistirmiyor; toplami burada guncelleme
+        instance.order.update_total()
+        return instance
 
         
\ No newline at end of file
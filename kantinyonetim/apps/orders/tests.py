@@ -1,11 +1,25 @@
+import io
+from datetime import date, timedelta
 from decimal import Decimal
+from django.db import OperationalError, connection
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from kantinyonetim.db import write_transaction, retry_on_locked
 from django.urls import reverse
 from rest_framework.test import APITestCase
 from rest_framework import status
-from apps.users.models import User
+from apps.users.models import User, AuditLog, Notification
 from apps.menu.models import MenuItem
 from apps.stock.models import Stock
 from apps.orders.models import Order, OrderItem
+from apps.orders.expiry import expire_stale_orders
+from apps.orders.concurrency import update_if_version
+from apps.orders.transitions import VersionConflict
+from apps.orders.views import OrderItemViewSet, OrderViewSet
+from apps.users.throttling import reset_rate_limits
+from kantinyonetim.query_budget import QueryBudgetMixin
 
 
 class OrderFlowTests(APITestCase):
@@ -164,3 +178,320 @@ class OrderFlowTests(APITestCase):
         # stock should remain 9
         self.stock_burger.refresh_from_db()
         self.assertEqual(self.stock_burger.quantity, 9)
+
+
+class OrderTransitionTests(APITestCase):
+    def setUp(self):
+        self.staff = User.objects.create(username='staff', role='staff', is_staff=True)
+        self.staff.set_password('staffpass')
+        self.staff.save()
+        self.customer = User.objects.create(username='cust', role='customer')
+        self.burger = MenuItem.objects.create(name='Burger', description='Beef burger', price=Decimal('10.00'), is_available=True)
+        Stock.objects.create(menu_item=self.burger, quantity=10)
+
+        res = self.client.post('/api/token/', {'username': 'staff', 'password': 'staffpass'}, format='json')
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {res.data['access']}")
+
+    def test_status_change_writes_one_audit_and_one_notification(self):
+        order = Order.objects.create(user=self.customer)
+        res = self.client.patch(f'/api/orders/{order.id}/', {'status': 'preparing'}, format='json')
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['status'], 'preparing')
+        self.assertEqual(AuditLog.objects.filter(action='order_status_changed', resource_id=order.id).count(), 1)
+        self.assertEqual(Notification.objects.filter(recipient=self.customer, resource_id=order.id).count(), 1)
+
+    def test_terminal_and_unknown_statuses_are_rejected(self):
+        order = Order.objects.create(user=self.customer, status='completed')
+        res = self.client.patch(f'/api/orders/{order.id}/', {'status': 'pending'}, format='json')
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        res = self.client.patch(f'/api/orders/{order.id}/', {'status': 'eaten'}, format='json')
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        order.refresh_from_db()
+        self.assertEqual(order.status, 'completed')
+
+    def test_bulk_status_advances_many_orders(self):
+        orders = [Order.objects.create(user=self.customer, status='preparing') for _ in range(3)]
+        done = Order.objects.create(user=self.customer, status='cancelled')
+        ids = [o.id for o in orders] + [done.id, 9999]
+        res = self.client.post('/api/orders/bulk-status/', {'ids': ids, 'status': 'ready'}, format='json')
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(sorted(res.data['updated']), [o.id for o in orders])
+        self.assertIn(str(done.id), res.data['skipped'])
+        self.assertIn('9999', res.data['skipped'])
+        self.assertEqual(Order.objects.filter(status='ready').count(), 3)
+        self.assertEqual(AuditLog.objects.filter(action='order_status_changed').count(), 3)
+        self.assertEqual(Notification.objects.filter(recipient=self.customer).count(), 3)
+
+    def test_bulk_cancel_restocks_per_menu_item(self):
+        pending = Order.objects.create(user=self.customer)
+        OrderItem.objects.create(order=pending, menu_item=self.burger, quantity=2, price_at_order_time=self.burger.price)
+        preparing = Order.objects.create(user=self.customer, status='preparing')
+        OrderItem.objects.create(order=preparing, menu_item=self.burger, quantity=3, price_at_order_time=self.burger.price)
+        ready = Order.objects.create(user=self.customer, status='ready')
+        OrderItem.objects.create(order=ready, menu_item=self.burger, quantity=1, price_at_order_time=self.burger.price)
+        completed = Order.objects.create(user=self.customer, status='completed')
+
+        res = self.client.post('/api/orders/bulk-cancel/', {'ids': [pending.id, preparing.id, ready.id, completed.id]}, format='json')
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(sorted(res.data['cancelled']), [pending.id, preparing.id, ready.id])
+        self.assertIn(str(completed.id), res.data['skipped'])
+        # ready siparisler stok iadesi almiyor
+        self.assertEqual(Stock.objects.get(menu_item=self.burger).quantity, 15)
+        self.assertEqual(Order.objects.filter(status='cancelled').count(), 3)
+        self.assertEqual(Notification.objects.filter(title='Order Cancelled').count(), 3)
+
+    def test_status_cancel_goes_through_restock(self):
+        order = Order.objects.create(user=self.customer)
+        OrderItem.objects.create(order=order, menu_item=self.burger, quantity=4, price_at_order_time=self.burger.price)
+        res = self.client.patch(f'/api/orders/{order.id}/', {'status': 'cancelled'}, format='json')
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(Stock.objects.get(menu_item=self.burger).quantity, 14)
+
+
+class OrderConcurrencyTests(APITestCase):
+    def setUp(self):
+        self.staff = User.objects.create_user(username='staff', password='staffpass', role='staff')
+        self.customer = User.objects.create_user(username='cust', password='custpass', role='customer')
+        self.burger = MenuItem.objects.create(name='Burger', description='Beef burger', price=Decimal('10.00'), is_available=True)
+        Stock.objects.create(menu_item=self.burger, quantity=10)
+        self.order = Order.objects.create(user=self.customer)
+        self.line = OrderItem.objects.create(order=self.order, menu_item=self.burger, quantity=2, price_at_order_time=self.burger.price)
+        reset_rate_limits()
+        self.addCleanup(reset_rate_limits)
+        res = self.client.post('/api/token/', {'username': 'staff', 'password': 'staffpass'}, format='json')
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {res.data['access']}")
+
+    def test_order_detail_etag_and_if_match(self):
+        res = self.client.get(f'/api/orders/{self.order.id}/')
+        etag = res['ETag']
+        self.assertEqual(etag, f'"v{res.data["version"]}"')
+
+        res = self.client.patch(f'/api/orders/{self.order.id}/', {'notes': 'no onions'}, format='json', HTTP_IF_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(res['ETag'], etag)
+
+        # ayni eski etag ile ikinci yazma kaybolan guncelleme olurdu
+        res = self.client.patch(f'/api/orders/{self.order.id}/', {'status': 'preparing'}, format='json', HTTP_IF_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_412_PRECONDITION_FAILED)
+        res = self.client.post(f'/api/orders/{self.order.id}/cancel/', HTTP_IF_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_412_PRECONDITION_FAILED)
+        self.order.refresh_from_db()
+        self.assertEqual((self.order.status, self.order.notes), ('pending', 'no onions'))
+        self.assertEqual(Stock.objects.get(menu_item=self.burger).quantity, 10)
+
+    def test_stale_item_edit_is_rejected_and_rolled_back(self):
+        etag = self.client.get(f'/api/order-items/{self.line.id}/')['ETag']
+        res = self.client.patch(f'/api/order-items/{self.line.id}/', {'quantity': 3}, format='json', HTTP_IF_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        res = self.client.patch(f'/api/order-items/{self.line.id}/', {'quantity': 5}, format='json', HTTP_IF_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_412_PRECONDITION_FAILED)
+        # stok dusumu de geri aliniyor
+        self.assertEqual(Stock.objects.get(menu_item=self.burger).quantity, 9)
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.total, Decimal('30.00'))
+
+    def test_order_responses_are_private_and_revalidated(self):
+        res = self.client.get('/api/orders/')
+        self.assertIn('private', res['Cache-Control'])
+        self.assertIn('Authorization', res['Vary'])
+        etag = res['ETag']
+        self.assertEqual(self.client.get('/api/orders/', HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_304_NOT_MODIFIED)
+
+        detail_etag = self.client.get(f'/api/orders/{self.order.id}/')['ETag']
+        self.assertEqual(self.client.get(f'/api/orders/{self.order.id}/', HTTP_IF_NONE_MATCH=detail_etag).status_code, status.HTTP_304_NOT_MODIFIED)
+
+        # gzip ile zayiflatilan surum etiketi If-Match icin hala gecerli
+        res = self.client.patch(f'/api/orders/{self.order.id}/', {'notes': 'no onions'}, format='json', HTTP_IF_MATCH=f'W/{detail_etag}')
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.client.get('/api/orders/', HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_200_OK)
+
+    def test_list_etags_follow_related_rows(self):
+        # stok ve siparis listeleri menu adini, siparisler username'i da gosteriyor
+        etags = {url: self.client.get(url)['ETag'] for url in ('/api/orders/', '/api/stock/')}
+        res = self.client.patch(f'/api/menu-items/{self.burger.id}/', {'name': 'Cheeseburger'}, format='multipart')
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        for url, etag in etags.items():
+            res = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(res.status_code, status.HTTP_200_OK, url)
+            self.assertIn('Cheeseburger', res.content.decode())
+
+        etag = self.client.get('/api/orders/')['ETag']
+        self.customer.username = 'renamed'
+        self.customer.save()
+        res = self.client.get('/api/orders/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data[0]['user_username'], 'renamed')
+
+    def test_conditional_update_and_total(self):
+        stale = Order.objects.get(pk=self.order.pk)
+        update_if_version(self.order, self.order.version, notes='first')
+        with self.assertRaises(VersionConflict):
+            update_if_version(stale, stale.version, notes='second')
+        self.assertEqual(Order.objects.get(pk=self.order.pk).notes, 'first')
+
+        # toplam satirlardan veritabaninda hesaplaniyor; bellekteki eski toplam ezemiyor
+        OrderItem.objects.filter(pk=self.line.pk).update(quantity=4, line_total=Decimal('40.00'))
+        version = self.order.version
+        stale.update_total()
+        self.assertEqual(stale.total, Decimal('40.00'))
+        self.assertEqual(Order.objects.get(pk=self.order.pk).version, version + 1)
+
+
+class OrderExpiryTests(APITestCase):
+    def setUp(self):
+        self.admin = User.objects.create(username='admin', role='admin', is_staff=True)
+        self.customer = User.objects.create(username='cust', role='customer')
+        self.burger = MenuItem.objects.create(name='Burger', description='Beef burger', price=Decimal('10.00'), is_available=True)
+        Stock.objects.create(menu_item=self.burger, quantity=10)
+
+    def make_order(self, order_status, minutes_ago, quantity=1):
+        order = Order.objects.create(user=self.customer, status=order_status)
+        OrderItem.objects.create(order=order, menu_item=self.burger, quantity=quantity, price_at_order_time=self.burger.price)
+        Order.objects.filter(id=order.id).update(created_at=timezone.now() - timedelta(minutes=minutes_ago))
+        return order
+
+    def test_expires_only_stale_orders_in_batches(self):
+        stale = [self.make_order('pending', 90, quantity=2) for _ in range(3)]
+        fresh = self.make_order('pending', 5)
+        stale_ready = self.make_order('ready', 300)
+
+        expired = expire_stale_orders(ttls={'pending': 60, 'ready': 240}, batch_size=2)
+        self.assertEqual(expired, {'pending': 3, 'ready': 1})
+        self.assertEqual(Order.objects.filter(id__in=[o.id for o in stale], status='cancelled').count(), 3)
+        fresh.refresh_from_db()
+        self.assertEqual(fresh.status, 'pending')
+        stale_ready.refresh_from_db()
+        self.assertEqual(stale_ready.status, 'cancelled')
+        # pending siparislerin stogu geri veriliyor, ready siparislerinki verilmiyor
+        self.assertEqual(Stock.objects.get(menu_item=self.burger).quantity, 16)
+        self.assertTrue(AuditLog.objects.filter(user=self.admin, details__reason__startswith='expired').exists())
+
+    def test_zero_ttl_override_disables_the_status(self):
+        fresh = self.make_order('pending', 5)
+        stale_ready = self.make_order('ready', 300)
+        call_command('expire_stale_orders', '--ttl', 'pending=0', stdout=io.StringIO())
+        fresh.refresh_from_db()
+        self.assertEqual(fresh.status, 'pending')
+        stale_ready.refresh_from_db()
+        self.assertEqual(stale_ready.status, 'cancelled')
+
+
+class WriteTransactionTests(TransactionTestCase):
+    def test_write_transaction_begins_immediate_on_sqlite(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('BEGIN IMMEDIATE is SQLite specific')
+        with CaptureQueriesContext(connection) as ctx:
+            with write_transaction():
+                User.objects.create(username='writer')
+        self.assertEqual(ctx.captured_queries[0]['sql'], 'BEGIN IMMEDIATE')
+
+    def test_retry_on_locked_retries_then_succeeds(self):
+        calls = []
+
+        @retry_on_locked(attempts=3, base_delay=0)
+        def flaky():
+            calls.append(1)
+            if len(calls) < 3:
+                raise OperationalError('database is locked')
+            return 'ok'
+
+        self.assertEqual(flaky(), 'ok')
+        self.assertEqual(len(calls), 3)
+
+    def test_retry_on_locked_ignores_other_errors(self):
+        @retry_on_locked(attempts=3, base_delay=0)
+        def broken():
+            raise OperationalError('no such table: nope')
+
+        with self.assertRaises(OperationalError):
+            broken()
+
+
+class SyntheticDataCommandTests(TestCase):
+    def generate(self, **options):
+        call_command(
+            'generate_synthetic_data', customers=20, staff=3, admins=1, menu_items=8, orders=150,
+            days=10, end='2025-03-14', batch_size=40, stdout=io.StringIO(), **options,
+        )
+        return list(Order.objects.order_by('id').values_list('total', 'status', 'created_at'))
+
+    def test_same_seed_gives_same_history(self):
+        first = self.generate()
+        self.assertEqual(len(first), 150)
+        self.assertTrue(all(created.date() <= date(2025, 3, 14) for _, _, created in first))
+        self.assertEqual(OrderItem.objects.filter(order__total=0).count(), 0)
+        # her siparis 3 staff + 1 admine bildiriliyor, uygulamadaki gibi
+        self.assertEqual(Notification.objects.filter(notification_type='order_new', title='New Order Received', priority='high').count(), 600)
+        self.assertEqual(self.generate(reset=True), first)
+
+    def test_staff_notifications_override(self):
+        self.generate(staff_notifications=2)
+        self.assertEqual(Notification.objects.filter(notification_type='order_new').count(), 300)
+
+
+class OrderQueryBudgetTests(QueryBudgetMixin, APITestCase):
+    def setUp(self):
+        self.staff = User.objects.create_user(username='staff', password='staffpass', role='staff')
+        self.customer = User.objects.create_user(username='cust', password='custpass', role='customer')
+        self.items = [MenuItem.objects.create(name=f'Item {i}', price=Decimal('5.00')) for i in range(6)]
+        Stock.objects.bulk_create([Stock(menu_item=item, quantity=100) for item in self.items])
+        self.orders = []
+        for _ in range(4):
+            order = Order.objects.create(user=self.customer)
+            for item in self.items[:3]:
+                OrderItem.objects.create(order=order, menu_item=item, quantity=1, price_at_order_time=item.price)
+            self.orders.append(order)
+        reset_rate_limits()
+        self.addCleanup(reset_rate_limits)
+
+    def auth(self, username, password):
+        res = self.client.post('/api/token/', {'username': username, 'password': password}, format='json')
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {res.data['access']}")
+
+    def test_order_actions_stay_within_budget(self):
+        first, second, third, fourth = self.orders
+        self.auth('cust', 'custpass')
+        cart = {'items': [{'menu_item': item.id, 'qty': 2} for item in self.items]}
+        self.assertRequestWithinBudget(OrderViewSet, 'create_from_cart', 'post', '/api/orders/create-from-cart/', cart)
+        self.assertRequestWithinBudget(OrderViewSet, 'cancel', 'post', f'/api/orders/{fourth.id}/cancel/')
+
+        self.auth('staff', 'staffpass')
+        self.assertRequestWithinBudget(OrderViewSet, 'list', 'get', '/api/orders/')
+        self.assertRequestWithinBudget(OrderViewSet, 'retrieve', 'get', f'/api/orders/{first.id}/')
+        self.assertRequestWithinBudget(OrderViewSet, 'update', 'put', f'/api/orders/{first.id}/', {'notes': 'no onions'})
+        self.assertRequestWithinBudget(OrderViewSet, 'partial_update', 'patch', f'/api/orders/{first.id}/', {'status': 'preparing'})
+        self.assertRequestWithinBudget(OrderViewSet, 'bulk_status', 'post', '/api/orders/bulk-status/', {'ids': [first.id, second.id], 'status': 'ready'})
+        self.assertRequestWithinBudget(OrderViewSet, 'bulk_cancel', 'post', '/api/orders/bulk-cancel/', {'ids': [third.id]})
+        self.assertRequestWithinBudget(OrderViewSet, 'reassign', 'post', f'/api/orders/{second.id}/reassign/', {'user': self.staff.id})
+        self.assertRequestWithinBudget(OrderViewSet, 'destroy', 'delete', f'/api/orders/{third.id}/')
+
+    def test_create_from_cart_budget_does_not_grow_with_cart_size(self):
+        self.auth('cust', 'custpass')
+        for size in (1, len(self.items)):
+            cart = {'items': [{'menu_item': item.id, 'qty': 1} for item in self.items[:size]]}
+            self.assertRequestWithinBudget(OrderViewSet, 'create_from_cart', 'post', '/api/orders/create-from-cart/', cart)
+        order = Order.objects.order_by('-id').first()
+        self.assertEqual(order.total, Decimal('30.00'))
+        self.assertEqual(Stock.objects.get(menu_item=self.items[0]).quantity, 98)
+
+    def test_create_from_cart_accepts_string_ids(self):
+        self.auth('cust', 'custpass')
+        cart = {'items': [{'menu_item': str(self.items[0].id), 'qty': 1}, {'menu_item': self.items[0].id, 'qty': 1}]}
+        res = self.client.post('/api/orders/create-from-cart/', cart, format='json')
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Stock.objects.get(menu_item=self.items[0]).quantity, 98)
+        res = self.client.post('/api/orders/create-from-cart/', {'items': [{'menu_item': 'abc', 'qty': 1}]}, format='json')
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_order_item_actions_stay_within_budget(self):
+        order = self.orders[0]
+        line = order.order_items.first()
+        self.auth('staff', 'staffpass')
+        self.assertRequestWithinBudget(OrderItemViewSet, 'list', 'get', '/api/order-items/')
+        self.assertRequestWithinBudget(OrderItemViewSet, 'retrieve', 'get', f'/api/order-items/{line.id}/')
+        self.assertRequestWithinBudget(OrderItemViewSet, 'create', 'post', '/api/order-items/', {'order': order.id, 'menu_item': self.items[4].id, 'quantity': 1})
+        self.assertRequestWithinBudget(OrderItemViewSet, 'update', 'put', f'/api/order-items/{line.id}/', {'quantity': 2})
+        self.assertRequestWithinBudget(OrderItemViewSet, 'partial_update', 'patch', f'/api/order-items/{line.id}/', {'quantity': 3})
+        self.assertRequestWithinBudget(OrderItemViewSet, 'cancel', 'post', f'/api/order-items/{line.id}/cancel/', {'quantity': 1})
+        self.assertRequestWithinBudget(OrderItemViewSet, 'destroy', 'delete', f'/api/order-items/{line.id}/')
@@ -0,0 +1,304 @@
+from django.db.models import Case, F, IntegerField, Sum, Value, When
+from django.utils import timezone
+from kantinyonetim.db import write_transaction, retry_on_locked
+from apps.stock.models import Stock
+from apps.users.models import AuditLog, Notification
+from apps.users.utils import request_audit_meta
+from apps.analytics.rollups import record_completed_orders
+from .models import Order, OrderItem
+
+# her durumdan gecilebilecek durumlar; completed ve cancelled son durumlar
+ALLOWED_TRANSITIONS = {
+    'pending': {'preparing', 'ready', 'completed', 'cancelled'},
+    'preparing': {'pending', 'ready', 'completed', 'cancelled'},
+    'ready': {'preparing', 'completed', 'cancelled'},
+    'completed': set(),
+    'cancelled': set(),
+}
+
+# tek istekte ilerletilebilecek en fazla siparis sayisi
+BULK_TRANSITION_LIMIT = 200
+
+# stok siparis verilirken dusuluyor; bu durumlardaki iptaller stogu geri veriyor
+RESTOCK_ON_CANCEL_STATUSES = ('pending', 'preparing')
+
+
+class TransitionError(Exception):
+    pass
+
+
+class InvalidTransition(TransitionError):
+    pass
+
+
+class TransitionConflict(TransitionError):
+    pass
+
+
+class VersionConflict(TransitionError):
+    """
+    The row's version is no longer the one the caller read (or named in If-Match)
+    """
+
+
+def can_transition(old_status, new_status):
+    return new_status in ALLOWED_TRANSITIONS.get(old_status, set())
+
+
+def check_transition(old_status, new_status):
+    """
+    Raise InvalidTransition if old_status -> new_status is not allowed
+    """
+    if new_status not in ALLOWED_TRANSITIONS:
+        raise InvalidTransition(f'Unknown status "{new_status}".')
+    if old_status == new_status:
+        raise InvalidTransition(f'Order status is already {new_status}.')
+    if not can_transition(old_status, new_status):
+        raise InvalidTransition(f'Cannot change status from {old_status} to {new_status}.')
+
+
+def _record_transitions(changes, new_status, changed_by, request=None):
+    """
+    Write exactly one audit row and one customer notification per transition, in two INSERTs
+    """
+    ip_address, agent_id = request_audit_meta(request)
+    AuditLog.objects.bulk_create([
+        AuditLog(
+            user=changed_by,
+            action='order_status_changed',
+            resource_type='order',
+            resource_id=order.id,
+            details={
+                'order_id': order.id,
+                'old_status': old_status,
+                'new_status': new_status,
+                'customer': order.user.username,
+            },
+            ip_address=ip_address,
+            agent_id=agent_id,
+        )
+        for order, old_status in changes
+    ])
+    Notification.objects.bulk_create([
+        Notification(
+            recipient_id=order.user_id,
+            notification_type='order_status',
+            title='Order Status Updated',
+            message=f'Your order #{order.id} status changed from {old_status} to {new_status}',
+            priority='medium',
+            resource_type='order',
+            resource_id=order.id,
+        )
+        for order, old_status in changes
+    ])
+    if new_status == 'completed':
+        record_completed_orders(order for order, _ in changes)
+
+
+@retry_on_locked()
+@write_transaction()
+def transition_order(order, new_status, changed_by, request=None, expected_version=None):
+    """
+    Move a single order to new_status with a conditional UPDATE ... WHERE status = old.
+
+    Raises InvalidTransition for disallowed moves and TransitionConflict if the
+    order's status was changed by someone else in the meantime. With
+    expected_version the UPDATE is also conditional on the row version and a
+    lost race raises VersionConflict instead.
+    """
+    old_status = order.status
+    check_transition(old_status, new_status)
+    conflict = TransitionConflict if expected_version is None else VersionConflict
+    if new_status == 'cancelled':
+        # iptal stok iadesi gerektiriyor; ayni yol uzerinden gitme
+        queryset = None if expected_version is None else Order.objects.filter(version=expected_version)
+        cancelled, skipped = cancel_orders([order.pk], changed_by, request, queryset=queryset)
+        if skipped:
+            raise conflict(f'Order #{order.pk} was modified concurrently; reload and try again.')
+        order.status, order.updated_at, order.version = cancelled[0].status, cancelled[0].updated_at, cancelled[0].version
+        return order
+    now = timezone.now()
+    lookup = {'pk': order.pk, 'status': old_status}
+    if expected_version is not None:
+        lookup['version'] = expected_version
+    updated = Order.objects.filter(**lookup).update(status=new_status, updated_at=now, version=F('version') + 1)
+    if not updated:
+        raise conflict(f'Order #{order.pk} was modified concurrently; reload and try again.')
+    order.status = new_status
+    order.updated_at = now
+    order.version = (order.version if expected_version is None else expected_version) + 1
+    _record_transitions([(order, old_status)], new_status, changed_by, request)
+    return order
+
+
+@retry_on_locked()
+@write_transaction()
+def bulk_transition(order_ids, new_status, changed_by, request=None):
+    """
+    Move many orders to new_status with one conditional UPDATE per current status.
+
+    Returns (transitioned_orders, skipped) where skipped maps order id -> reason.
+    """
+    if new_status not in ALLOWED_TRANSITIONS:
+        raise InvalidTransition(f'Unknown status "{new_status}".')
+    if new_status == 'cancelled':
+        return cancel_orders(order_ids, changed_by, request)
+    order_ids = list(dict.fromkeys(order_ids))
+    if len(order_ids) > BULK_TRANSITION_LIMIT:
+        raise InvalidTransition(f'At most {BULK_TRANSITION_LIMIT} orders can be updated at once.')
+
+    orders = {
+        order.id: order
+        for order in Order.objects.select_related('user').filter(id__in=order_ids).only(
+            'id', 'status', 'total', 'created_at', 'version', 'user__username'
+        )
+    }
+    skipped = {order_id: 'Order not found.' for order_id in order_ids if order_id not in orders}
+
+    by_status = {}
+    for order in orders.values():
+        if can_transition(order.status, new_status):
+            by_status.setdefault(order.status, []).append(order.id)
+        else:
+            skipped[order.id] = f'Cannot change status from {order.status} to {new_status}.'
+
+    now = timezone.now()
+    changes = []
+    for old_status, ids in by_status.items():
+        Order.objects.filter(id__in=ids, status=old_status).update(status=new_status, updated_at=now, version=F('version') + 1)
+        # updated_at damgasi bu istegin guncelledigi satirlari ayirt ediyor
+        won = set(Order.objects.filter(id__in=ids, status=new_status, updated_at=now).values_list('id', flat=True))
+        for order_id in ids:
+            order = orders[order_id]
+            if order_id in won:
+                order.status = new_status
+                order.updated_at = now
+                order.version += 1
+                changes.append((order, old_status))
+            else:
+                skipped[order_id] = 'Order was modified concurrently.'
+
+    if changes:
+        _record_transitions(changes, new_status, changed_by, request)
+    return [order for order, _ in changes], skipped
+
+
+def restock_orders(order_ids):
+    """
+    Return the stock held by the given orders with a single UPDATE, however many
+    menu items they cover.
+
+    Returns {menu_item_id: quantity} of what was put back.
+    """
+    totals = dict(
+        OrderItem.objects.filter(order_id__in=order_ids)
+        .values('menu_item_id')
+        .annotate(total=Sum('quantity'))
+        .values_list('menu_item_id', 'total')
+    )
+    if not totals:
+        return totals
+    # satirlar menu_item_id sirasiyla kilitleniyor; eszamanli restocklar deadlock olmaz
+    list(Stock.objects.select_for_update().filter(menu_item_id__in=list(totals)).order_by('menu_item_id').values_list('id', flat=True))
+    Stock.objects.filter(menu_item_id__in=list(totals)).update(
+        quantity=F('quantity') + Case(
+            *[When(menu_item_id=menu_item_id, then=Value(quantity)) for menu_item_id, quantity in sorted(totals.items())],
+            default=Value(0), output_field=IntegerField(),
+        ),
+        updated_at=timezone.now(),
+    )
+    return totals
+
+
+@retry_on_locked()
+@write_transaction()
+def cancel_orders(order_ids, cancelled_by, request=None, queryset=None, reason=None):
+    """
+    Cancel many orders at once: lock them in one query, restock pending/preparing
+    orders aggregated per menu item, then batch the audit rows and notifications.
+
+    queryset restricts which orders the caller may touch (e.g. a customer's own orders).
+    Returns (cancelled_orders, skipped) where skipped maps order id -> reason.
+    """
+    order_ids = list(dict.fromkeys(order_ids))
+    if len(order_ids) > BULK_TRANSITION_LIMIT:
+        raise InvalidTransition(f'At most {BULK_TRANSITION_LIMIT} orders can be cancelled at once.')
+
+    queryset = Order.objects.all() if queryset is None else queryset
+    orders = {
+        order.id: order
+        for order in queryset.prefetch_related(None).select_for_update(of=('self',)).select_related('user')
+        .filter(id__in=order_ids).only('id', 'status', 'version', 'user__username')
+    }
+    skipped = {order_id: 'Order not found.' for order_id in order_ids if order_id not in orders}
+
+    to_cancel = []
+    for order in orders.values():
+        if can_transition(order.status, 'cancelled'):
+            to_cancel.append(order)
+        else:
+            skipped[order.id] = f'Cannot cancel an order that is {order.status}.'
+    if not to_cancel:
+        return [], skipped
+
+    restock_ids = [order.id for order in to_cancel if order.status in RESTOCK_ON_CANCEL_STATUSES]
+    restock_items = list(
+        OrderItem.objects.filter(order_id__in=restock_ids).select_related('menu_item')
+        .only('id', 'order_id', 'quantity', 'menu_item__name')
+    )
+    restock_orders(restock_ids)
+
+    now = timezone.now()
+    Order.objects.filter(id__in=[order.id for order in to_cancel]).update(status='cancelled', updated_at=now, version=F('version') + 1)
+
+    ip_address, agent_id = request_audit_meta(request)
+    logs = [
+        AuditLog(
+            user=cancelled_by,
+            action='item_cancelled',
+            resource_type='order_item',
+            resource_id=item.id,
+            details={'order_id': item.order_id, 'menu_item': item.menu_item.name, 'cancelled_quantity': item.quantity, 'full_cancellation': True, 'via_order_cancel': True},
+            ip_address=ip_address,
+            agent_id=agent_id,
+        )
+        for item in restock_items
+    ]
+    for order in to_cancel:
+        details = {
+            'order_id': order.id,
+            'old_status': order.status,
+            'new_status': 'cancelled',
+            'customer': order.user.username,
+            'restocked': order.id in restock_ids,
+        }
+        if reason:
+            details['reason'] = reason
+        logs.append(AuditLog(
+            user=cancelled_by,
+            action='order_status_changed',
+            resource_type='order',
+            resource_id=order.id,
+            details=details,
+            ip_address=ip_address,
+            agent_id=agent_id,
+        ))
+    AuditLog.objects.bulk_create(logs)
+    Notification.objects.bulk_create([
+        Notification(
+            recipient_id=order.user_id,
+            notification_type='order_status',
+            title='Order Cancelled',
+            message=f'Your order #{order.id} has been cancelled.',
+            priority='medium',
+            resource_type='order',
+            resource_id=order.id,
+        )
+        for order in to_cancel
+    ])
+
+    for order in to_cancel:
+        order.status = 'cancelled'
+        order.updated_at = now
+        order.version += 1
+    return to_cancel, skipped
@@ -2,19 +2,27 @@ from django.shortcuts import render
 from rest_framework import viewsets, status
 from rest_framework.permissions import IsAuthenticated
 from apps.users.permissions import IsStaffOrAdmin
+from apps.users.throttling import OrderCreateThrottle, VoiceOrderThrottle, voice_admission
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from django.db import transaction
+from kantinyonetim.db import write_transaction, retry_on_locked
+from kantinyonetim.instrumentation import InstrumentedViewMixin
+from kantinyonetim.responses import CachePolicyMixin
 from django.utils import timezone
 from apps.stock.models import Stock
 from apps.users.models import User
 from .models import Order, OrderItem
 from .serializers import OrderSerializer, OrderItemSerializer
-from apps.users.utils import log_user_action, notify_staff_new_order, notify_order_status_change, create_notification
+from .transitions import transition_order, bulk_transition, cancel_orders, can_transition, InvalidTransition, TransitionConflict, VersionConflict
+from .concurrency import VersionedViewMixin, expected_version, guard_order_version, update_if_version
+from apps.users.utils import log_user_action, notify_staff_new_order, create_notification
 from apps.menu.models import MenuItem
+from apps.sync.idempotency import idempotent
+from apps.sync.models import record_tombstones
 import whisper
 import requests
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, permission_classes, throttle_classes
 import json
 import tempfile
 import os
@@ -22,10 +30,27 @@ import time
 import re
 # Create your views here.
 
-class OrderViewSet(viewsets.ModelViewSet):
+class OrderViewSet(CachePolicyMixin, VersionedViewMixin, InstrumentedViewMixin, viewsets.ModelViewSet):
     queryset = Order.objects.all()  # router icin default queryset
     serializer_class = OrderSerializer
     permission_classes = [IsAuthenticated]
+    # kalem degisiklikleri de update_total ile updated_at'i ilerletiyor; serializer menu adlarini ve username'i da gosteriyor
+    etag_field = ('updated_at', 'order_items__menu_item__updated_at', 'user__updated_at')
+    # aksiyon basina en fazla sql sorgusu (auth dahil), satir sayisindan bagimsiz; tests.OrderQueryBudgetTests
+    query_budgets = {
+        'list': 5,
+        'retrieve': 4,
+        'create': 6,
+        'update': 7,
+        'partial_update': 11,
+        'destroy': 12,
+        # Idempotency-Key ile: anahtar sorgusu + kaydi + ic savepoint
+        'create_from_cart': 18,
+        'bulk_status': 10,
+        'cancel': 14,
+        'bulk_cancel': 11,
+        'reassign': 10,
+    }
 
     def get_queryset(self):
         user = self.request.user
@@ -46,8 +71,11 @@ class OrderViewSet(viewsets.ModelViewSet):
         # diger islemler (update/delete) staff/admin ile kisitli
         return [IsStaffOrAdmin()]
    
-    @action(detail=False, methods=['post'], url_path='create-from-cart')
-    @transaction.atomic
+    @action(detail=False, methods=['post'], url_path='create-from-cart', throttle_classes=[OrderCreateThrottle])
+    # cevrimdisi sepetler tekrar gonderilebiliyor: ayni Idempotency-Key ikinci siparis acmiyor
+    @idempotent('create_from_cart')
+    @retry_on_locked()
+    @write_transaction()
     def create_from_cart(self, request):
         user = self.request.user
         cart_items = request.data.get('items', [])
@@ -55,41 +83,65 @@ class OrderViewSet(viewsets.ModelViewSet):
         if not cart_items:
             return Response({'detail': 'Sepetiniz boş.'}, status=status.HTTP_400_BAD_REQUEST)
 
-        # 1. Stok kontrolü
+        # ayni urun birden fazla satirda gelebilir: stok kontrolu toplam adet uzerinden
+        wanted = {}
+        cart_lines = []
         for item_data in cart_items:
-            menu_item_id = item_data.get('menu_item')
-            quantity = item_data.get('qty')
+            # istemciler id'yi "3" gibi metin olarak da gonderebiliyor; stok sozlugu int anahtarli
             try:
-                stock = Stock.objects.select_for_update().get(menu_item_id=menu_item_id)
-                if stock.quantity < quantity:
-                    menu_item = MenuItem.objects.get(id=menu_item_id)
-                    return Response(
-                        {'detail': f'"{menu_item.name}" için stok yetersiz.'},
-                        status=status.HTTP_400_BAD_REQUEST
-                    )
-            except (Stock.DoesNotExist, MenuItem.DoesNotExist):
+                menu_item_id = int(item_data.get('menu_item'))
+            except (TypeError, ValueError):
+                return Response({'detail': 'Ürün ID bir tam sayı olmalı.'}, status=status.HTTP_400_BAD_REQUEST)
+            quantity = item_data.get('qty')
+            if not isinstance(quantity, int) or isinstance(quantity, bool) or quantity <= 0:
+                return Response({'detail': 'Adet pozitif bir tam sayı olmalı.'}, status=status.HTTP_400_BAD_REQUEST)
+            wanted[menu_item_id] = wanted.get(menu_item_id, 0) + quantity
+            cart_lines.append((menu_item_id, quantity))
+
+        # 1. Stok kontrolü: sepet boyutundan bagimsiz tek sorgu
+        stocks = {
+            stock.menu_item_id: stock
+            for stock in Stock.objects.select_for_update().select_related('menu_item')
+            .filter(menu_item_id__in=list(wanted)).order_by('menu_item_id')
+        }
+        for menu_item_id, quantity in wanted.items():
+            stock = stocks.get(menu_item_id)
+            if stock is None:
                 return Response(
                     {'detail': f'ID {menu_item_id} olan ürün bulunamadı veya stok bilgisi yok.'},
                     status=status.HTTP_400_BAD_REQUEST
                 )
+            if stock.quantity < quantity:
+                return Response(
+                    {'detail': f'"{stock.menu_item.name}" için stok yetersiz.'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
 
         # 2. Sipariş oluşturma
         order = Order.objects.create(user=user)
-        for item_data in cart_items:
-            menu_item = MenuItem.objects.get(id=item_data.get('menu_item'))
-            quantity = item_data.get('qty')
-            OrderItem.objects.create(
+        lines = []
+        for menu_item_id, quantity in cart_lines:
+            menu_item = stocks[menu_item_id].menu_item
+            # bulk_create save() ve sinyalleri calistirmaz; line_total burada hesaplaniyor
+            lines.append(OrderItem(
                 order=order,
                 menu_item=menu_item,
                 quantity=quantity,
-                price_at_order_time=menu_item.price
-            )
-            # Stoktan düşme
-            stock = Stock.objects.get(menu_item=menu_item)
-            stock.quantity -= quantity
-            stock.save()
-
-        order.update_total() # Sipariş toplamını güncelle
+                price_at_order_time=menu_item.price,
+                line_total=menu_item.price * quantity,
+            ))
+        OrderItem.objects.bulk_create(lines)
+
+        # Stoktan düşme
+        now = timezone.now()
+        for menu_item_id, quantity in wanted.items():
+            stocks[menu_item_id].quantity -= quantity
+            stocks[menu_item_id].updated_at = now
+        Stock.objects.bulk_update(stocks.values(), ['quantity', 'updated_at'])
+
+        # Sipariş toplamı
+        order.total = sum(line.line_total for line in lines)
+        order.save(update_fields=['total'])
 
         # 3. Loglama ve bildirimler
         log_user_action(
@@ -101,89 +153,96 @@ class OrderViewSet(viewsets.ModelViewSet):
             request=request
         )
         notify_staff_new_order(order, user)
-        # Müşteriye bildirim create_notification ile notify_order_status_change içinde yapılıyor.
-        
+
+        order = self.get_queryset().get(pk=order.pk)
         return Response(OrderSerializer(order, context={'request': request}).data, status=status.HTTP_201_CREATED)
     
+    @retry_on_locked()
+    @write_transaction()
     def update(self, request, *args, **kwargs):
+        partial = kwargs.pop('partial', False)
         instance = self.get_object()
-        old_status = instance.status
-        new_status = request.data.get('status', old_status)
-
-        # eger order zaten cancelled ise status degisikligini engelleme
-        if old_status == 'cancelled' and new_status != 'cancelled':
-            return Response({'detail': 'Cannot change status of a cancelled order.'}, status=status.HTTP_400_BAD_REQUEST)
-        
-        # orderi update etme
-        response = super().update(request, *args, **kwargs)
-        
-        # eger status cancelleddan non-cancelled bir statusa degistiyse is_restockedi resetleme
-        if old_status == 'cancelled' and instance.status != 'cancelled':
-            instance.is_restocked = False
-            instance.save(update_fields=['is_restocked'])
-
-        # status degisti mi kontrol etme
-        if old_status != instance.status:
-            print(f"Order status changed from {old_status} to {instance.status} for order {instance.id}")
-            print(f"User performing update: {request.user.username} (ID: {request.user.id}, IsAuthenticated: {request.user.is_authenticated})")
-            # status degisikligini loglama
-            log_user_action(
-                user=request.user,
-                action='order_status_changed',
-                resource_type='order',
-                resource_id=instance.id,
-                 details={
-                    'old_status': old_status,
-                    'new_status': instance.status,
-                    'customer': instance.user.username
-                 },
-                 request=request
-             )
-            print(f"log_user_action for order status change called.")
-            
-            # bildirimleri gonderme
-            notify_order_status_change(instance, old_status, instance.status, request.user, request)
-        
-        return response
+        # If-Match yoksa okunan surum; her yazma WHERE version = n ile kosullu
+        version = expected_version(request, instance)
+        serializer = self.get_serializer(instance, data=request.data, partial=partial)
+        serializer.is_valid(raise_exception=True)
+
+        # status degisikligi state machine uzerinden: tek audit kaydi, tek bildirim
+        new_status = request.data.get('status')
+        if new_status is not None and new_status != instance.status:
+            try:
+                transition_order(instance, new_status, request.user, request, expected_version=version)
+            except InvalidTransition as e:
+                return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+            except TransitionConflict as e:
+                return Response({'detail': str(e)}, status=status.HTTP_409_CONFLICT)
+
+        # status disindaki alanlar (notes vb.) degistiyse kaydetme; gecis yapildiysa surum bir artmis oluyor
+        if serializer.validated_data:
+            update_if_version(instance, instance.version, updated_at=timezone.now(), **serializer.validated_data)
+        return Response(self.get_serializer(instance).data)
+
+    @action(detail=False, methods=['post'], url_path='bulk-status', permission_classes=[IsStaffOrAdmin])
+    def bulk_status(self, request):
+        """Advance many orders to the same status in one request"""
+        order_ids = request.data.get('ids', [])
+        new_status = request.data.get('status')
+        if not isinstance(order_ids, list) or not order_ids:
+            return Response({'ids': 'A non-empty list of order ids is required.'}, status=status.HTTP_400_BAD_REQUEST)
+        if not new_status:
+            return Response({'status': 'Target status is required.'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            order_ids = [int(order_id) for order_id in order_ids]
+        except (TypeError, ValueError):
+            return Response({'ids': 'Order ids must be integers.'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            transitioned, skipped = bulk_transition(order_ids, new_status, request.user, request)
+        except InvalidTransition as e:
+            return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({
+            'updated': [order.id for order in transitioned],
+            'skipped': {str(order_id): reason for order_id, reason in skipped.items()},
+        }, status=status.HTTP_200_OK)
 
-    @transaction.atomic
     @action(detail=True, methods=['post'], url_path='cancel', permission_classes=[IsAuthenticated])
     def cancel(self, request, pk=None):
         order = self.get_object()
-
-        # sadece order pending veya preparing ise restock etme
-        if order.status in ['pending', 'preparing']:
-            for item in order.order_items.select_related('menu_item').all():
-                stock = Stock.objects.select_for_update().get(menu_item=item.menu_item)
-                stock.quantity += item.quantity
-                stock.save()
-                log_user_action(
-                    user=request.user,
-                    action='item_cancelled',
-                    resource_type='order_item',
-                    resource_id=item.id,
-                    details={'order_id': order.id, 'menu_item': item.menu_item.name, 'cancelled_quantity': item.quantity, 'full_cancellation': True, 'via_order_cancel': True},
-                    request=request
-                )
-        
-        order.status = 'cancelled'
-        order.save(update_fields=['status'])
-        # musteriyi order cancel hakkinda bilgilendirme
-        create_notification(
-            recipient=order.user,
-            notification_type='order_status',
-            title='Order Cancelled',
-            message=f'Your order #{order.id} has been cancelled.',
-            priority='medium',
-            resource_type='order',
-            resource_id=order.id
-        )
+        queryset = self.get_queryset()
+        if 'If-Match' in request.headers:
+            # kilitlenen satir istemcinin gordugu surumde degilse iptal edilmiyor
+            queryset = queryset.filter(version=expected_version(request, order))
+        # sadece pending veya preparing orderlar restock ediliyor (transitions.cancel_orders)
+        cancelled, skipped = cancel_orders([order.id], request.user, request, queryset=queryset)
+        if not cancelled:
+            if can_transition(order.status, 'cancelled'):
+                raise VersionConflict(f'Order #{order.id} was modified concurrently; reload and try again.')
+            return Response({'detail': skipped.get(order.id, 'Order cannot be cancelled.')}, status=status.HTTP_400_BAD_REQUEST)
         return Response({'detail': 'Order cancelled.'}, status=status.HTTP_200_OK)
 
+    @action(detail=False, methods=['post'], url_path='bulk-cancel', permission_classes=[IsStaffOrAdmin])
+    def bulk_cancel(self, request):
+        """Cancel many orders in one request, restocking per menu item instead of per line"""
+        order_ids = request.data.get('ids', [])
+        if not isinstance(order_ids, list) or not order_ids:
+            return Response({'ids': 'A non-empty list of order ids is required.'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            order_ids = [int(order_id) for order_id in order_ids]
+        except (TypeError, ValueError):
+            return Response({'ids': 'Order ids must be integers.'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            cancelled, skipped = cancel_orders(order_ids, request.user, request, reason=request.data.get('reason'))
+        except InvalidTransition as e:
+            return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({
+            'cancelled': [order.id for order in cancelled],
+            'skipped': {str(order_id): reason for order_id, reason in skipped.items()},
+        }, status=status.HTTP_200_OK)
+
     @transaction.atomic
     @action(detail=True, methods=['post'], url_path='reassign', permission_classes=[IsStaffOrAdmin])
     def reassign(self, request, pk=None):
         order = self.get_object()
+        version = expected_version(request, order)
         target_user_id = request.data.get('user')
         if not target_user_id:
             return Response({'user': 'Target user id is required.'}, status=status.HTTP_400_BAD_REQUEST)
@@ -191,21 +250,27 @@ class OrderViewSet(viewsets.ModelViewSet):
             target_user = User.objects.get(id=target_user_id)
         except User.DoesNotExist:
             return Response({'user': 'Target user not found.'}, status=status.HTTP_404_NOT_FOUND)
-        order.user = target_user
-        order.save(update_fields=['user'])
+        old_customer = order.user
+        update_if_version(order, version, user=target_user, updated_at=timezone.now())
+        # eski sahibin senkronize istemcisi siparisi listesinden dusurmeli
+        record_tombstones('order', [(order.id, old_customer.id)])
         # Log reassign action
         log_user_action(
             user=request.user,
             action='reassign',
             resource_type='order',
             resource_id=order.id,
-            details={'old_customer': order.user.username, 'new_customer': target_user.username},
+            details={'old_customer': old_customer.username, 'new_customer': target_user.username},
             request=request
         )
         return Response(OrderSerializer(order, context={'request': request}).data, status=status.HTTP_200_OK)
 
+    @retry_on_locked()
+    @write_transaction()
     def destroy(self, request, *args, **kwargs):
         instance = self.get_object()
+        # kosullu surum artisi: okunduktan sonra degisen siparis silinmiyor
+        update_if_version(instance, expected_version(request, instance))
         log_user_action(
             user=request.user,
             action='delete',
@@ -214,12 +279,23 @@ class OrderViewSet(viewsets.ModelViewSet):
             details={'order_id': instance.id, 'total': str(instance.total), 'customer': instance.user.username},
             request=request
         )
-        return super().destroy(request, *args, **kwargs)
+        # super().destroy() get_object()'i tekrar cagirirdi
+        self.perform_destroy(instance)
+        return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-class OrderItemViewSet(viewsets.ModelViewSet):
+class OrderItemViewSet(CachePolicyMixin, VersionedViewMixin, InstrumentedViewMixin, viewsets.ModelViewSet):
     queryset = OrderItem.objects.all()
     serializer_class = OrderItemSerializer
+    query_budgets = {
+        'list': 2,
+        'retrieve': 2,
+        'create': 14,
+        'update': 12,
+        'partial_update': 12,
+        'destroy': 12,
+        'cancel': 12,
+    }
 
     def get_queryset(self):
         user = self.request.user
@@ -243,8 +319,8 @@ class OrderItemViewSet(viewsets.ModelViewSet):
         old_price_at_order_time = serializer.instance.price_at_order_time
         old_quantity = serializer.instance.quantity
         
-        # instancei kaydetme (bu, validated_data based instancei update edecek)
-        updated_instance = serializer.save()
+        # instancei kaydetme (bu, validated_data based instancei update edecek); If-Match surumune kosullu
+        updated_instance = serializer.save(version=expected_version(self.request, serializer.instance))
 
         # price degisikligi olduysa loglama
         if old_price_at_order_time != updated_instance.price_at_order_time:
@@ -277,20 +353,17 @@ class OrderItemViewSet(viewsets.ModelViewSet):
                 request=self.request
             )
 
-    @transaction.atomic
     @action(detail=True, methods=['post'], url_path='cancel', permission_classes=[IsAuthenticated])
+    @retry_on_locked()
+    @write_transaction()
     def cancel(self, request, pk=None):
         instance = self.get_object()
+        version = expected_version(request, instance)
         user = request.user
 
-        print(f"OrderItem cancel attempt by user: {user.username} (ID: {user.id}), Role: {getattr(user, 'role', 'N/A')}")
-        print(f"Order Item ID: {instance.id}, Associated Order User ID: {instance.order.user_id}, Owner ID: {instance.order.user.id}, Request User ID: {user.id}")
-        
         # owner veya staff/admin line itemlari cancel edebilir
-        if instance.order.user.id != user.id and not (getattr(user, 'role', 'customer') in ['staff', 'admin']):
-            print("Permission denied for OrderItem cancel. User is not staff/admin and not order owner.")
+        if instance.order.user_id != user.id and not (getattr(user, 'role', 'customer') in ['staff', 'admin']):
             return Response({'detail': 'Not permitted to cancel this item.'}, status=status.HTTP_403_FORBIDDEN)
-        print("Permission granted for OrderItem cancel.")
 
         # quantity ile partial cancellation destegi
         try:
@@ -302,6 +375,8 @@ class OrderItemViewSet(viewsets.ModelViewSet):
         if cancel_qty > instance.quantity:
             return Response({'quantity': 'Cannot cancel more than existing quantity.'}, status=status.HTTP_400_BAD_REQUEST)
 
+        # siparis okunduktan sonra iptal edildiyse stok iki kez iade edilmesin
+        guard_order_version(instance.order)
         if instance.order.status in ['pending', 'preparing']:
             stock = Stock.objects.select_for_update().get(menu_item=instance.menu_item)
             stock.quantity += cancel_qty
@@ -318,10 +393,12 @@ class OrderItemViewSet(viewsets.ModelViewSet):
                 details={'order_id': instance.order.id, 'menu_item': instance.menu_item.name, 'cancelled_quantity': cancel_qty, 'full_cancellation': True},
                 request=request
             )
+            update_if_version(instance, version)
             instance.delete()
         else:
-            instance.quantity -= cancel_qty
-            instance.save(update_fields=['quantity'])
+            new_quantity = instance.quantity - cancel_qty
+            update_if_version(instance, version, quantity=new_quantity, line_total=new_quantity * instance.price_at_order_time)
+            instance.order.update_total()
             log_user_action(
                 user=request.user,
                 action='item_cancelled',
@@ -345,12 +422,16 @@ class OrderItemViewSet(viewsets.ModelViewSet):
         msg = 'Order item cancelled and restocked.' if instance.order.status in ['pending', 'preparing'] else 'Order item cancelled (no restock due to order status).'
         return Response({'detail': msg}, status=status.HTTP_200_OK)
 
+    @retry_on_locked()
+    @write_transaction()
     def destroy(self, request, *args, **kwargs):
         instance = self.get_object()
         user = request.user
         # staff/admin veya orderin sahibi ise izin verme
         if not (getattr(user, 'role', 'customer') in ['staff', 'admin'] or instance.order.user_id == user.id):
             return Response({'detail': 'Not permitted to delete this item.'}, status=status.HTTP_403_FORBIDDEN)
+        update_if_version(instance, expected_version(request, instance))
+        guard_order_version(instance.order)
         order = instance.order
         # sadece order henuz ready/completed/cancelled degilse restock etme
         if order.status in ['pending', 'preparing']:
@@ -365,7 +446,9 @@ class OrderItemViewSet(viewsets.ModelViewSet):
             details={'order_id': instance.order.id, 'menu_item': instance.menu_item.name, 'quantity': instance.quantity},
             request=request
         )
-        return super().destroy(request, *args, **kwargs)
+        # super().destroy() get_object()'i tekrar cagirirdi
+        self.perform_destroy(instance)
+        return Response(status=status.HTTP_204_NO_CONTENT)
     
 
 
@@ -380,33 +463,36 @@ def load_whisper():
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
+@throttle_classes([VoiceOrderThrottle])
 def parse_voice_order(request):
-    load_whisper()
     audio_file = request.FILES.get('audio')
     if not audio_file:
         return Response({"detail": "Ses dosyası bulunamadı."}, status=status.HTTP_400_BAD_REQUEST)
 
-    tmp_file_path = None
-    temp_dir = None
-    try:
-        temp_dir = tempfile.mkdtemp()
-        tmp_file_path = os.path.join(temp_dir, 'voice_order.m4a')
-        
-        with open(tmp_file_path, 'wb') as tmp_file:
-            for chunk in audio_file.chunks():
-                tmp_file.write(chunk)
-        
-        result = whisper_model.transcribe(tmp_file_path, language="tr")
-        transcribed_text = result["text"]
-        print(f"Whisper Çıktısı: {transcribed_text}")
+    # transcription kuyrugu doluysa istek 429 + Retry-After ile reddediliyor
+    with voice_admission.admit():
+        load_whisper()
+        tmp_file_path = None
+        temp_dir = None
+        try:
+            temp_dir = tempfile.mkdtemp()
+            tmp_file_path = os.path.join(temp_dir, 'voice_order.m4a')
 
-    except Exception as e:
-        return Response({"detail": f"Ses dönüştürme hatası: {e}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-    finally:
-        if tmp_file_path and os.path.exists(tmp_file_path):
-            os.remove(tmp_file_path)
-        if temp_dir and os.path.exists(temp_dir):
-            os.rmdir(temp_dir)
+            with open(tmp_file_path, 'wb') as tmp_file:
+                for chunk in audio_file.chunks():
+                    tmp_file.write(chunk)
+
+            result = whisper_model.transcribe(tmp_file_path, language="tr")
+            transcribed_text = result["text"]
+            print(f"Whisper Çıktısı: {transcribed_text}")
+
+        except Exception as e:
+            return Response({"detail": f"Ses dönüştürme hatası: {e}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        finally:
+            if tmp_file_path and os.path.exists(tmp_file_path):
+                os.remove(tmp_file_path)
+            if temp_dir and os.path.exists(temp_dir):
+                os.rmdir(temp_dir)
 
     menu_items = list(MenuItem.objects.all().values_list('name', flat=True))
     prompt = f"""
@@ -465,7 +551,9 @@ def parse_voice_order(request):
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
-@transaction.atomic
+@throttle_classes([OrderCreateThrottle])
+@retry_on_locked()
+@write_transaction()
 def confirm_and_create_order(request):
     user = request.user
     cart_items = request.data.get('items', [])
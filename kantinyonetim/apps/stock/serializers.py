@@ -1,6 +1,5 @@
 from rest_framework import serializers
 from .models import Stock
-from apps.menu.models import MenuItem
  
 class StockSerializer(serializers.ModelSerializer):
     menu_item_name = serializers.CharField(source='menu_item.name', read_only=True)
@@ -10,14 +9,7 @@ class StockSerializer(serializers.ModelSerializer):
         fields = ['id', 'menu_item', 'menu_item_name', 'quantity']
 
     def validate(self, attrs):
-        # Allow creating stock for existing menu items without strict validation
-        menu_item = attrs.get('menu_item')
-        if menu_item:
-            try:
-                MenuItem.objects.get(id=menu_item.id)
-            except MenuItem.DoesNotExist:
-                raise serializers.ValidationError({'menu_item': 'Menu item does not exist'})
-        
+        # menu_item is already resolved (and 404s as a validation error) by its PrimaryKeyRelatedField
         quantity = attrs.get('quantity', 0)
         if quantity < 0:
             raise serializers.ValidationError({'quantity': 'Quantity cannot be negative'})
@@ -1,3 +1,27 @@
-from django.test import TestCase
+from decimal import Decimal
+from rest_framework.test import APITestCase
+from apps.menu.models import MenuItem
+from apps.users.models import User
+from kantinyonetim.query_budget import QueryBudgetMixin
+from .models import Stock
+from .views import StockViewSet
 
-# Create your tests here.
+
+class StockQueryBudgetTests(QueryBudgetMixin, APITestCase):
+    def setUp(self):
+        self.staff = User.objects.create_user(username='staff', password='staffpass', role='staff')
+        self.items = [MenuItem.objects.create(name=f'Item {i}', price=Decimal('5.00')) for i in range(6)]
+        self.stocks = Stock.objects.bulk_create([Stock(menu_item=item, quantity=10) for item in self.items[:5]])
+        res = self.client.post('/api/token/', {'username': 'staff', 'password': 'staffpass'}, format='json')
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {res.data['access']}")
+
+    def test_actions_stay_within_budget(self):
+        stock = Stock.objects.get(menu_item=self.items[0])
+        self.assertRequestWithinBudget(StockViewSet, 'list', 'get', '/api/stock/')
+        self.assertRequestWithinBudget(StockViewSet, 'retrieve', 'get', f'/api/stock/{stock.id}/')
+        # create on an existing row adds to it, on a new menu item inserts one
+        self.assertRequestWithinBudget(StockViewSet, 'create', 'post', '/api/stock/', {'menu_item': self.items[1].id, 'quantity': 5})
+        self.assertRequestWithinBudget(StockViewSet, 'create', 'post', '/api/stock/', {'menu_item': self.items[5].id, 'quantity': 5})
+        self.assertRequestWithinBudget(StockViewSet, 'update', 'put', f'/api/stock/{stock.id}/', {'quantity': 20})
+        self.assertRequestWithinBudget(StockViewSet, 'partial_update', 'patch', f'/api/stock/{stock.id}/', {'quantity': 25})
+        self.assertRequestWithinBudget(StockViewSet, 'destroy', 'delete', f'/api/stock/{stock.id}/')
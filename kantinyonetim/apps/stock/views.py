@@ -5,16 +5,31 @@ from apps.users.permissions import IsStaffOrAdmin
 from .models import Stock
 from .serializers import StockSerializer
 from apps.users.utils import log_user_action
+from kantinyonetim.db import write_transaction, retry_on_locked
+from kantinyonetim.instrumentation import InstrumentedViewMixin
+from kantinyonetim.responses import CachePolicyMixin
 
 # Create your views here.
 
-class StockViewSet(viewsets.ModelViewSet):
-    queryset = Stock.objects.all()
+class StockViewSet(CachePolicyMixin, InstrumentedViewMixin, viewsets.ModelViewSet):
+    queryset = Stock.objects.select_related('menu_item')
     serializer_class = StockSerializer
+    # StockSerializer shows menu_item.name
+    etag_field = ('updated_at', 'menu_item__updated_at')
+    query_budgets = {
+        'list': 3,
+        'retrieve': 2,
+        'create': 9,
+        'update': 6,
+        'partial_update': 6,
+        'destroy': 4,
+    }
     
     def get_permissions(self):
         return [IsStaffOrAdmin()]
     
+    @retry_on_locked()
+    @write_transaction()
     def create(self, request, *args, **kwargs):
         menu_item_id = request.data.get('menu_item')
         quantity = request.data.get('quantity', 0)
@@ -29,7 +44,7 @@ class StockViewSet(viewsets.ModelViewSet):
 
         if menu_item_id:
             try:
-                existing_stock = Stock.objects.get(menu_item_id=menu_item_id)
+                existing_stock = Stock.objects.select_related('menu_item').get(menu_item_id=menu_item_id)
                 old_quantity = existing_stock.quantity
                 existing_stock.quantity += quantity
                 existing_stock.save()
@@ -68,6 +83,8 @@ class StockViewSet(viewsets.ModelViewSet):
             )
         return response
     
+    @retry_on_locked()
+    @write_transaction()
     def update(self, request, *args, **kwargs):
         instance = self.get_object()
         old_quantity = instance.quantity
@@ -0,0 +1,5 @@
+from django.contrib import admin
+from .models import Tombstone, IdempotencyKey
+
+admin.site.register(Tombstone)
+admin.site.register(IdempotencyKey)
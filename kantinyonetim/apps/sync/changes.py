@@ -0,0 +1,155 @@
+"""
+Change feed behind /api/sync/.
+
+A client keeps the opaque `token` from its last sync and sends it back; the
+response holds only the menu items, stock levels, orders and notifications
+whose `updated_at` (for notifications: `created_at` / `read_at`) moved past
+the token's timestamp, plus tombstones for rows deleted since then. Without a
+usable token (none, tampered, issued for another user or role, or older than
+the tombstone retention) the response is a full snapshot flagged `reset`, and
+the client replaces its local copy.
+"""
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.conf import settings
+from django.core import signing
+from django.db.models import Q
+from django.utils import timezone
+from kantinyonetim.db.transactions import RETRY_ATTEMPTS
+from apps.menu.models import MenuItem
+from apps.menu.serializers import MenuItemSerializer
+from apps.orders.models import Order
+from apps.orders.serializers import OrderSerializer
+from apps.stock.models import Stock
+from apps.users.models import Notification
+from apps.users.serializers import NotificationSerializer
+from .models import Tombstone
+
+TOKEN_SALT = 'apps.sync.token'
+TERMINAL_ORDER_STATUSES = ('completed', 'cancelled')
+
+
+def is_staff(user):
+    return getattr(user, 'role', 'customer') in ['staff', 'admin']
+
+
+def token_overlap():
+    """
+    How far the next delta reaches back before this sync's query time.
+
+    updated_at is stamped when a row is written, not when its transaction commits,
+    so a row can become visible well after its stamp. A write transaction may wait
+    out the database busy timeout on each retry_on_locked attempt, so by default
+    the overlap covers all of them plus a margin. Rows inside the overlap are sent
+    twice (clients upsert them), but none is missed.
+    """
+    seconds = getattr(settings, 'SYNC_TOKEN_OVERLAP_SECONDS', None)
+    if not seconds:
+        busy_timeout = settings.DATABASES['default'].get('OPTIONS', {}).get('timeout', 20)
+        seconds = busy_timeout * RETRY_ATTEMPTS + 5
+    return timedelta(seconds=seconds)
+
+
+def make_token(user, since):
+    return signing.dumps({'u': user.pk, 'r': user.role, 't': since.timestamp()}, salt=TOKEN_SALT)
+
+
+def read_token(user, token):
+    """
+    The timestamp a client token stands for, or None when the client needs a full snapshot
+    """
+    if not token:
+        return None
+    try:
+        payload = signing.loads(token, salt=TOKEN_SALT)
+        since = datetime.fromtimestamp(payload['t'], tz=dt_timezone.utc)
+    except (signing.BadSignature, KeyError, TypeError, ValueError, OverflowError):
+        return None
+    # another login on the device, or a role change that alters which orders are visible
+    if payload.get('u') != user.pk or payload.get('r') != user.role:
+        return None
+    # older tombstones are pruned, so deletions before this point can no longer be reported
+    if since < timezone.now() - timedelta(days=getattr(settings, 'SYNC_TOMBSTONE_DAYS', 30)):
+        return None
+    return since
+
+
+def stock_bucket(quantity):
+    if quantity <= 0:
+        return 'out'
+    if quantity <= getattr(settings, 'SYNC_LOW_STOCK_THRESHOLD', 5):
+        return 'low'
+    return 'available'
+
+
+def visible_orders(user):
+    orders = Order.objects.select_related('user').prefetch_related('order_items__menu_item')
+    return orders if is_staff(user) else orders.filter(user=user)
+
+
+def collect_changes(request, since):
+    """
+    Serialized rows changed after `since` (None: full snapshot) and the ids deleted since then
+    """
+    user = request.user
+    context = {'request': request}
+
+    menu_items = MenuItem.objects.all()
+    stock = Stock.objects.all()
+    orders = visible_orders(user)
+    notifications = Notification.objects.filter(recipient=user)
+    if since is None:
+        # a fresh install needs open orders and recent history, not every order ever placed
+        cutoff = timezone.now() - timedelta(days=getattr(settings, 'SYNC_INITIAL_ORDER_DAYS', 30))
+        orders = orders.filter(Q(created_at__gte=cutoff) | ~Q(status__in=TERMINAL_ORDER_STATUSES))
+        notifications = notifications.filter(Q(created_at__gte=cutoff) | Q(read=False))
+    else:
+        menu_items = menu_items.filter(updated_at__gt=since)
+        stock = stock.filter(updated_at__gt=since)
+        orders = orders.filter(updated_at__gt=since)
+        notifications = notifications.filter(Q(created_at__gt=since) | Q(read_at__gt=since))
+
+    staff = is_staff(user)
+    stock_rows = []
+    for menu_item_id, quantity in stock.order_by('menu_item_id').values_list('menu_item_id', 'quantity'):
+        row = {'menu_item': menu_item_id, 'status': stock_bucket(quantity)}
+        if staff:
+            row['quantity'] = quantity
+        stock_rows.append(row)
+
+    notifications = list(notifications.order_by('-created_at'))
+    for notification in notifications:
+        # NotificationSerializer reads recipient.username; it is the requesting user
+        notification.recipient = user
+
+    orders = list(orders.order_by('id'))
+    changes = {
+        'menu_items': MenuItemSerializer(menu_items.order_by('id'), many=True, context=context).data,
+        'stock': stock_rows,
+        'orders': OrderSerializer(orders, many=True, context=context).data,
+        'notifications': NotificationSerializer(notifications, many=True, context=context).data,
+        'deleted': {kind: [] for kind, _ in Tombstone.KIND_CHOICES},
+    }
+    if since is not None:
+        changes['deleted'] = collect_deletions(user, since, {order.pk for order in orders})
+    return changes
+
+
+def collect_deletions(user, since, changed_order_ids):
+    """
+    Ids deleted after `since`, by kind, limited to rows the user could see
+    """
+    deleted = {kind: set() for kind, _ in Tombstone.KIND_CHOICES}
+    tombstones = Tombstone.objects.filter(deleted_at__gt=since)
+    if not is_staff(user):
+        tombstones = tombstones.filter(Q(owner__isnull=True) | Q(owner=user.pk))
+    else:
+        tombstones = tombstones.filter(Q(owner__isnull=True) | Q(kind='order') | Q(owner=user.pk))
+    for kind, object_id in tombstones.values_list('kind', 'object_id'):
+        deleted[kind].add(object_id)
+
+    # a reassigned order leaves a tombstone for its previous owner; drop it for anyone who can still see it
+    maybe_visible = deleted['order'] - changed_order_ids
+    if maybe_visible:
+        maybe_visible &= set(visible_orders(user).filter(id__in=maybe_visible).values_list('id', flat=True))
+    deleted['order'] -= changed_order_ids | maybe_visible
+    return {kind: sorted(ids) for kind, ids in deleted.items()}
@@ -0,0 +1,78 @@
+"""
+Idempotency keys for writes the mobile app may retry.
+
+An offline cart is submitted with an `Idempotency-Key` header (a client-made
+UUID, kept with the queued cart until the server answers). The first request
+with a key runs the view; its 2xx response is stored in the same transaction
+as the view's writes. A retry with the same key and body replays the stored
+response with `Idempotent-Replayed: true` instead of placing a second order;
+the same key with a different body is rejected with 422. Requests without the
+header behave as before.
+"""
+import functools
+import hashlib
+import json
+from django.db import IntegrityError
+from rest_framework import status
+from rest_framework.response import Response
+from kantinyonetim.db import write_transaction, retry_on_locked
+from .models import IdempotencyKey
+
+HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+
+
+def request_fingerprint(request):
+    body = json.dumps(request.data, sort_keys=True, default=str)
+    return hashlib.sha256(f'{request.method} {request.path}\n{body}'.encode()).hexdigest()
+
+
+def replay(stored, fingerprint):
+    if stored.fingerprint != fingerprint:
+        return Response(
+            {'detail': f'{HEADER} was already used for a different request.'},
+            status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+        )
+    return Response(stored.response, status=stored.status_code, headers={'Idempotent-Replayed': 'true'})
+
+
+def idempotent(scope):
+    """
+    Decorator for ViewSet actions: run once per (user, scope, Idempotency-Key)
+    """
+    def decorator(func):
+        @retry_on_locked()
+        @write_transaction()
+        def run_once(view, request, key, fingerprint, *args, **kwargs):
+            stored = IdempotencyKey.objects.filter(user=request.user, scope=scope, key=key).first()
+            if stored is not None:
+                return replay(stored, fingerprint)
+            response = func(view, request, *args, **kwargs)
+            if status.is_success(response.status_code):
+                IdempotencyKey.objects.create(
+                    user=request.user, scope=scope, key=key, fingerprint=fingerprint,
+                    status_code=response.status_code, response=response.data,
+                )
+            return response
+
+        @functools.wraps(func)
+        def wrapper(view, request, *args, **kwargs):
+            key = request.headers.get(HEADER)
+            if key is None:
+                return func(view, request, *args, **kwargs)
+            if not key.strip() or len(key) > MAX_KEY_LENGTH:
+                return Response(
+                    {'detail': f'{HEADER} must be 1-{MAX_KEY_LENGTH} characters.'},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            fingerprint = request_fingerprint(request)
+            try:
+                return run_once(view, request, key, fingerprint, *args, **kwargs)
+            except IntegrityError:
+                # a concurrent retry with the same key committed first; answer with its response
+                stored = IdempotencyKey.objects.filter(user=request.user, scope=scope, key=key).first()
+                if stored is None:
+                    raise
+                return replay(stored, fingerprint)
+        return wrapper
+    return decorator
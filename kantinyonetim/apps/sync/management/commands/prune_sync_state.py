@@ -0,0 +1,22 @@
+from datetime import timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from apps.sync.models import Tombstone, IdempotencyKey
+
+
+class Command(BaseCommand):
+    help = 'Deletes sync tombstones older than --days and idempotency keys older than --key-hours.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=getattr(settings, 'SYNC_TOMBSTONE_DAYS', 30))
+        parser.add_argument('--key-hours', type=int, default=getattr(settings, 'IDEMPOTENCY_KEY_TTL_HOURS', 24))
+
+    def handle(self, *args, **options):
+        if options['days'] < 1 or options['key_hours'] < 1:
+            raise CommandError('--days and --key-hours must be >= 1.')
+        now = timezone.now()
+        # tokens older than --days are answered with a full snapshot (apps/sync/changes.py), so these are never read again
+        tombstones, _ = Tombstone.objects.filter(deleted_at__lt=now - timedelta(days=options['days'])).delete()
+        keys, _ = IdempotencyKey.objects.filter(created_at__lt=now - timedelta(hours=options['key_hours'])).delete()
+        self.stdout.write(self.style.SUCCESS(f'{tombstones} silme kaydı ve {keys} idempotency anahtarı silindi.'))
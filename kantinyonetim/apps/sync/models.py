@@ -0,0 +1,99 @@
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models
+from django.db.models.signals import post_delete, pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
+from apps.menu.models import MenuItem
+from apps.orders.models import Order
+from apps.stock.models import Stock
+from apps.users.models import User
+
+
+class Tombstone(models.Model):
+    """
+    A deleted row, kept for SYNC_TOMBSTONE_DAYS so /api/sync/ can tell clients to drop it
+    """
+    KIND_CHOICES = [
+        ('menu_item', 'Menu item'),
+        ('stock', 'Stock'),
+        ('order', 'Order'),
+        ('notification', 'Notification'),
+    ]
+
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    # stock tombstones carry the menu item id, the key clients index stock by
+    object_id = models.BigIntegerField()
+    # user the row was visible to (orders, notifications); null for rows everyone sees.
+    # A plain id rather than a foreign key so tombstones outlive the user.
+    owner = models.BigIntegerField(null=True, blank=True)
+    deleted_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['deleted_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} #{self.object_id} deleted at {self.deleted_at:%Y-%m-%d %H:%M}"
+
+
+class IdempotencyKey(models.Model):
+    """
+    The stored response of a write submitted with an Idempotency-Key header
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='idempotency_keys')
+    scope = models.CharField(max_length=50)
+    key = models.CharField(max_length=255)
+    # sha256 of the request body; the same key with a different body is rejected
+    fingerprint = models.CharField(max_length=64)
+    status_code = models.PositiveSmallIntegerField()
+    response = models.JSONField(encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'scope', 'key'], name='uniq_idempotency_key_per_user'),
+        ]
+        indexes = [
+            models.Index(fields=['created_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.scope} {self.key} ({self.user_id})"
+
+
+def record_tombstones(kind, rows):
+    """
+    Bulk-insert tombstones for (object_id, owner) pairs
+    """
+    now = timezone.now()
+    Tombstone.objects.bulk_create([
+        Tombstone(kind=kind, object_id=object_id, owner=owner, deleted_at=now) for object_id, owner in rows
+    ])
+
+
+@receiver(post_delete, sender=MenuItem)
+def tombstone_menu_item(sender, instance, **kwargs):
+    record_tombstones('menu_item', [(instance.pk, None)])
+
+
+@receiver(post_delete, sender=Stock)
+def tombstone_stock(sender, instance, origin=None, **kwargs):
+    # clients drop a deleted menu item's stock together with the item
+    if isinstance(origin, MenuItem):
+        return
+    record_tombstones('stock', [(instance.menu_item_id, None)])
+
+
+@receiver(post_delete, sender=Order)
+def tombstone_order(sender, instance, origin=None, **kwargs):
+    # a deleted user's orders are recorded in one insert by tombstone_user_orders
+    if isinstance(origin, User):
+        return
+    record_tombstones('order', [(instance.pk, instance.user_id)])
+
+
+@receiver(pre_delete, sender=User)
+def tombstone_user_orders(sender, instance, **kwargs):
+    # staff clients still hold the orders; the user's own notifications need no tombstones
+    record_tombstones('order', [(pk, instance.pk) for pk in Order.objects.filter(user=instance).values_list('pk', flat=True)])
@@ -0,0 +1,193 @@
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from django.core.management import call_command
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+from apps.menu.models import MenuItem
+from apps.orders.models import Order, OrderItem
+from apps.orders.views import OrderViewSet
+from apps.stock.models import Stock
+from apps.users.inbox import mark_read, purge_read_notifications
+from apps.users.models import Notification, User
+from apps.users.throttling import reset_rate_limits
+from kantinyonetim.query_budget import QueryBudgetMixin, budget_for
+from .changes import make_token
+from .models import IdempotencyKey, Tombstone
+
+
+class SyncTests(QueryBudgetMixin, APITestCase):
+    def setUp(self):
+        self.staff = User.objects.create_user(username='staff', password='staffpass', role='staff')
+        self.customer = User.objects.create_user(username='cust', password='custpass', role='customer')
+        self.other = User.objects.create_user(username='other', password='otherpass', role='customer')
+
+        self.burger = MenuItem.objects.create(name='Burger', price=Decimal('10.00'), category='ana_yemek')
+        self.tea = MenuItem.objects.create(name='Tea', price=Decimal('2.50'), category='icecek')
+        Stock.objects.create(menu_item=self.burger, quantity=3)
+        Stock.objects.create(menu_item=self.tea, quantity=50)
+
+        self.own_order = Order.objects.create(user=self.customer)
+        OrderItem.objects.create(order=self.own_order, menu_item=self.tea, quantity=1, price_at_order_time=self.tea.price)
+        self.other_order = Order.objects.create(user=self.other)
+        Notification.objects.create(recipient=self.customer, notification_type='order_status', title='hello', message='m')
+
+        # everything above predates the client's last sync
+        past = timezone.now() - timedelta(hours=1)
+        for model in (MenuItem, Stock, Order):
+            model.objects.update(updated_at=past)
+        Notification.objects.update(created_at=past)
+        self.since = timezone.now() - timedelta(minutes=10)
+        reset_rate_limits()
+        self.addCleanup(reset_rate_limits)
+
+    def auth(self, username, password, **headers):
+        res = self.client.post('/api/token/', {'username': username, 'password': password}, format='json')
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {res.data['access']}", **headers)
+
+    def sync(self, token=None):
+        res = self.client.get('/api/sync/', {'token': token} if token else {})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return res
+
+    def test_first_sync_is_a_full_snapshot_scoped_to_the_user(self):
+        self.auth('cust', 'custpass')
+        res = self.sync()
+        self.assertTrue(res.data['reset'])
+        self.assertEqual([item['id'] for item in res.data['menu_items']], [self.burger.id, self.tea.id])
+        # customers see availability buckets, not quantities
+        self.assertEqual(res.data['stock'], [
+            {'menu_item': self.burger.id, 'status': 'low'},
+            {'menu_item': self.tea.id, 'status': 'available'},
+        ])
+        self.assertEqual([order['id'] for order in res.data['orders']], [self.own_order.id])
+        self.assertEqual([n['title'] for n in res.data['notifications']], ['hello'])
+        self.assertIn('private', res['Cache-Control'])
+
+        self.auth('staff', 'staffpass')
+        res = self.sync()
+        self.assertEqual({order['id'] for order in res.data['orders']}, {self.own_order.id, self.other_order.id})
+        self.assertEqual(res.data['stock'][0]['quantity'], 3)
+
+    def test_delta_contains_only_changes_and_deletions_since_the_token(self):
+        self.auth('cust', 'custpass')
+        token = make_token(self.customer, self.since)
+        res = self.sync(token)
+        self.assertFalse(res.data['reset'])
+        self.assertEqual((res.data['menu_items'], res.data['stock'], res.data['orders'], res.data['notifications']), ([], [], [], []))
+
+        self.client.post(f'/api/orders/{self.own_order.id}/cancel/')
+        stock = Stock.objects.get(menu_item=self.tea)
+        stock.quantity = 0
+        stock.save()
+        Notification.objects.create(recipient=self.customer, notification_type='order_status', title='new', message='m')
+        Notification.objects.create(recipient=self.other, notification_type='order_status', title='not mine', message='m')
+        burger_id = self.burger.id
+        self.burger.delete()
+        self.other_order.delete()
+
+        res = self.sync(token)
+        self.assertEqual(res.data['menu_items'], [])
+        self.assertEqual(res.data['stock'], [{'menu_item': self.tea.id, 'status': 'out'}])
+        self.assertEqual([(order['id'], order['status']) for order in res.data['orders']], [(self.own_order.id, 'cancelled')])
+        self.assertEqual({n['title'] for n in res.data['notifications']}, {'new', 'Order Cancelled'})
+        # the deleted menu item takes its stock row along; the other customer's order is not ours to drop
+        self.assertEqual(res.data['deleted'], {'menu_item': [burger_id], 'stock': [], 'order': [], 'notification': []})
+
+        mark_read(self.customer)
+        res = self.sync(res.data['token'])
+        self.assertEqual({n['title'] for n in res.data['notifications']}, {'hello', 'new', 'Order Cancelled'})
+
+    def test_rows_committed_after_the_previous_sync_are_not_missed(self):
+        self.auth('cust', 'custpass')
+        token = self.sync(make_token(self.customer, self.since)).data['token']
+        # a write transaction that waited on locks commits a row stamped well before the last sync
+        MenuItem.objects.filter(pk=self.tea.pk).update(updated_at=timezone.now() - timedelta(seconds=60))
+        res = self.sync(token)
+        self.assertEqual([item['id'] for item in res.data['menu_items']], [self.tea.id])
+
+    def test_reassigned_order_is_dropped_by_its_previous_owner_only(self):
+        self.auth('staff', 'staffpass')
+        res = self.client.post(f'/api/orders/{self.own_order.id}/reassign/', {'user': self.other.id}, format='json')
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        res = self.sync(make_token(self.staff, self.since))
+        self.assertEqual(res.data['deleted']['order'], [])
+        self.assertEqual([order['id'] for order in res.data['orders']], [self.own_order.id])
+
+        self.auth('cust', 'custpass')
+        res = self.sync(make_token(self.customer, self.since))
+        self.assertEqual(res.data['orders'], [])
+        self.assertEqual(res.data['deleted']['order'], [self.own_order.id])
+
+        self.auth('other', 'otherpass')
+        res = self.sync(make_token(self.other, self.since))
+        self.assertEqual([order['id'] for order in res.data['orders']], [self.own_order.id])
+        self.assertEqual(res.data['deleted']['order'], [])
+
+    def test_unusable_tokens_force_a_full_snapshot(self):
+        self.auth('cust', 'custpass')
+        expired = make_token(self.customer, timezone.now() - timedelta(days=31))
+        for token in ('garbage', make_token(self.other, self.since), expired):
+            res = self.sync(token)
+            self.assertTrue(res.data['reset'])
+            self.assertEqual(len(res.data['menu_items']), 2)
+
+        # a role change alters which orders are visible
+        token = make_token(self.customer, self.since)
+        self.assertFalse(self.sync(token).data['reset'])
+        self.customer.role = 'staff'
+        self.customer.save()
+        self.auth('cust', 'custpass')
+        self.assertTrue(self.sync(token).data['reset'])
+
+    def test_sync_query_count_does_not_grow_with_rows(self):
+        self.auth('staff', 'staffpass')
+        token = make_token(self.staff, self.since)
+        for i in range(5):
+            order = Order.objects.create(user=self.customer)
+            OrderItem.objects.create(order=order, menu_item=self.burger, quantity=1, price_at_order_time=self.burger.price)
+            if i % 2:
+                order.delete()
+        with self.assertQueryBudget(9, label='sync'):
+            res = self.sync(token)
+        self.assertEqual(len(res.data['orders']), 3)
+        self.assertEqual(len(res.data['deleted']['order']), 2)
+
+    def test_offline_cart_is_placed_once_per_idempotency_key(self):
+        self.auth('cust', 'custpass', HTTP_IDEMPOTENCY_KEY='cart-7f3a')
+        cart = {'items': [{'menu_item': self.tea.id, 'qty': 2}]}
+        with self.assertQueryBudget(budget_for(OrderViewSet, 'create_from_cart'), label='create_from_cart'):
+            first = self.client.post('/api/orders/create-from-cart/', cart, format='json')
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+
+        retry = self.client.post('/api/orders/create-from-cart/', cart, format='json')
+        self.assertEqual(retry.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(retry.data['id'], first.data['id'])
+        self.assertEqual(Order.objects.filter(user=self.customer).count(), 2)
+        self.assertEqual(Stock.objects.get(menu_item=self.tea).quantity, 48)
+
+        res = self.client.post('/api/orders/create-from-cart/', {'items': [{'menu_item': self.tea.id, 'qty': 3}]}, format='json')
+        self.assertEqual(res.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+
+        # failed submissions are not stored, so the client may retry them
+        self.auth('cust', 'custpass', HTTP_IDEMPOTENCY_KEY='cart-big')
+        too_many = {'items': [{'menu_item': self.burger.id, 'qty': 9}]}
+        self.assertEqual(self.client.post('/api/orders/create-from-cart/', too_many, format='json').status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(IdempotencyKey.objects.count(), 1)
+
+    def test_purge_and_prune_keep_tombstones_for_the_retention_window(self):
+        mark_read(self.customer)
+        Notification.objects.update(created_at=timezone.now() - timedelta(days=60))
+        self.assertEqual(purge_read_notifications(days=30), 1)
+        tombstone = Tombstone.objects.get(kind='notification')
+        self.assertEqual(tombstone.owner, self.customer.id)
+
+        self.other.delete()
+        self.assertEqual(Tombstone.objects.get(kind='order').object_id, self.other_order.id)
+
+        Tombstone.objects.filter(kind='notification').update(deleted_at=timezone.now() - timedelta(days=31))
+        out = StringIO()
+        call_command('prune_sync_state', stdout=out)
+        self.assertEqual(list(Tombstone.objects.values_list('kind', flat=True)), ['order'])
@@ -0,0 +1,27 @@
+from django.utils import timezone
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from kantinyonetim.responses import PRIVATE
+from .changes import collect_changes, make_token, read_token, token_overlap
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def sync(request):
+    """
+    Everything the mobile app shows that changed since ?token=<token from the last sync>.
+    Without a usable token the response is a full snapshot with reset=true.
+    """
+    started = timezone.now()
+    since = read_token(request.user, request.query_params.get('token'))
+    changes = collect_changes(request, since)
+    response = Response({
+        'token': make_token(request.user, started - token_overlap()),
+        'reset': since is None,
+        **changes,
+    })
+    patch_cache_control(response, **PRIVATE)
+    patch_vary_headers(response, ('Accept', 'Authorization'))
+    return response
@@ -0,0 +1,92 @@
+import logging
+import threading
+from datetime import timedelta
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+from .models import User
+
+logger = logging.getLogger(__name__)
+
+_flusher_started = False
+_flusher_lock = threading.Lock()
+
+
+class ActivityTracker:
+    """
+    Records last-seen timestamps in memory and writes them to User.last_activity
+    with one bulk_update every flush_interval seconds per process, from the
+    background thread started by start_activity_flusher(). Requests only
+    update the in-memory map; up to one interval of activity is lost when a
+    process stops.
+    """
+
+    def __init__(self, flush_interval=60, batch_size=500):
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def touch(self, user_id, when=None):
+        when = when or timezone.now()
+        with self._lock:
+            self._pending[user_id] = when
+
+    def flush(self):
+        """
+        Write pending timestamps in one bulk UPDATE. Returns the number of users written.
+        """
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+        User.objects.bulk_update(
+            [User(id=user_id, last_activity=when) for user_id, when in pending.items()],
+            ['last_activity'],
+            batch_size=self.batch_size,
+        )
+        return len(pending)
+
+    def pending_count(self):
+        with self._lock:
+            return len(self._pending)
+
+
+activity_tracker = ActivityTracker(flush_interval=getattr(settings, 'ACTIVITY_FLUSH_INTERVAL_SECONDS', 60))
+
+
+def _run_flusher(interval):
+    stop = threading.Event()
+    while not stop.wait(interval):
+        close_old_connections()
+        try:
+            activity_tracker.flush()
+        except Exception:
+            logger.exception('Flushing user activity failed')
+        finally:
+            close_old_connections()
+
+
+def start_activity_flusher(interval=None):
+    """
+    Flush activity_tracker every `interval` seconds in a daemon thread (once per process)
+    """
+    global _flusher_started
+    interval = interval or activity_tracker.flush_interval
+    if not interval:
+        return False
+    with _flusher_lock:
+        if _flusher_started:
+            return False
+        threading.Thread(target=_run_flusher, args=(interval,), name='activity-flush', daemon=True).start()
+        _flusher_started = True
+    return True
+
+
+def active_users(minutes=15):
+    """
+    Users seen in the last `minutes` minutes, most recent first
+    """
+    activity_tracker.flush()
+    since = timezone.now() - timedelta(minutes=minutes)
+    return User.objects.filter(last_activity__gte=since).order_by('-last_activity')
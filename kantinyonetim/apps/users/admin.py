@@ -5,13 +5,13 @@ from .models import User
 
 @admin.register(User)
 class UserAdmin(DjangoUserAdmin):
-    list_display = ("username", "email", "first_name", "last_name", "role", "is_staff", "is_active")
+    list_display = ("username", "email", "first_name", "last_name", "role", "is_staff", "is_active", "last_activity")
     list_filter = ("role", "is_staff", "is_active")
     fieldsets = (
         (None, {"fields": ("username", "password")}),
         ("Personal info", {"fields": ("first_name", "last_name", "email")}),
         ("Permissions", {"fields": ("role", "is_active", "is_staff", "is_superuser", "groups", "user_permissions")}),
-        ("Important dates", {"fields": ("last_login", "date_joined")}),
+        ("Important dates", {"fields": ("last_login", "date_joined", "last_activity")}),
     )
     add_fieldsets = (
         (None, {
@@ -0,0 +1,157 @@
+import gzip
+import json
+import logging
+import os
+import tempfile
+import uuid
+import zlib
+from datetime import timedelta
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from .models import AuditLog, AuditArchiveSegment
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_FIELDS = (
+    'id', 'user_id', 'action', 'resource_type', 'resource_id',
+    'details', 'ip_address', 'timestamp',
+)
+
+
+def get_archive_dir():
+    return getattr(settings, 'AUDIT_ARCHIVE_DIR', os.path.join(settings.BASE_DIR, 'audit_archive'))
+
+
+def _month_start(ts):
+    return ts.date().replace(day=1)
+
+
+def _to_record(row):
+    # same shape as AuditLogSerializer so archived and live rows can be mixed
+    record = {field: row[field] for field in ARCHIVE_FIELDS if field != 'user_id'}
+    record['user'] = row['user_id']
+    record['user_username'] = row['user__username']
+    record['user_agent'] = row['user_agent'] or ''
+    return record
+
+
+def _write_batch(archive_dir, month, records):
+    """
+    Write records to a new gzip JSONL file and return its path. The file only
+    appears under its final name once it is complete and synced.
+    """
+    path = os.path.join(archive_dir, f'audit-{month:%Y-%m}-{uuid.uuid4().hex[:12]}.jsonl.gz')
+    fd, tmp_path = tempfile.mkstemp(dir=archive_dir, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as raw, gzip.open(raw, 'wt', encoding='utf-8') as fh:
+            for record in records:
+                fh.write(json.dumps(record, cls=DjangoJSONEncoder, ensure_ascii=False))
+                fh.write('\n')
+            fh.close()
+            raw.flush()
+            os.fsync(raw.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return path
+
+
+def archive_audit_logs(days=None, batch_size=1000, archive_dir=None, dry_run=False):
+    """
+    Move audit rows older than `days` days into monthly gzip JSONL segments.
+
+    Works in id order, batch_size rows at a time: each month's share of a batch
+    is written to a new file first, then the segment's file list and the DELETE
+    of exactly the written rows commit together. A file whose batch did not
+    commit is never listed, and its rows are archived again by the next run.
+    Returns the number of rows archived.
+    """
+    days = getattr(settings, 'AUDIT_RETENTION_DAYS', 90) if days is None else days
+    cutoff = timezone.now() - timedelta(days=days)
+    stale = AuditLog.objects.filter(timestamp__lt=cutoff)
+    if dry_run:
+        return stale.count()
+
+    archive_dir = archive_dir or get_archive_dir()
+    os.makedirs(archive_dir, exist_ok=True)
+    archived = 0
+    while True:
+        rows = list(stale.order_by('id').values(*ARCHIVE_FIELDS, 'user__username', user_agent=F('agent__value'))[:batch_size])
+        if not rows:
+            break
+
+        by_month = {}
+        for row in rows:
+            by_month.setdefault(_month_start(row['timestamp']), []).append(row)
+
+        with transaction.atomic():
+            for month, month_rows in by_month.items():
+                segment, _ = AuditArchiveSegment.objects.select_for_update().get_or_create(month=month)
+                # ids do not follow timestamps, so every row is written
+                path = _write_batch(archive_dir, month, [_to_record(row) for row in month_rows])
+                timestamps = [row['timestamp'] for row in month_rows]
+                first = min(timestamps)
+                last = max(timestamps)
+                AuditArchiveSegment.objects.filter(pk=segment.pk).update(
+                    files=[*segment.files, path],
+                    row_count=F('row_count') + len(month_rows),
+                    first_timestamp=min(first, segment.first_timestamp or first),
+                    last_timestamp=max(last, segment.last_timestamp or last),
+                )
+            # every selected row was written above
+            AuditLog.objects.filter(id__in=[row['id'] for row in rows]).delete()
+        archived += len(rows)
+    return archived
+
+
+def _matches(record, filters):
+    if filters.get('user') and filters['user'].lower() not in (record.get('user_username') or '').lower():
+        return False
+    if filters.get('action') and record['action'] != filters['action']:
+        return False
+    if filters.get('resource_type') and record['resource_type'] != filters['resource_type']:
+        return False
+    return True
+
+
+def query_archive(date_from=None, date_to=None, **filters):
+    """
+    Yield archived audit records with date_from <= timestamp <= date_to.
+    Only segments whose time range overlaps the request are opened; a file
+    that cannot be read is logged and skipped, keeping the records before the damage.
+    """
+    segments = AuditArchiveSegment.objects.all()
+    if date_from:
+        segments = segments.filter(last_timestamp__gte=date_from)
+    if date_to:
+        segments = segments.filter(first_timestamp__lte=date_to)
+
+    seen = set()
+    for segment in segments:
+        for path in segment.files:
+            try:
+                yield from _read_file(path, seen, date_from, date_to, filters)
+            except (OSError, EOFError, zlib.error, ValueError) as exc:
+                # gzip.BadGzipFile is an OSError; ValueError covers a truncated JSON line
+                logger.warning('Skipping the rest of audit archive file %s: %s', path, exc)
+
+
+def _read_file(path, seen, date_from, date_to, filters):
+    with gzip.open(path, 'rt', encoding='utf-8') as fh:
+        for line in fh:
+            record = json.loads(line)
+            # files from before per-batch writes may hold a batch twice (crash between append and delete)
+            if record['id'] in seen:
+                continue
+            seen.add(record['id'])
+            ts = parse_datetime(record['timestamp'])
+            if (date_from and ts < date_from) or (date_to and ts > date_to):
+                continue
+            if _matches(record, filters):
+                yield record
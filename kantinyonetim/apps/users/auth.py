@@ -1,73 +1,100 @@
-from django.contrib.auth import get_user_model
+import time
+from django.utils import timezone
+from rest_framework.exceptions import AuthenticationFailed, Throttled
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 from rest_framework_simplejwt.views import TokenObtainPairView
 from rest_framework.response import Response
 from rest_framework import status
-from apps.users.utils import log_user_action
+from apps.users.utils import log_user_action, get_client_ip
+from apps.users.search import find_by_email
+from apps.users.login_guard import login_guard, persist_failure, persist_success
 from apps.users.models import User
+from apps.users.authentication import TOKEN_VERSION_CLAIM, ROLE_CLAIM, USERNAME_CLAIM
 
 
 class UsernameOrEmailTokenObtainPairSerializer(TokenObtainPairSerializer):
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        # CachedJWTAuthentication icin surum ve rol claimleri
+        token[TOKEN_VERSION_CLAIM] = user.token_version
+        token[ROLE_CLAIM] = user.role
+        token[USERNAME_CLAIM] = user.username
+        return token
+
     def validate(self, attrs):
         # Allow login using either username or email in the 'username' field
         login_identifier = attrs.get(self.username_field)
-        password = attrs.get('password')
+        request = self.context.get('request')
+        ip = get_client_ip(request) if request is not None else None
+
+        # Locked identifiers/IPs are rejected before any user lookup or password hashing
+        wait = login_guard.retry_after(login_identifier, ip)
+        if wait:
+            raise Throttled(wait=wait, detail='Too many failed login attempts. Try again later.')
+
+        # Resolve the account once; reused for the lock check, failure bookkeeping and auditing
+        self.candidate_user = None
+        if login_identifier:
+            if '@' in login_identifier:
+                self.candidate_user = find_by_email(login_identifier)
+            else:
+                self.candidate_user = User.objects.filter(**{self.username_field: login_identifier}).first()
+        user = self.candidate_user
+
+        if user is not None:
+            # Map an email identifier to the username for authentication
+            attrs[self.username_field] = getattr(user, self.username_field)
+            if user.locked_until and user.locked_until > timezone.now():
+                until = user.locked_until.timestamp()
+                login_guard.lock(login_identifier, until)
+                raise Throttled(wait=until - time.time(), detail='Too many failed login attempts. Try again later.')
 
-        if login_identifier and '@' in login_identifier:
-            # Treat provided identifier as email, map to username for authentication
-            UserModel = get_user_model()
-            try:
-                user = UserModel.objects.get(email__iexact=login_identifier)
-                attrs[self.username_field] = getattr(user, self.username_field)
-            except UserModel.DoesNotExist:
-                # Fall through to default behavior, which will raise the same generic error
-                pass
+        try:
+            data = super().validate(attrs)
+        except AuthenticationFailed:
+            failures, locked_until = login_guard.record_failure(login_identifier, ip)
+            if user is not None:
+                persist_failure(user, failures, locked_until)
+            raise
 
-        attrs['password'] = password
-        return super().validate(attrs)
+        login_guard.record_success(login_identifier)
+        persist_success(self.user)
+        return data
 
 
 class CustomTokenObtainPairView(TokenObtainPairView):
     serializer_class = UsernameOrEmailTokenObtainPairSerializer
 
     def post(self, request, *args, **kwargs):
-        response = super().post(request, *args, **kwargs)
-        
-        if response.status_code == status.HTTP_200_OK:
-            # Log successful login
-            username = request.data.get(self.serializer_class.username_field)
-            try:
-                user = User.objects.get(**{self.serializer_class.username_field: username}) # Get the actual user object
-            except User.DoesNotExist:
-                user = None # Should not happen on successful login, but handle defensively
-            
+        serializer = self.get_serializer(data=request.data)
+        try:
+            serializer.is_valid(raise_exception=True)
+        except TokenError as e:
+            raise InvalidToken(e.args[0])
+        except AuthenticationFailed as e:
+            # Log failed login attempt against the account the serializer already resolved
+            user = getattr(serializer, 'candidate_user', None)
             if user:
                 log_user_action(
                     user=user,
                     action='login',
                     resource_type='user',
                     resource_id=user.id,
-                    details={'status': 'success'},
+                    details={'status': 'failed', 'reason': str(e.detail)},
                     request=request
                 )
-        else:
-            # Log failed login attempt
-            username = request.data.get('username', 'unknown')
-            # Attempt to get the user even if login failed, if user exists
-            try:
-                user = User.objects.get(username=username)
-            except User.DoesNotExist:
-                user = None
-            
-            if user:
-                log_user_action(
-                    user=user,
-                    action='login',
-                    resource_type='user',
-                    resource_id=user.id,
-                    details={'status': 'failed', 'reason': response.data.get('detail', 'invalid credentials')},
-                    request=request
-                )
-        return response
-
+            raise
 
+        # Log successful login with the authenticated user, no extra lookup
+        user = serializer.user
+        log_user_action(
+            user=user,
+            action='login',
+            resource_type='user',
+            resource_id=user.id,
+            details={'status': 'success'},
+            request=request
+        )
+        return Response(serializer.validated_data, status=status.HTTP_200_OK)
@@ -0,0 +1,136 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import F
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.settings import api_settings
+from .models import User
+from .activity import activity_tracker
+
+# token icine eklenen claim isimleri (auth.UsernameOrEmailTokenObtainPairSerializer.get_token)
+TOKEN_VERSION_CLAIM = 'ver'
+ROLE_CLAIM = 'role'
+USERNAME_CLAIM = 'username'
+
+
+class UserCache:
+    """
+    Process-local LRU of authenticated users with a short TTL, keyed by
+    (user id, token version). Entries for a user are dropped whenever the
+    row is saved or deleted in this process; other processes converge within the TTL.
+    """
+
+    def __init__(self, max_size=1024, ttl=30):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id, version):
+        key = (str(user_id), version)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            user, expires = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return user
+
+    def set(self, user_id, version, user):
+        key = (str(user_id), version)
+        with self._lock:
+            self._entries[key] = (user, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id):
+        user_id = str(user_id)
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == user_id]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+user_cache = UserCache(
+    max_size=getattr(settings, 'AUTH_USER_CACHE_SIZE', 1024),
+    ttl=getattr(settings, 'AUTH_USER_CACHE_TTL', 30),
+)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_cached_user(sender, instance, **kwargs):
+    user_cache.invalidate(instance.pk)
+
+
+def user_from_claims(validated_token):
+    """
+    Build a User instance from the role claims without touching the database.
+    Usable as a foreign key value and in filters; fields not in the token are defaults.
+    """
+    user = User(
+        id=int(validated_token[api_settings.USER_ID_CLAIM]),
+        username=validated_token.get(USERNAME_CLAIM, ''),
+        role=validated_token[ROLE_CLAIM],
+        token_version=validated_token.get(TOKEN_VERSION_CLAIM, 0),
+        is_active=True,
+    )
+    user._state.adding = False
+    user._state.db = DEFAULT_DB_ALIAS
+    user.from_token_claims = True
+    return user
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication that serves the user from user_cache instead of a SELECT per request.
+
+    Tokens carry a 'ver' claim that must match User.token_version; bumping the
+    version (logout) revokes every token issued before. With
+    settings.JWT_STATELESS_ROLE_CLAIMS the user is built from the token's
+    role claims; the row is still read on a cache miss so that revoked tokens
+    and deactivated users are refused.
+    """
+
+    def authenticate(self, request):
+        result = super().authenticate(request)
+        if result is not None:
+            activity_tracker.touch(result[0].pk)
+        return result
+
+    def get_user(self, validated_token):
+        version = validated_token.get(TOKEN_VERSION_CLAIM, 0)
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        user = user_cache.get(user_id, version) if user_id is not None else None
+        if user is None:
+            # simplejwt refuses inactive users here
+            user = super().get_user(validated_token)
+            if user.token_version != version:
+                raise AuthenticationFailed('Token has been revoked.', code='token_revoked')
+            user_cache.set(user_id, version, user)
+        if getattr(settings, 'JWT_STATELESS_ROLE_CLAIMS', False) and ROLE_CLAIM in validated_token:
+            # the version check above still applies; only the role comes from the token
+            return user_from_claims(validated_token)
+        # istekler arasinda ayni instance paylasilmasin
+        return copy.copy(user)
+
+
+def revoke_user_tokens(user):
+    """
+    Invalidate every token issued to user so far (used on logout)
+    """
+    User.objects.filter(pk=user.pk).update(token_version=F('token_version') + 1)
+    user_cache.invalidate(user.pk)
@@ -0,0 +1,65 @@
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from apps.sync.models import record_tombstones
+from .models import Notification
+
+PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+
+def unread_count(user):
+    """
+    COUNT(*) over the (recipient, read) index; no rows are loaded
+    """
+    return Notification.objects.filter(recipient=user, read=False).count()
+
+
+def notification_page(user, before=None, limit=PAGE_SIZE, unread_only=False):
+    """
+    Newest-first page of notifications with id < before (keyset pagination).
+    Returns (notifications, next_before); next_before is None on the last page.
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    qs = Notification.objects.filter(recipient=user)
+    if unread_only:
+        qs = qs.filter(read=False)
+    if before:
+        qs = qs.filter(id__lt=before)
+    # one extra row tells whether another page exists
+    rows = list(qs.order_by('-id')[:limit + 1])
+    next_before = rows[limit - 1].id if len(rows) > limit else None
+    rows = rows[:limit]
+    for notification in rows:
+        # recipient_username without a query per row
+        notification.recipient = user
+    return rows, next_before
+
+
+def mark_read(user, ids=None):
+    """
+    Mark the user's unread notifications (or only ids) read in a single UPDATE
+    """
+    qs = Notification.objects.filter(recipient=user, read=False)
+    if ids is not None:
+        qs = qs.filter(id__in=ids)
+    return qs.update(read=True, read_at=timezone.now())
+
+
+def purge_read_notifications(days=None, batch_size=1000):
+    """
+    Delete read notifications older than `days` in batches of batch_size ids.
+    Each batch leaves tombstones so synced clients drop the same rows.
+    """
+    days = getattr(settings, 'NOTIFICATION_RETENTION_DAYS', 30) if days is None else days
+    cutoff = timezone.now() - timedelta(days=days)
+    stale = Notification.objects.filter(read=True, created_at__lt=cutoff)
+    deleted = 0
+    while True:
+        rows = list(stale.values_list('id', 'recipient_id')[:batch_size])
+        if not rows:
+            return deleted
+        with transaction.atomic():
+            record_tombstones('notification', rows)
+            deleted += Notification.objects.filter(id__in=[row[0] for row in rows]).delete()[0]
@@ -0,0 +1,138 @@
+import threading
+import time
+from collections import OrderedDict, deque
+from datetime import timedelta
+from django.conf import settings
+from django.utils import timezone
+from .models import User
+
+
+class SlidingWindowCounter:
+    """
+    Failure timestamps per key within the last `window` seconds, bounded to max_keys keys
+    """
+
+    def __init__(self, window, max_keys=10000):
+        self.window = window
+        self.max_keys = max_keys
+        self._hits = OrderedDict()
+
+    def add(self, key, now):
+        hits = self._hits.pop(key, None) or deque()
+        hits.append(now)
+        self._prune(hits, now)
+        self._hits[key] = hits
+        if len(self._hits) > self.max_keys:
+            self._hits.popitem(last=False)
+        return len(hits)
+
+    def count(self, key, now):
+        hits = self._hits.get(key)
+        if not hits:
+            return 0
+        self._prune(hits, now)
+        return len(hits)
+
+    def reset(self, key):
+        self._hits.pop(key, None)
+
+    def _prune(self, hits, now):
+        while hits and hits[0] <= now - self.window:
+            hits.popleft()
+
+
+class LoginGuard:
+    """
+    In-memory brute-force protection for the token endpoint.
+
+    Failures are counted per username and per client IP in a sliding window.
+    Crossing the username threshold locks the account (persisted to
+    User.login_attempts/locked_until so other processes honour it); crossing
+    the IP threshold blocks that IP in this process. Lock checks happen before
+    any password hashing.
+    """
+
+    def __init__(self, max_failures=5, ip_max_failures=20, window=900, lockout=900):
+        self.max_failures = max_failures
+        self.ip_max_failures = ip_max_failures
+        self.lockout = lockout
+        self._users = SlidingWindowCounter(window)
+        self._ips = SlidingWindowCounter(window)
+        self._locked = {}
+        self._lock = threading.Lock()
+
+    def _user_key(self, identifier):
+        return f'user:{(identifier or "").strip().lower()}'
+
+    def retry_after(self, identifier, ip, now=None):
+        """
+        Seconds until identifier/ip may try again, or 0 if not locked
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            wait = 0
+            for key in (self._user_key(identifier), f'ip:{ip}'):
+                until = self._locked.get(key)
+                if until is None:
+                    continue
+                if until <= now:
+                    del self._locked[key]
+                else:
+                    wait = max(wait, until - now)
+            return wait
+
+    def lock(self, identifier, until):
+        with self._lock:
+            self._locked[self._user_key(identifier)] = until
+
+    def record_failure(self, identifier, ip, now=None):
+        """
+        Count a failed attempt. Returns (failures for identifier, lock-until timestamp or None)
+        """
+        now = time.time() if now is None else now
+        user_key = self._user_key(identifier)
+        with self._lock:
+            user_failures = self._users.add(user_key, now)
+            ip_failures = self._ips.add(f'ip:{ip}', now) if ip else 0
+            until = None
+            if ip_failures >= self.ip_max_failures:
+                self._locked[f'ip:{ip}'] = now + self.lockout
+            if user_failures >= self.max_failures:
+                until = now + self.lockout
+                self._locked[user_key] = until
+                self._users.reset(user_key)
+        return user_failures, until
+
+    def record_success(self, identifier):
+        with self._lock:
+            self._users.reset(self._user_key(identifier))
+            self._locked.pop(self._user_key(identifier), None)
+
+    def clear(self):
+        with self._lock:
+            self._users = SlidingWindowCounter(self._users.window)
+            self._ips = SlidingWindowCounter(self._ips.window)
+            self._locked.clear()
+
+
+login_guard = LoginGuard(
+    max_failures=getattr(settings, 'LOGIN_MAX_FAILURES', 5),
+    ip_max_failures=getattr(settings, 'LOGIN_IP_MAX_FAILURES', 20),
+    window=getattr(settings, 'LOGIN_FAILURE_WINDOW_SECONDS', 900),
+    lockout=getattr(settings, 'LOGIN_LOCKOUT_SECONDS', 900),
+)
+
+
+def persist_failure(user, failures, locked_until):
+    """
+    Flush the in-memory counter to the user row; only written when the count changes meaningfully
+    """
+    fields = {'login_attempts': failures}
+    if locked_until:
+        fields['locked_until'] = timezone.now() + timedelta(seconds=login_guard.lockout)
+    User.objects.filter(pk=user.pk).update(**fields)
+
+
+def persist_success(user):
+    if user.login_attempts or user.locked_until:
+        User.objects.filter(pk=user.pk).update(login_attempts=0, locked_until=None)
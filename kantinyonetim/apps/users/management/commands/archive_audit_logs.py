@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.conf import settings
+from apps.users.audit_archive import archive_audit_logs, get_archive_dir
+
+
+class Command(BaseCommand):
+    help = 'Moves audit log rows older than --days into monthly gzip JSONL archive files.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=getattr(settings, 'AUDIT_RETENTION_DAYS', 90))
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--archive-dir', help='Target directory (default: AUDIT_ARCHIVE_DIR).')
+        parser.add_argument('--dry-run', action='store_true', help='Only count rows that would be archived.')
+
+    def handle(self, *args, **options):
+        if options['days'] < 0 or options['batch_size'] < 1:
+            raise CommandError('--days must be >= 0 and --batch-size >= 1.')
+        count = archive_audit_logs(
+            days=options['days'],
+            batch_size=options['batch_size'],
+            archive_dir=options['archive_dir'],
+            dry_run=options['dry_run'],
+        )
+        if options['dry_run']:
+            self.stdout.write(f'{count} denetim kaydı arşivlenecek')
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                f'{count} denetim kaydı {options["archive_dir"] or get_archive_dir()} dizinine arşivlendi.'
+            ))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.conf import settings
+from apps.users.inbox import purge_read_notifications
+
+
+class Command(BaseCommand):
+    help = 'Deletes read notifications older than --days.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=getattr(settings, 'NOTIFICATION_RETENTION_DAYS', 30))
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        if options['days'] < 0 or options['batch_size'] < 1:
+            raise CommandError('--days must be >= 0 and --batch-size >= 1.')
+        deleted = purge_read_notifications(days=options['days'], batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'{deleted} okunmuş bildirim silindi.'))
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 18:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('users', '0004_user_token_version'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='user',
+            name='last_activity',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['last_activity'], name='users_user_last_ac_1898c4_idx'),
+        ),
+    ]
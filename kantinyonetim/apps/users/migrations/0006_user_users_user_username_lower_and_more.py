@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-19 18:13
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+def create_trigram_index(apps, schema_editor):
+    # only PostgreSQL; SQLite searches through the in-memory trie
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    schema_editor.execute(
+        'CREATE INDEX IF NOT EXISTS users_user_username_trgm '
+        'ON users_user USING gin (lower(username) gin_trgm_ops)'
+    )
+
+
+def drop_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP INDEX IF EXISTS users_user_username_trgm')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('users', '0005_alter_user_last_activity_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(django.db.models.functions.text.Lower('username'), name='users_user_username_lower'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(django.db.models.functions.text.Lower('email'), name='users_user_email_lower'),
+        ),
+        migrations.RunPython(create_trigram_index, drop_trigram_index),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-19 18:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0006_user_users_user_username_lower_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuditArchiveSegment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(unique=True)),
+                ('path', models.CharField(max_length=255)),
+                ('row_count', models.PositiveIntegerField(default=0)),
+                ('first_timestamp', models.DateTimeField(blank=True, null=True)),
+                ('last_timestamp', models.DateTimeField(blank=True, null=True)),
+                ('last_id', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['month'],
+            },
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.2.18 on 2026-10-19 18:17
+
+import hashlib
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def move_user_agents(apps, schema_editor):
+    # one UserAgent row per distinct string, then point audit rows at it in batches
+    AuditLog = apps.get_model('users', 'AuditLog')
+    UserAgent = apps.get_model('users', 'UserAgent')
+    values = AuditLog.objects.exclude(user_agent='').values_list('user_agent', flat=True).distinct()
+    for value in values.iterator():
+        agent = UserAgent.objects.create(digest=hashlib.sha256(value.encode('utf-8')).hexdigest(), value=value)
+        AuditLog.objects.filter(user_agent=value).update(agent=agent)
+
+
+def restore_user_agents(apps, schema_editor):
+    AuditLog = apps.get_model('users', 'AuditLog')
+    UserAgent = apps.get_model('users', 'UserAgent')
+    for agent in UserAgent.objects.iterator():
+        AuditLog.objects.filter(agent=agent).update(user_agent=agent.value)
+
+
+class Migration(migrations.Migration):
+    # On PostgreSQL the UPDATEs of the deferrable agent FK leave pending trigger events, and
+    # ALTER TABLE (RemoveField) refuses to run in the same transaction. Running the migration
+    # non-atomically gives each step its own transaction; the data copy stays atomic by itself.
+    atomic = False
+
+    dependencies = [
+        ('users', '0007_auditarchivesegment'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserAgent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('digest', models.CharField(max_length=64, unique=True)),
+                ('value', models.TextField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='auditlog',
+            name='agent',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='users.useragent'),
+        ),
+        migrations.RunPython(move_user_agents, restore_user_agents, atomic=True),
+        migrations.RemoveField(
+            model_name='auditlog',
+            name='user_agent',
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-19 18:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0008_useragent_auditlog_agent'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['recipient', '-id'], name='users_notif_recipient_id'),
+        ),
+    ]
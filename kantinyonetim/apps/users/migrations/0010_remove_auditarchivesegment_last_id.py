@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-19 19:21
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0009_notification_users_notif_recipient_id'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='auditarchivesegment',
+            name='last_id',
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-19 19:42
+
+from django.db import migrations, models
+
+
+def path_to_files(apps, schema_editor):
+    # the single appended file of an existing segment becomes its first batch file
+    AuditArchiveSegment = apps.get_model('users', 'AuditArchiveSegment')
+    for segment in AuditArchiveSegment.objects.exclude(path=''):
+        segment.files = [segment.path]
+        segment.save(update_fields=['files'])
+
+
+def files_to_path(apps, schema_editor):
+    # lossy: a segment written as several batch files keeps only the first
+    AuditArchiveSegment = apps.get_model('users', 'AuditArchiveSegment')
+    for segment in AuditArchiveSegment.objects.all():
+        segment.path = segment.files[0] if segment.files else ''
+        segment.save(update_fields=['path'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0011_user_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='auditarchivesegment',
+            name='files',
+            field=models.JSONField(default=list),
+        ),
+        migrations.RunPython(path_to_files, files_to_path),
+        # a default lets the column be added back when migrating backwards
+        migrations.AlterField(
+            model_name='auditarchivesegment',
+            name='path',
+            field=models.CharField(default='', max_length=255),
+        ),
+        migrations.RemoveField(
+            model_name='auditarchivesegment',
+            name='path',
+        ),
+    ]
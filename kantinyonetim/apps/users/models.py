@@ -1,5 +1,6 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
+from django.db.models.functions import Lower
 from django.utils import timezone
 
 class User(AbstractUser):
@@ -13,9 +14,14 @@ class User(AbstractUser):
     # Audit fields
     created_by = models.ForeignKey('self', on_delete=models.SET_NULL, null=True, blank=True, related_name='users_created')
     modified_by = models.ForeignKey('self', on_delete=models.SET_NULL, null=True, blank=True, related_name='users_modified')
-    last_activity = models.DateTimeField(auto_now=True)
+    # activity.ActivityTracker tarafindan toplu olarak yaziliyor; save() ile degismez
+    last_activity = models.DateTimeField(null=True, blank=True)
     login_attempts = models.PositiveIntegerField(default=0)
     locked_until = models.DateTimeField(null=True, blank=True)
+    # JWT'lerdeki 'ver' claim'i ile eslesmeli; artirilinca eski tokenlar gecersiz olur
+    token_version = models.PositiveIntegerField(default=0)
+    # order list ETag'leri username degisikliklerini bununla goruyor (kantinyonetim/responses.py)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return self.username
@@ -25,8 +31,23 @@ class User(AbstractUser):
             models.Index(fields=['role']),
             models.Index(fields=['username']),
             models.Index(fields=['email']),
+            models.Index(fields=['last_activity']),
+            # case-insensitive exact/prefix lookups (apps/users/search.py)
+            models.Index(Lower('username'), name='users_user_username_lower'),
+            models.Index(Lower('email'), name='users_user_email_lower'),
         ]
 
+class UserAgent(models.Model):
+    """
+    Distinct HTTP user agents; audit rows point here instead of repeating the string
+    """
+    digest = models.CharField(max_length=64, unique=True)  # sha256 of value
+    value = models.TextField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.value[:80]
+
 class AuditLog(models.Model):
     ACTION_CHOICES = [
         ('login', 'Login'),
@@ -49,7 +70,8 @@ class AuditLog(models.Model):
     resource_id = models.IntegerField(null=True, blank=True)
     details = models.JSONField(default=dict)
     ip_address = models.GenericIPAddressField(null=True, blank=True)
-    user_agent = models.TextField(blank=True)
+    # user_agents.UserAgentInterner resolves the id, usually without a query
+    agent = models.ForeignKey(UserAgent, on_delete=models.PROTECT, null=True, blank=True, related_name='+')
     timestamp = models.DateTimeField(auto_now_add=True)
     
     class Meta:
@@ -62,7 +84,31 @@ class AuditLog(models.Model):
         ]
     
     def __str__(self):
-        return f"{self.user.username} - {self.action} - {self.timestamp}"
+        # avoid a query per row when the user was not select_related
+        user = self.user.username if AuditLog.user.is_cached(self) else f'user #{self.user_id}'
+        return f"{user} - {self.action} - {self.timestamp}"
+
+    @property
+    def user_agent(self):
+        return self.agent.value if self.agent_id else ''
+
+class AuditArchiveSegment(models.Model):
+    """
+    One month of archived audit rows, one gzip JSONL file per archived batch (apps/users/audit_archive.py)
+    """
+    month = models.DateField(unique=True)  # first day of the month
+    # only files whose batch committed are listed; a write cut off by a crash is never read
+    files = models.JSONField(default=list)
+    row_count = models.PositiveIntegerField(default=0)
+    first_timestamp = models.DateTimeField(null=True, blank=True)
+    last_timestamp = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['month']
+
+    def __str__(self):
+        return f"{self.month:%Y-%m} ({self.row_count} rows)"
 
 class Notification(models.Model):
     NOTIFICATION_TYPES = [
@@ -97,15 +143,18 @@ class Notification(models.Model):
         ordering = ['-created_at']
         indexes = [
             models.Index(fields=['recipient', 'read']),
+            # keyset pagination of the inbox (apps/users/inbox.py)
+            models.Index(fields=['recipient', '-id'], name='users_notif_recipient_id'),
             models.Index(fields=['notification_type', 'created_at']),
             models.Index(fields=['priority', 'created_at']),
         ]
     
     def __str__(self):
-        return f"{self.title} - {self.recipient.username}"
+        recipient = self.recipient.username if Notification.recipient.is_cached(self) else f'user #{self.recipient_id}'
+        return f"{self.title} - {recipient}"
     
     def mark_as_read(self):
         if not self.read:
             self.read = True
             self.read_at = timezone.now()
-            self.save()
\ No newline at end of file
+            self.save(update_fields=['read', 'read_at'])
\ No newline at end of file
@@ -0,0 +1,195 @@
+import threading
+import time
+from django.conf import settings
+from django.db import connection
+from django.db.models.functions import Lower
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import User
+
+SEARCH_LIMIT = 10
+
+
+def normalize(term):
+    return (term or '').strip().lower()
+
+
+def _by_lower(field, value):
+    # LOWER(field) = value, served by the functional indexes on User
+    return User.objects.alias(**{f'{field}_lower': Lower(field)}).filter(**{f'{field}_lower': value})
+
+
+def find_by_username(username):
+    return _by_lower('username', normalize(username)).first()
+
+
+def find_by_email(email):
+    """
+    Case-insensitive email lookup that can use the lower(email) index;
+    email__iexact compiles to LIKE/UPPER() and scans the table
+    """
+    return _by_lower('email', normalize(email)).first()
+
+
+class UsernameTrie:
+    """
+    In-memory prefix index of (id, username) keyed by lowercased username.
+    Built lazily from one query and kept current through User signals; rebuilt
+    every ttl seconds to pick up users saved by other processes.
+    """
+
+    def __init__(self, ttl=300):
+        self.ttl = ttl
+        self._root = {}
+        self._keys = {}
+        self._loaded = False
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+
+    def _insert(self, user_id, username):
+        node = self._root
+        for ch in username.lower():
+            node = node.setdefault(ch, {})
+        node.setdefault(None, {})[user_id] = username
+        self._keys[user_id] = username
+
+    def _remove(self, user_id):
+        username = self._keys.pop(user_id, None)
+        if username is None:
+            return
+        key = username.lower()
+        path = [self._root]
+        for ch in key:
+            node = path[-1].get(ch)
+            if node is None:
+                return
+            path.append(node)
+        path[-1].get(None, {}).pop(user_id, None)
+        if not path[-1].get(None):
+            path[-1].pop(None, None)
+        # drop now-empty branches
+        for i in range(len(key), 0, -1):
+            if path[i]:
+                break
+            path[i - 1].pop(key[i - 1], None)
+
+    def _ensure_loaded(self):
+        if self._loaded and time.monotonic() - self._loaded_at < self.ttl:
+            return
+        self._root = {}
+        self._keys = {}
+        for user_id, username in User.objects.values_list('id', 'username').iterator(chunk_size=2000):
+            self._insert(user_id, username)
+        self._loaded = True
+        self._loaded_at = time.monotonic()
+
+    def update(self, user_id, username):
+        with self._lock:
+            if not self._loaded:
+                return
+            self._remove(user_id)
+            self._insert(user_id, username)
+
+    def remove(self, user_id):
+        with self._lock:
+            if self._loaded:
+                self._remove(user_id)
+
+    def search(self, prefix, limit=SEARCH_LIMIT):
+        """
+        Up to limit (id, username) pairs whose username starts with prefix;
+        exact match first, then shorter names in alphabetical order
+        """
+        with self._lock:
+            self._ensure_loaded()
+            node = self._root
+            for ch in normalize(prefix):
+                node = node.get(ch)
+                if node is None:
+                    return []
+            results = []
+            stack = [node]
+            # breadth-first so shorter completions come first
+            while stack and len(results) < limit:
+                next_level = []
+                for current in stack:
+                    if None in current:
+                        results.extend(sorted(current[None].items(), key=lambda item: item[1]))
+                    next_level.extend(current[ch] for ch in sorted(k for k in current if k is not None))
+                stack = next_level
+            return results[:limit]
+
+    def clear(self):
+        with self._lock:
+            self._root = {}
+            self._keys = {}
+            self._loaded = False
+
+
+username_trie = UsernameTrie(ttl=getattr(settings, 'USER_SEARCH_TRIE_TTL', 300))
+
+
+@receiver(post_save, sender=User)
+def update_username_trie(sender, instance, **kwargs):
+    username_trie.update(instance.pk, instance.username)
+
+
+@receiver(post_delete, sender=User)
+def remove_from_username_trie(sender, instance, **kwargs):
+    username_trie.remove(instance.pk)
+
+
+def get_search_backend():
+    """
+    USER_SEARCH_BACKEND: 'trigram' (PostgreSQL pg_trgm), 'trie' (in-memory) or 'index'
+    (range scan on lower(username)); 'auto' picks by database vendor
+    """
+    backend = getattr(settings, 'USER_SEARCH_BACKEND', 'auto')
+    if backend != 'auto':
+        return backend
+    if connection.vendor == 'postgresql':
+        return 'trigram'
+    if connection.vendor == 'sqlite':
+        return 'trie'
+    return 'index'
+
+
+def search_usernames(term, limit=SEARCH_LIMIT):
+    """
+    Typeahead lookup returning up to limit (id, username) pairs.
+    Exact match first, then prefix matches; with trigram also substring matches.
+    """
+    term = normalize(term)
+    if not term:
+        return []
+    backend = get_search_backend()
+    if backend == 'trie':
+        return username_trie.search(term, limit)
+
+    qs = User.objects.alias(username_lower=Lower('username'))
+    if backend == 'trigram':
+        # LIKE '%term%' on lower(username) is served by the gin_trgm_ops index
+        qs = qs.filter(username_lower__contains=term)
+    else:
+        # prefix as a range so the btree on lower(username) is used
+        qs = qs.filter(username_lower__gte=term, username_lower__lt=term + '\uffff')
+    rows = list(qs.order_by('username_lower').values_list('id', 'username')[:limit * 5 if backend == 'trigram' else limit])
+
+    def rank(row):
+        name = row[1].lower()
+        return (name != term, not name.startswith(term), len(name), name)
+
+    return sorted(rows, key=rank)[:limit]
+
+
+def search_users(term, limit=SEARCH_LIMIT):
+    """
+    Full User rows for the search endpoint: the exact username match (read
+    from the database, never stale) followed by search_usernames results
+    """
+    exact = find_by_username(term)
+    ids = [exact.pk] if exact else []
+    ids += [user_id for user_id, _ in search_usernames(term, limit) if user_id not in ids]
+    ids = ids[:limit]
+    users = User.objects.in_bulk(ids)
+    return [users[user_id] for user_id in ids if user_id in users]
@@ -97,10 +97,11 @@ class UserSerializer(serializers.ModelSerializer):
 
 class AuditLogSerializer(serializers.ModelSerializer):
     user_username = serializers.CharField(source='user.username', read_only=True)
+    user_agent = serializers.CharField(source='agent.value', read_only=True, default='')
 
     class Meta:
         model = AuditLog
-        fields = '__all__'
+        exclude = ['agent']
 
 class NotificationSerializer(serializers.ModelSerializer):
     recipient_username = serializers.CharField(source='recipient.username', read_only=True)
@@ -1,3 +1,449 @@
-from django.test import TestCase
+import csv
+import gzip
+import io
+import json
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from django.core.cache import cache
+from django.db import connection
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import Throttled
+from rest_framework.test import APITestCase
+from apps.menu.views import MenuItemViewSet
+from apps.orders.views import OrderItemViewSet, OrderViewSet
+from apps.stock.views import StockViewSet
+from kantinyonetim.query_budget import QueryBudgetExceeded, QueryBudgetMixin, missing_budgets, query_budget
+from .activity import ActivityTracker
+from .audit_archive import archive_audit_logs, query_archive
+from .authentication import user_cache
+from .login_guard import LoginGuard, login_guard
+from .search import find_by_email, search_usernames, username_trie
+from .inbox import mark_read, purge_read_notifications
+from .models import AuditArchiveSegment, AuditLog, Notification, User, UserAgent
+from .throttling import AdmissionController, CacheBucketStore, LocalBucketStore, in_flight, reset_rate_limits
+from .user_agents import user_agents
+from .utils import log_user_action
+from .views import UserViewSet
 
-# Create your tests here.
+
+class TokenBucketTests(TestCase):
+    def test_bucket_refills_over_time(self):
+        store = LocalBucketStore()
+        self.assertEqual(store.consume('k', 2, 1.0, now=0), (True, 0))
+        self.assertEqual(store.consume('k', 2, 1.0, now=0), (True, 0))
+        allowed, wait = store.consume('k', 2, 1.0, now=0)
+        self.assertFalse(allowed)
+        self.assertAlmostEqual(wait, 1.0)
+        self.assertTrue(store.consume('k', 2, 1.0, now=1.0)[0])
+
+    def test_store_is_bounded(self):
+        store = LocalBucketStore(max_keys=2)
+        for key in ('a', 'b', 'c'):
+            store.consume(key, 1, 1.0, now=0)
+        self.assertEqual(list(store._buckets), ['b', 'c'])
+
+    def test_rejected_request_consumes_no_bucket(self):
+        store = LocalBucketStore()
+        buckets = [('user', 5, 1.0), ('endpoint', 1, 1.0)]
+        self.assertEqual(store.consume_all(buckets, now=0), (True, 0))
+        self.assertFalse(store.consume_all(buckets, now=0)[0])
+        # the endpoint refusal left the user bucket at 4 tokens
+        self.assertAlmostEqual(store._buckets['user'][0], 4)
+
+    def test_cache_store_clear_keeps_other_cache_entries(self):
+        store = CacheBucketStore()
+        cache.set('unrelated', 'kept')
+        self.assertTrue(store.consume('k', 1, 0.01, now=0)[0])
+        self.assertFalse(store.consume('k', 1, 0.01, now=0)[0])
+        store.clear()
+        self.assertTrue(store.consume('k', 1, 0.01, now=0)[0])
+        self.assertEqual(cache.get('unrelated'), 'kept')
+
+    def test_admission_sheds_under_global_load(self):
+        controller = AdmissionController(max_active=1, max_waiting=0, wait_timeout=0, shed_at_in_flight=2)
+        with in_flight.track(), in_flight.track():
+            with self.assertRaises(Throttled):
+                with controller.admit():
+                    pass
+        with controller.admit():
+            pass
+
+    def test_admission_sheds_when_saturated(self):
+        controller = AdmissionController(max_active=1, max_waiting=0, wait_timeout=0)
+        with controller.admit():
+            with self.assertRaises(Throttled):
+                with controller.admit():
+                    pass
+        with controller.admit():
+            pass
+
+
+@override_settings(RATE_LIMITS={'order_create': {'user': '2/min'}})
+class OrderRateLimitTests(APITestCase):
+    def setUp(self):
+        reset_rate_limits()
+        self.customer = User.objects.create(username='cust', role='customer')
+        self.client.force_authenticate(self.customer)
+
+    def tearDown(self):
+        reset_rate_limits()
+
+    def test_create_from_cart_returns_429_with_retry_after(self):
+        for _ in range(2):
+            res = self.client.post('/api/orders/create-from-cart/', {'items': []}, format='json')
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        res = self.client.post('/api/orders/create-from-cart/', {'items': []}, format='json')
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertIn('Retry-After', res)
+
+
+class CachedJWTAuthenticationTests(APITestCase):
+    def setUp(self):
+        user_cache.clear()
+        self.staff = User.objects.create(username='staff', role='staff')
+        self.staff.set_password('staffpass')
+        self.staff.save()
+        res = self.client.post('/api/token/', {'username': 'staff', 'password': 'staffpass'}, format='json')
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {res.data['access']}")
+
+    def user_selects(self, ctx):
+        return [q['sql'] for q in ctx.captured_queries if 'FROM "users_user"' in q['sql']]
+
+    def test_repeated_requests_skip_user_select(self):
+        self.client.get('/api/notifications/')
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.get('/api/notifications/')
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.user_selects(ctx), [])
+
+    def test_user_change_invalidates_cache(self):
+        self.client.get('/api/notifications/')
+        self.staff.is_active = False
+        self.staff.save()
+        res = self.client.get('/api/notifications/')
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_logout_revokes_issued_tokens(self):
+        res = self.client.post('/api/users/logout/')
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        res = self.client.get('/api/notifications/')
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    @override_settings(JWT_STATELESS_ROLE_CLAIMS=True)
+    def test_stateless_role_claims_read_the_row_only_on_a_cache_miss(self):
+        user_cache.clear()
+        self.client.get('/api/reports/sales/')
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.get('/api/reports/sales/')
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.user_selects(ctx), [])
+
+    @override_settings(JWT_STATELESS_ROLE_CLAIMS=True)
+    def test_stateless_role_claims_still_honour_logout_and_deactivation(self):
+        res = self.client.post('/api/users/logout/')
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.client.get('/api/notifications/').status_code, status.HTTP_401_UNAUTHORIZED)
+
+        res = self.client.post('/api/token/', {'username': 'staff', 'password': 'staffpass'}, format='json')
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {res.data['access']}")
+        self.assertEqual(self.client.get('/api/notifications/').status_code, status.HTTP_200_OK)
+        self.staff.refresh_from_db()
+        self.staff.is_active = False
+        self.staff.save()
+        self.assertEqual(self.client.get('/api/notifications/').status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class ActivityTrackerTests(TestCase):
+    def test_touches_are_buffered_and_flushed_in_bulk(self):
+        users = [User.objects.create(username=f'user{i}') for i in range(3)]
+        tracker = ActivityTracker(flush_interval=3600)
+        for user in users:
+            tracker.touch(user.pk)
+        self.assertEqual(User.objects.filter(last_activity__isnull=False).count(), 0)
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(tracker.flush(), 3)
+        self.assertEqual(len(ctx.captured_queries), 1)
+        self.assertEqual(User.objects.filter(last_activity__isnull=False).count(), 3)
+
+    def test_save_does_not_touch_last_activity(self):
+        user = User.objects.create(username='quiet')
+        user.first_name = 'Q'
+        user.save()
+        user.refresh_from_db()
+        self.assertIsNone(user.last_activity)
+
+
+class LoginGuardTests(APITestCase):
+    def setUp(self):
+        login_guard.clear()
+        self.addCleanup(login_guard.clear)
+        self.user = User.objects.create_user(username='victim', email='victim@example.com', password='pw')
+
+    def test_window_expires_old_failures(self):
+        guard = LoginGuard(max_failures=2, window=10, lockout=60)
+        guard.record_failure('a', '1.1.1.1', now=0)
+        self.assertEqual(guard.record_failure('a', '1.1.1.1', now=11), (1, None))
+        failures, until = guard.record_failure('a', '1.1.1.1', now=12)
+        self.assertEqual((failures, until), (2, 72))
+        self.assertEqual(guard.retry_after('A', None, now=20), 52)
+        self.assertEqual(guard.retry_after('a', None, now=80), 0)
+
+    def test_lockout_persists_and_skips_password_check(self):
+        for _ in range(login_guard.max_failures):
+            res = self.client.post('/api/token/', {'username': 'victim', 'password': 'wrong'})
+            self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.user.refresh_from_db()
+        self.assertIsNotNone(self.user.locked_until)
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.post('/api/token/', {'username': 'victim', 'password': 'pw'})
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(len(ctx.captured_queries), 0)
+
+        # another process only knows the persisted lock
+        login_guard.clear()
+        res = self.client.post('/api/token/', {'username': 'victim@example.com', 'password': 'pw'})
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    def test_success_resets_attempts(self):
+        self.client.post('/api/token/', {'username': 'victim', 'password': 'wrong'})
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.login_attempts, 1)
+        res = self.client.post('/api/token/', {'username': 'victim', 'password': 'pw'})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.login_attempts, 0)
+
+
+class UserSearchTests(APITestCase):
+    def setUp(self):
+        username_trie.clear()
+        self.addCleanup(username_trie.clear)
+        self.staff = User.objects.create_user(username='staff', password='pw', role='staff')
+        for name in ('Ali', 'alice', 'alican', 'bob'):
+            User.objects.create_user(username=name, email=f'{name}@Example.com', password='pw')
+        self.client.force_authenticate(self.staff)
+
+    def test_trie_prefix_and_updates(self):
+        self.assertEqual([name for _, name in username_trie.search('ali')], ['Ali', 'alice', 'alican'])
+        User.objects.filter(username='bob').first().delete()
+        renamed = User.objects.get(username='alican')
+        renamed.username = 'zeynep'
+        renamed.save()
+        self.assertEqual([name for _, name in username_trie.search('ali')], ['Ali', 'alice'])
+        self.assertEqual(username_trie.search('b'), [])
+
+    @override_settings(USER_SEARCH_BACKEND='index')
+    def test_index_backend_ranks_exact_first(self):
+        self.assertEqual([name for _, name in search_usernames('ALI')], ['Ali', 'alice', 'alican'])
+
+    def test_typeahead_returns_id_and_username(self):
+        res = self.client.get('/api/users/typeahead/', {'q': 'alic'})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([sorted(row) for row in res.data], [['id', 'username']] * 2)
+        res = self.client.get('/api/users/search/', {'username': 'ali'})
+        self.assertEqual(res.data[0]['username'], 'Ali')
+
+    def test_email_lookup_is_case_insensitive(self):
+        self.assertEqual(find_by_email(' ALICE@example.COM').username, 'alice')
+
+
+class AuditArchiveTests(APITestCase):
+    def setUp(self):
+        self.archive_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.archive_dir)
+        self.admin = User.objects.create_user(username='boss', password='pw', role='admin')
+        now = timezone.now()
+        for days_ago in (400, 200, 100, 1):
+            log = AuditLog.objects.create(user=self.admin, action='login', resource_type='user', details={'d': days_ago})
+            AuditLog.objects.filter(pk=log.pk).update(timestamp=now - timedelta(days=days_ago))
+
+    def test_old_rows_move_to_monthly_segments(self):
+        with override_settings(AUDIT_ARCHIVE_DIR=self.archive_dir):
+            self.assertEqual(archive_audit_logs(days=90, batch_size=2), 3)
+            self.assertEqual(archive_audit_logs(days=90), 0)
+        self.assertEqual(AuditLog.objects.count(), 1)
+        self.assertEqual(AuditArchiveSegment.objects.count(), 3)
+        self.assertEqual(sorted(r['details']['d'] for r in query_archive()), [100, 200, 400])
+        recent = query_archive(date_from=timezone.now() - timedelta(days=150))
+        self.assertEqual([r['details']['d'] for r in recent], [100])
+
+    def test_rows_archived_out_of_id_order_are_not_dropped(self):
+        # ids do not follow timestamps: the older row of a month gets the higher id
+        month = (timezone.now() - timedelta(days=150)).replace(day=1, hour=12)
+        young = AuditLog.objects.create(user=self.admin, action='login', resource_type='user', details={'d': 'young'})
+        old = AuditLog.objects.create(user=self.admin, action='login', resource_type='user', details={'d': 'old'})
+        AuditLog.objects.filter(pk=old.pk).update(timestamp=month + timedelta(days=1))
+        AuditLog.objects.filter(pk=young.pk).update(timestamp=month + timedelta(days=3))
+        between = (timezone.now() - (month + timedelta(days=2))).days
+        archive_audit_logs(days=between, archive_dir=self.archive_dir)
+        self.assertTrue(AuditLog.objects.filter(pk=young.pk).exists())
+
+        archive_audit_logs(days=90, archive_dir=self.archive_dir)
+        self.assertFalse(AuditLog.objects.filter(pk=young.pk).exists())
+        archived = {str(r['details']['d']) for r in query_archive()}
+        self.assertTrue({'young', 'old'} <= archived)
+
+    def test_damaged_archive_file_does_not_hide_the_rest(self):
+        month = (timezone.now() - timedelta(days=150)).replace(day=1, hour=12)
+        for i in range(2):
+            log = AuditLog.objects.create(user=self.admin, action='login', resource_type='user', details={'d': f'batch{i}'})
+            AuditLog.objects.filter(pk=log.pk).update(timestamp=month + timedelta(days=i + 1))
+        archive_audit_logs(days=90, batch_size=1, archive_dir=self.archive_dir)
+        segment = AuditArchiveSegment.objects.get(month=month.date())
+        self.assertEqual(len(segment.files), 2)
+
+        # e.g. a disk that filled up while the file was written
+        with open(segment.files[0], 'r+b') as fh:
+            fh.truncate(os.path.getsize(segment.files[0]) // 2)
+        with self.assertLogs('apps.users.audit_archive', 'WARNING'):
+            archived = {str(r['details']['d']) for r in query_archive()}
+        self.assertEqual(archived, {'batch1', '100', '200', '400'})
+
+    def test_audit_logs_endpoint_reads_archive_on_request(self):
+        archive_audit_logs(days=90, archive_dir=self.archive_dir)
+        self.client.force_authenticate(self.admin)
+        res = self.client.get('/api/users/audit_logs/')
+        self.assertEqual(len(res.data), 1)
+        res = self.client.get('/api/users/audit_logs/', {'archived': '1', 'user': 'BOS'})
+        self.assertEqual([row['details']['d'] for row in res.data], [1, 100, 200, 400])
+        self.assertEqual(res.data[-1]['user_username'], 'boss')
+
+
+class AuditExportTests(APITestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user(username='boss', password='pw', role='admin')
+        for i in range(5):
+            AuditLog.objects.create(user=self.admin, action='login', resource_type='user', resource_id=i, details={'i': i})
+        self.client.force_authenticate(self.admin)
+
+    def test_csv_export_streams_rows(self):
+        res = self.client.get('/api/users/audit_logs/export/', {'action': 'login'})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(res.streaming)
+        rows = list(csv.DictReader(io.StringIO(b''.join(res.streaming_content).decode())))
+        self.assertEqual([int(row['resource_id']) for row in rows], [0, 1, 2, 3, 4])
+        self.assertEqual(json.loads(rows[0]['details']), {'i': 0})
+
+    def test_gzipped_ndjson_export(self):
+        res = self.client.get('/api/users/audit_logs/export/', {'output': 'ndjson', 'gzip': '1'})
+        self.assertEqual(res['Content-Type'], 'application/gzip')
+        lines = gzip.decompress(b''.join(res.streaming_content)).decode().splitlines()
+        self.assertEqual(len(lines), 5)
+        self.assertEqual(json.loads(lines[-1])['user__username'], 'boss')
+
+    def test_unknown_output_is_rejected(self):
+        res = self.client.get('/api/users/audit_logs/export/', {'output': 'xml'})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class UserAgentInternTests(APITestCase):
+    def setUp(self):
+        user_agents.clear()
+        self.addCleanup(user_agents.clear)
+        self.admin = User.objects.create_user(username='boss', password='pw', role='admin')
+
+    def test_repeated_agents_share_one_row_and_skip_lookup_once_committed(self):
+        request = RequestFactory().get('/', HTTP_USER_AGENT='Kiosk/1.0')
+        with self.captureOnCommitCallbacks(execute=True):
+            log_user_action(self.admin, 'login', 'user', request=request)
+        with CaptureQueriesContext(connection) as ctx:
+            log_user_action(self.admin, 'logout', 'user', request=request)
+        self.assertFalse([q for q in ctx.captured_queries if 'users_useragent' in q['sql']])
+        self.assertEqual(UserAgent.objects.count(), 1)
+        self.assertEqual(AuditLog.objects.filter(agent__value='Kiosk/1.0').count(), 2)
+
+        self.client.force_authenticate(self.admin)
+        res = self.client.get('/api/users/audit_logs/')
+        self.assertEqual({row['user_agent'] for row in res.data}, {'Kiosk/1.0'})
+
+    def test_uncommitted_ids_are_not_cached(self):
+        user_agents.get_id('Phone/2.0')
+        self.assertEqual(len(user_agents._ids), 0)
+
+
+class NotificationInboxTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='reader', password='pw')
+        self.other = User.objects.create_user(username='other', password='pw')
+        Notification.objects.bulk_create([
+            Notification(recipient=self.user, notification_type='order_status', title=f'n{i}', message='m')
+            for i in range(5)
+        ] + [Notification(recipient=self.other, notification_type='order_status', title='x', message='m')])
+        self.client.force_authenticate(self.user)
+
+    def test_keyset_pages_and_unread_count(self):
+        res = self.client.get('/api/notifications/', {'limit': 3})
+        self.assertEqual([n['title'] for n in res.data['results']], ['n4', 'n3', 'n2'])
+        res = self.client.get('/api/notifications/', {'limit': 3, 'before': res.data['next_before']})
+        self.assertEqual([n['title'] for n in res.data['results']], ['n1', 'n0'])
+        self.assertIsNone(res.data['next_before'])
+        res = self.client.get('/api/notifications/unread-count/')
+        self.assertEqual(res.data, {'unread': 5})
+
+    def test_bulk_mark_read_is_one_update(self):
+        ids = list(Notification.objects.filter(recipient=self.user).values_list('id', flat=True)[:2])
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.post('/api/notifications/read/', {'ids': ids}, format='json')
+        self.assertEqual(res.data, {'updated': 2})
+        self.assertEqual(len([q for q in ctx.captured_queries if q['sql'].startswith('UPDATE')]), 1)
+        self.client.post('/api/notifications/read/', {'all': True}, format='json')
+        self.assertEqual(Notification.objects.filter(read=False).count(), 1)
+
+    def test_purge_removes_only_old_read_notifications(self):
+        mark_read(self.user)
+        Notification.objects.filter(title__in=['n0', 'n1']).update(created_at=timezone.now() - timedelta(days=60))
+        self.assertEqual(purge_read_notifications(days=30, batch_size=1), 2)
+        self.assertEqual(Notification.objects.count(), 4)
+
+
+class UserQueryBudgetTests(QueryBudgetMixin, APITestCase):
+    def setUp(self):
+        username_trie.clear()
+        self.admin = User.objects.create_user(username='budgetadmin', password='adminpass', role='admin')
+        for i in range(5):
+            user = User.objects.create_user(username=f'budget{i}', password='pw', email=f'budget{i}@example.com')
+            log_user_action(user, 'login', 'user', user.id)
+            Notification.objects.create(recipient=self.admin, notification_type='order_status', title=f'n{i}', message='m')
+        self.victim = User.objects.get(username='budget0')
+        res = self.client.post('/api/token/', {'username': 'budgetadmin', 'password': 'adminpass'}, format='json')
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {res.data['access']}")
+
+    def test_every_action_has_a_budget(self):
+        for viewset in (UserViewSet, MenuItemViewSet, OrderViewSet, OrderItemViewSet, StockViewSet):
+            self.assertEqual(missing_budgets(viewset), [], viewset.__name__)
+
+    def test_actions_stay_within_budget(self):
+        notification = Notification.objects.filter(recipient=self.admin).first()
+        self.assertRequestWithinBudget(UserViewSet, 'list', 'get', '/api/users/')
+        self.assertRequestWithinBudget(UserViewSet, 'retrieve', 'get', f'/api/users/{self.victim.id}/')
+        self.assertRequestWithinBudget(UserViewSet, 'create', 'post', '/api/users/', {'username': 'newbie', 'password': 'Long-Passw0rd!', 'email': 'newbie@example.com'})
+        self.assertRequestWithinBudget(UserViewSet, 'update', 'put', f'/api/users/{self.victim.id}/', {'first_name': 'Ada'})
+        self.assertRequestWithinBudget(UserViewSet, 'partial_update', 'patch', f'/api/users/{self.victim.id}/', {'last_name': 'Lovelace'})
+        self.assertRequestWithinBudget(UserViewSet, 'me', 'get', '/api/users/me/')
+        self.assertRequestWithinBudget(UserViewSet, 'search', 'get', '/api/users/search/', {'username': 'budget'})
+        self.assertRequestWithinBudget(UserViewSet, 'typeahead', 'get', '/api/users/typeahead/', {'q': 'bud'})
+        self.assertRequestWithinBudget(UserViewSet, 'active', 'get', '/api/users/active/')
+        self.assertRequestWithinBudget(UserViewSet, 'audit_logs', 'get', '/api/audit-logs/')
+        self.assertRequestWithinBudget(UserViewSet, 'create_audit_log', 'post', '/api/audit-logs/', {'action': 'update', 'resource_type': 'menu'})
+        self.assertRequestWithinBudget(UserViewSet, 'export_audit_logs', 'get', '/api/users/audit_logs/export/?output=ndjson')
+        self.assertRequestWithinBudget(UserViewSet, 'notifications', 'get', '/api/notifications/')
+        self.assertRequestWithinBudget(UserViewSet, 'unread_notification_count', 'get', '/api/notifications/unread-count/')
+        self.assertRequestWithinBudget(UserViewSet, 'mark_notification_read', 'post', f'/api/notifications/{notification.id}/read/')
+        self.assertRequestWithinBudget(UserViewSet, 'mark_notifications_read', 'post', '/api/notifications/read/', {'all': True})
+        self.assertRequestWithinBudget(UserViewSet, 'destroy', 'delete', f'/api/users/{self.victim.id}/')
+        self.assertRequestWithinBudget(UserViewSet, 'logout', 'post', '/api/users/logout/')
+
+    def test_budget_failure_lists_repeated_queries(self):
+        with self.assertRaises(QueryBudgetExceeded) as ctx:
+            with query_budget(2, label='loop'):
+                for user in User.objects.all()[:3]:
+                    list(user.audit_logs.all())
+        message = str(ctx.exception)
+        self.assertTrue(message.startswith('loop: 4 queries, budget 2.'))
+        self.assertIn('3x SELECT', message)
+        self.assertIn('apps/users/tests.py', message)
@@ -0,0 +1,246 @@
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.exceptions import Throttled
+from rest_framework.throttling import BaseThrottle
+from .utils import get_client_ip
+
+PERIODS = {'s': 1, 'sec': 1, 'm': 60, 'min': 60, 'h': 3600, 'hour': 3600, 'd': 86400, 'day': 86400}
+
+
+def parse_rate(rate):
+    """
+    '10/min' -> (capacity 10, refill 10/60 tokens per second)
+    """
+    count, period = rate.split('/')
+    count = int(count)
+    return count, count / PERIODS[period]
+
+
+class LocalBucketStore:
+    """
+    In-process token buckets. O(1) per request and never touches the database;
+    each worker process has its own buckets.
+    """
+
+    def __init__(self, max_keys=10000):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def consume(self, key, capacity, refill_rate, now=None):
+        return self.consume_all([(key, capacity, refill_rate)], now=now)
+
+    def consume_all(self, buckets, now=None):
+        """
+        Take one token from every (key, capacity, refill_rate) bucket, or from none of them
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            levels = []
+            for key, capacity, refill_rate in buckets:
+                tokens, updated = self._buckets.pop(key, (capacity, now))
+                levels.append((key, min(capacity, tokens + (now - updated) * refill_rate)))
+            allowed, wait = _check(buckets, levels)
+            for key, tokens in levels:
+                self._buckets[key] = (tokens - 1 if allowed else tokens, now)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return allowed, wait
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+class CacheBucketStore:
+    """
+    Token buckets kept in the Django cache so all workers share them.
+    Read-modify-write is not atomic, so limits are approximate under heavy contention.
+    """
+
+    GENERATION_KEY = 'ratelimit:generation'
+
+    def _prefix(self):
+        # bumped by clear(); the cache is shared with other users, so it is never cleared wholesale
+        return f'ratelimit:{cache.get_or_set(self.GENERATION_KEY, 0, timeout=None)}:'
+
+    def consume(self, key, capacity, refill_rate, now=None):
+        return self.consume_all([(key, capacity, refill_rate)], now=now)
+
+    def consume_all(self, buckets, now=None):
+        """
+        Take one token from every (key, capacity, refill_rate) bucket, or from none of them
+        """
+        now = time.time() if now is None else now
+        prefix = self._prefix()
+        stored = cache.get_many([prefix + key for key, _, _ in buckets])
+        levels = []
+        for key, capacity, refill_rate in buckets:
+            tokens, updated = stored.get(prefix + key, (capacity, now))
+            levels.append((key, min(capacity, tokens + (now - updated) * refill_rate)))
+        allowed, wait = _check(buckets, levels)
+        if allowed:
+            for (key, capacity, refill_rate), (_, tokens) in zip(buckets, levels):
+                cache.set(prefix + key, (tokens - 1, now), timeout=int(capacity / refill_rate) + 1)
+        return allowed, wait
+
+    def clear(self):
+        try:
+            cache.incr(self.GENERATION_KEY)
+        except ValueError:
+            cache.set(self.GENERATION_KEY, 1, timeout=None)
+
+
+def _check(buckets, levels):
+    """
+    (allowed, seconds until the emptiest bucket has a token again)
+    """
+    wait = 0
+    for (_, _, refill_rate), (_, tokens) in zip(buckets, levels):
+        if tokens < 1:
+            wait = max(wait, (1 - tokens) / refill_rate)
+    return wait == 0, wait
+
+
+_local_store = LocalBucketStore()
+_cache_store = CacheBucketStore()
+
+
+def get_bucket_store():
+    if getattr(settings, 'RATE_LIMIT_STORE', 'local') == 'cache':
+        return _cache_store
+    return _local_store
+
+
+def reset_rate_limits():
+    get_bucket_store().clear()
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """
+    Per-user and per-endpoint token buckets configured in settings.RATE_LIMITS[scope]:
+    {'user': '10/min', 'endpoint': '300/min'}. Either limit may be omitted.
+    """
+    scope = None
+
+    def allow_request(self, request, view):
+        self.retry_after = None
+        limits = getattr(settings, 'RATE_LIMITS', {}).get(self.scope)
+        if not limits:
+            return True
+
+        store = get_bucket_store()
+        user = request.user
+        ident = f'user:{user.pk}' if user and user.is_authenticated else f'ip:{get_client_ip(request)}'
+        buckets = []
+        if limits.get('user'):
+            buckets.append((f'{self.scope}:{ident}', limits['user']))
+        if limits.get('endpoint'):
+            buckets.append((self.scope, limits['endpoint']))
+
+        # a request refused by one bucket must not use up the others
+        allowed, wait = store.consume_all([(key, *parse_rate(rate)) for key, rate in buckets])
+        if not allowed:
+            self.retry_after = wait
+        return allowed
+
+    def wait(self):
+        return self.retry_after
+
+
+class OrderCreateThrottle(TokenBucketThrottle):
+    scope = 'order_create'
+
+
+class VoiceOrderThrottle(TokenBucketThrottle):
+    scope = 'voice_order'
+
+
+class InFlightRequests:
+    """
+    Number of requests this process is serving right now; the global load signal
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.count = 0
+
+    @contextmanager
+    def track(self):
+        with self._lock:
+            self.count += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.count -= 1
+
+
+in_flight = InFlightRequests()
+
+
+class InFlightMiddleware:
+    """
+    Counts requests in flight so expensive endpoints can be shed first under load
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with in_flight.track():
+            return self.get_response(request)
+
+
+class AdmissionController:
+    """
+    Bounds concurrent work (e.g. Whisper transcriptions) and the number of requests
+    allowed to wait for a slot. Requests beyond that, and every request while the
+    process serves at least `shed_at_in_flight` requests overall (0 disables), are
+    shed with 429 instead of piling up on the worker threads.
+    """
+
+    def __init__(self, max_active, max_waiting, wait_timeout, retry_after=5, shed_at_in_flight=0):
+        self.max_active = max_active
+        self.max_waiting = max_waiting
+        self.wait_timeout = wait_timeout
+        self.retry_after = retry_after
+        self.shed_at_in_flight = shed_at_in_flight
+        self._slots = threading.BoundedSemaphore(max_active)
+        self._lock = threading.Lock()
+        self._admitted = 0
+
+    @property
+    def saturated(self):
+        if self.shed_at_in_flight and in_flight.count >= self.shed_at_in_flight:
+            return True
+        return self._admitted >= self.max_active + self.max_waiting
+
+    @contextmanager
+    def admit(self):
+        with self._lock:
+            if self.saturated:
+                raise Throttled(wait=self.retry_after, detail='Server is busy, please try again shortly.')
+            self._admitted += 1
+        try:
+            if not self._slots.acquire(timeout=self.wait_timeout):
+                raise Throttled(wait=self.retry_after, detail='Server is busy, please try again shortly.')
+            try:
+                yield
+            finally:
+                self._slots.release()
+        finally:
+            with self._lock:
+                self._admitted -= 1
+
+
+voice_admission = AdmissionController(
+    max_active=getattr(settings, 'VOICE_MAX_CONCURRENT', 1),
+    max_waiting=getattr(settings, 'VOICE_MAX_WAITING', 4),
+    wait_timeout=getattr(settings, 'VOICE_WAIT_TIMEOUT_SECONDS', 30),
+    shed_at_in_flight=getattr(settings, 'VOICE_SHED_AT_IN_FLIGHT', 0),
+)
@@ -9,5 +9,7 @@ urlpatterns = [
     path('', include(router.urls)),
     path('audit-logs/', UserViewSet.as_view({'get': 'audit_logs', 'post': 'create_audit_log'}), name='audit-logs'),
     path('notifications/', UserViewSet.as_view({'get': 'notifications'}), name='notifications'),
+    path('notifications/unread-count/', UserViewSet.as_view({'get': 'unread_notification_count'}), name='notifications-unread-count'),
+    path('notifications/read/', UserViewSet.as_view({'post': 'mark_notifications_read'}), name='mark-notifications-read'),
     path('notifications/<int:pk>/read/', UserViewSet.as_view({'post': 'mark_notification_read'}), name='mark-notification-read'),
 ]
\ No newline at end of file
@@ -0,0 +1,53 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from django.conf import settings
+from django.db import transaction
+from .models import UserAgent
+
+
+def agent_digest(value):
+    return hashlib.sha256(value.encode('utf-8')).hexdigest()
+
+
+class UserAgentInterner:
+    """
+    Maps user agent strings to UserAgent ids, keeping the most recent max_size
+    in process so repeated kiosk/mobile agents resolve without a query.
+    Ids are only cached once the transaction that created or read them
+    commits, so a rolled back insert never leaves a dangling id behind.
+    """
+
+    def __init__(self, max_size=512):
+        self.max_size = max_size
+        self._ids = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _remember(self, value, agent_id):
+        with self._lock:
+            self._ids[value] = agent_id
+            self._ids.move_to_end(value)
+            while len(self._ids) > self.max_size:
+                self._ids.popitem(last=False)
+
+    def get_id(self, value):
+        """
+        UserAgent id for value, or None for an empty user agent
+        """
+        if not value:
+            return None
+        with self._lock:
+            agent_id = self._ids.get(value)
+            if agent_id is not None:
+                self._ids.move_to_end(value)
+                return agent_id
+        agent, _ = UserAgent.objects.get_or_create(digest=agent_digest(value), defaults={'value': value})
+        transaction.on_commit(lambda: self._remember(value, agent.pk))
+        return agent.pk
+
+    def clear(self):
+        with self._lock:
+            self._ids.clear()
+
+
+user_agents = UserAgentInterner(max_size=getattr(settings, 'USER_AGENT_CACHE_SIZE', 512))
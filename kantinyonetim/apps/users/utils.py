@@ -1,20 +1,18 @@
+import logging
 from .models import AuditLog, Notification
+from .user_agents import user_agents
 from django.utils import timezone
 
+logger = logging.getLogger(__name__)
+
 def log_user_action(user, action, resource_type=None, resource_id=None, details=None, request=None):
     """
     Log user actions for audit purposes
     """
-    print(f"Attempting to log action: {action}")
-    print(f"User: {user.username if user else 'Anonymous'}, Resource Type: {resource_type}, Resource ID: {resource_id}, Details: {details}")
+    logger.debug('Audit %s by %s on %s %s', action, user.username if user else 'Anonymous', resource_type, resource_id)
     try:
-        ip_address = None
-        user_agent = ""
-        
-        if request:
-            ip_address = get_client_ip(request)
-            user_agent = request.META.get('HTTP_USER_AGENT', '')
-        
+        ip_address, agent_id = request_audit_meta(request)
+
         AuditLog.objects.create(
             user=user,
             action=action,
@@ -22,12 +20,11 @@ def log_user_action(user, action, resource_type=None, resource_id=None, details=
             resource_id=resource_id,
             details=details or {},
             ip_address=ip_address,
-            user_agent=user_agent
+            agent_id=agent_id
         )
-        print(f"Successfully logged action: {action}")
     except Exception as e:
         # Don't let logging errors break the main functionality
-        print(f"Logging error: {e}")
+        logger.warning('Audit logging failed for %s: %s', action, e)
 
 def get_client_ip(request):
     """
@@ -40,6 +37,14 @@ def get_client_ip(request):
         ip = request.META.get('REMOTE_ADDR')
     return ip
 
+def request_audit_meta(request):
+    """
+    Client IP and interned UserAgent id for an audit row
+    """
+    if not request:
+        return None, None
+    return get_client_ip(request), user_agents.get_id(request.META.get('HTTP_USER_AGENT', ''))
+
 def create_notification(recipient, notification_type, title, message, priority='medium', 
                        resource_type=None, resource_id=None):
     """
@@ -56,7 +61,7 @@ def create_notification(recipient, notification_type, title, message, priority='
             resource_id=resource_id
         )
     except Exception as e:
-        print(f"Notification creation error: {e}")
+        logger.warning('Notification creation failed: %s', e)
 
 def notify_staff_new_order(order, customer):
     """
@@ -65,22 +70,29 @@ def notify_staff_new_order(order, customer):
     from django.contrib.auth import get_user_model
     User = get_user_model()
     
-    staff_users = User.objects.filter(role__in=['staff', 'admin'])
-    
-    for staff_user in staff_users:
-        create_notification(
-            recipient=staff_user,
-            notification_type='order_new',
-            title='New Order Received',
-            message=f'Customer {customer.username} has placed a new order #{order.id}',
-            priority='high',
-            resource_type='order',
-            resource_id=order.id
-        )
+    staff_ids = User.objects.filter(role__in=['staff', 'admin']).values_list('id', flat=True)
+    message = f'Customer {customer.username} has placed a new order #{order.id}'
+    # One INSERT however many staff accounts exist
+    try:
+        Notification.objects.bulk_create([
+            Notification(
+                recipient_id=staff_id,
+                notification_type='order_new',
+                title='New Order Received',
+                message=message,
+                priority='high',
+                resource_type='order',
+                resource_id=order.id
+            )
+            for staff_id in staff_ids
+        ])
+    except Exception as e:
+        logger.warning('Notification creation failed: %s', e)
 
 def notify_order_status_change(order, old_status, new_status, changed_by, request=None):
     """
-    Notify relevant users about order status changes
+    Notify relevant users about order status changes.
+    The audit entry is written by the caller (see apps.orders.transitions).
     """
     # Notify customer about status change
     create_notification(
@@ -92,18 +104,3 @@ def notify_order_status_change(order, old_status, new_status, changed_by, reques
         resource_type='order',
         resource_id=order.id
     )
-    
-    # Log the status change
-    log_user_action(
-        user=changed_by,
-        action='order_status_changed',
-        resource_type='order',
-        resource_id=order.id,
-        details={
-            'order_id': order.id,
-            'old_status': old_status,
-            'new_status': new_status,
-            'customer': order.user.username
-        },
-        request=request # Pass request object for full audit details
-    )
@@ -7,22 +7,55 @@ from .models import User, AuditLog, Notification
 from .serializers import UserSerializer, AuditLogSerializer, NotificationSerializer
 from .permissions import IsStaffOrAdmin
 from .utils import log_user_action
-from django.db.models import Q
+from .authentication import revoke_user_tokens
+from .activity import active_users
+from .search import search_users, search_usernames
+from .audit_archive import query_archive
+from .audit_export import EXPORT_FORMATS, export_response
+from .inbox import PAGE_SIZE, mark_read, notification_page, unread_count
+from django.db.models import Q, prefetch_related_objects
+from kantinyonetim.instrumentation import InstrumentedViewMixin
+from kantinyonetim.responses import CachePolicyMixin, etag_matches, not_modified, queryset_etag
 from datetime import datetime, timedelta
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 
 
-class UserViewSet(viewsets.ModelViewSet):
+class UserViewSet(CachePolicyMixin, InstrumentedViewMixin, viewsets.ModelViewSet):
     queryset = User.objects.all()
     serializer_class = UserSerializer
     permission_classes = [IsStaffOrAdmin]
     lookup_field = 'pk'
+    # Max queries per request, enforced by UserQueryBudgetTests (see kantinyonetim.query_budget)
+    query_budgets = {
+        'list': 4,
+        'retrieve': 4,
+        'create': 8,
+        'update': 8,
+        'partial_update': 8,
+        'destroy': 19,
+        'me': 3,
+        'search': 6,
+        'typeahead': 2,
+        'active': 3,
+        'audit_logs': 3,
+        'create_audit_log': 2,
+        'export_audit_logs': 2,
+        'notifications': 2,
+        'unread_notification_count': 2,
+        'mark_notification_read': 3,
+        'mark_notifications_read': 2,
+        'logout': 3,
+    }
 
     def get_queryset(self):
         user = self.request.user
+        # UserSerializer exposes the groups/user_permissions m2m fields
+        users = User.objects.prefetch_related('groups', 'user_permissions')
         if user.is_authenticated and getattr(user, 'role', 'customer') in ['staff', 'admin']:
-            return User.objects.all()
+            return users.all()
         if user.is_authenticated:
-            return User.objects.filter(id=user.id)
+            return users.filter(id=user.id)
         return User.objects.none()
 
     def update(self, request, *args, **kwargs):
@@ -31,14 +64,18 @@ class UserViewSet(viewsets.ModelViewSet):
         return super().update(request, *args, **kwargs)
 
     def get_permissions(self):
-        if self.action in ['create', 'me', 'notifications', 'mark_notification_read']:
+        if self.action in ['create', 'me', 'notifications', 'mark_notification_read', 'unread_notification_count', 'mark_notifications_read']:
             return [IsAuthenticated()]
         # For other actions, apply staff/admin permissions
         return [IsStaffOrAdmin()]
 
     @action(detail=False, methods=['get'], url_path='me', permission_classes=[IsAuthenticated])
     def me(self, request):
-        serializer = self.get_serializer(request.user)
+        user = request.user
+        if getattr(user, 'from_token_claims', False):
+            # stateless claim kullanicisi eksik alanlar tasir; profili veritabanindan okuma
+            user = User.objects.get(pk=user.pk)
+        serializer = self.get_serializer(user)
         return Response(serializer.data)
 
     @action(detail=False, methods=['get'], url_path='search', permission_classes=[IsStaffOrAdmin])
@@ -47,22 +84,41 @@ class UserViewSet(viewsets.ModelViewSet):
         if not username:
             return Response({'detail': 'Username parameter is required'}, status=status.HTTP_400_BAD_REQUEST)
 
-        users = User.objects.filter(username__icontains=username)[:10]
+        # exact match first so callers can take users[0]
+        users = search_users(username)
+        prefetch_related_objects(users, 'groups', 'user_permissions')
         serializer = self.get_serializer(users, many=True)
         return Response(serializer.data)
 
-    @action(detail=False, methods=['get'], permission_classes=[IsStaffOrAdmin])
-    def audit_logs(self, request):
-        """Get audit logs with filtering and pagination"""
-        logs = AuditLog.objects.select_related('user').all()
-        
+    @action(detail=False, methods=['get'], url_path='typeahead', permission_classes=[IsStaffOrAdmin])
+    def typeahead(self, request):
+        """Username suggestions for ?q=, only id and username"""
+        results = [{'id': user_id, 'username': username} for user_id, username in search_usernames(request.query_params.get('q', ''))]
+        response = Response(results)
+        # identical keystroke sequences within a few seconds are served from the browser cache
+        response['Cache-Control'] = 'private, max-age=5'
+        return response
+
+    @action(detail=False, methods=['get'], url_path='active', permission_classes=[IsStaffOrAdmin])
+    def active(self, request):
+        """Users seen in the last ?minutes= minutes (default 15)"""
+        try:
+            minutes = int(request.query_params.get('minutes', 15))
+        except ValueError:
+            return Response({'detail': 'minutes must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+        users = active_users(minutes).values('id', 'username', 'role', 'last_activity')
+        return Response({'minutes': minutes, 'count': len(users), 'results': list(users)})
+
+    def _filtered_audit_logs(self, params):
+        logs = AuditLog.objects.all()
+
         # Apply filters
-        user_filter = request.query_params.get('user', '')
-        action_filter = request.query_params.get('action', '')
-        resource_filter = request.query_params.get('resource_type', '')
-        date_from = request.query_params.get('date_from', '')
-        date_to = request.query_params.get('date_to', '')
-        
+        user_filter = params.get('user', '')
+        action_filter = params.get('action', '')
+        resource_filter = params.get('resource_type', '')
+        date_from = params.get('date_from', '')
+        date_to = params.get('date_to', '')
+
         if user_filter:
             logs = logs.filter(user__username__icontains=user_filter)
         if action_filter:
@@ -75,18 +131,92 @@ class UserViewSet(viewsets.ModelViewSet):
             # Ensure date_to includes the entire day
             date_to_end_of_day = datetime.strptime(date_to, '%Y-%m-%d') + timedelta(days=1, microseconds=-1)
             logs = logs.filter(timestamp__lte=date_to_end_of_day)
-        
+        return logs
+
+    def _archived_audit_logs(self, params):
+        """Archived rows matching the same filters, or None unless ?archived=1"""
+        if params.get('archived', '').lower() not in ('1', 'true', 'yes'):
+            return None
+        date_from = params.get('date_from', '')
+        date_to = params.get('date_to', '')
+        range_from = timezone.make_aware(datetime.strptime(date_from, '%Y-%m-%d')) if date_from else None
+        range_to = timezone.make_aware(datetime.strptime(date_to, '%Y-%m-%d') + timedelta(days=1, microseconds=-1)) if date_to else None
+        return query_archive(
+            range_from, range_to,
+            user=params.get('user', ''), action=params.get('action', ''), resource_type=params.get('resource_type', ''),
+        )
+
+    @action(detail=False, methods=['get'], permission_classes=[IsStaffOrAdmin])
+    def audit_logs(self, request):
+        """Get audit logs with filtering and pagination"""
+        try:
+            logs = self._filtered_audit_logs(request.query_params).select_related('user', 'agent')
+            archived = self._archived_audit_logs(request.query_params)
+        except ValueError:
+            return Response({'detail': 'date_from/date_to must be YYYY-MM-DD'}, status=status.HTTP_400_BAD_REQUEST)
+
+        if archived is None:
+            # Append-only table: row count and newest timestamp identify the result set
+            etag = queryset_etag(request, logs, 'timestamp')
+            if etag_matches(request, etag):
+                return not_modified(etag)
+            response = Response(AuditLogSerializer(logs, many=True).data)
+            response['ETag'] = etag
+            return response
+
         serializer = AuditLogSerializer(logs, many=True)
-        return Response(serializer.data)
+
+        # ?archived=1: also read rows moved out by archive_audit_logs
+        rows = list(serializer.data) + list(archived)
+        rows.sort(key=lambda row: parse_datetime(row['timestamp']), reverse=True)
+        return Response(rows)
+
+    @action(detail=False, methods=['get'], url_path='audit_logs/export', permission_classes=[IsStaffOrAdmin])
+    def export_audit_logs(self, request):
+        """Stream audit logs as ?output=csv|ndjson, gzip-compressed with ?gzip=1"""
+        output = request.query_params.get('output', 'csv')
+        if output not in EXPORT_FORMATS:
+            return Response({'detail': f'output must be one of {", ".join(EXPORT_FORMATS)}'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            logs = self._filtered_audit_logs(request.query_params)
+            archived = self._archived_audit_logs(request.query_params)
+        except ValueError:
+            return Response({'detail': 'date_from/date_to must be YYYY-MM-DD'}, status=status.HTTP_400_BAD_REQUEST)
+        return export_response(
+            logs,
+            output=output,
+            compress=request.query_params.get('gzip', '').lower() in ('1', 'true', 'yes'),
+            archived=archived or (),
+        )
 
     @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated])
     def notifications(self, request):
-        """Get user's notifications"""
-        user = request.user
-        notifications = Notification.objects.filter(recipient=user).order_by('-created_at')
-        
+        """Get user's notifications, newest first, ?before=<id>&limit=&unread=1"""
+        try:
+            before = int(request.query_params.get('before') or 0) or None
+            limit = int(request.query_params.get('limit', PAGE_SIZE))
+        except ValueError:
+            return Response({'detail': 'before and limit must be integers'}, status=status.HTTP_400_BAD_REQUEST)
+        unread_only = request.query_params.get('unread', '').lower() in ('1', 'true', 'yes')
+        notifications, next_before = notification_page(request.user, before=before, limit=limit, unread_only=unread_only)
+
         serializer = NotificationSerializer(notifications, many=True)
-        return Response(serializer.data)
+        return Response({'results': serializer.data, 'next_before': next_before})
+
+    @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated])
+    def unread_notification_count(self, request):
+        """Unread badge count"""
+        return Response({'unread': unread_count(request.user)})
+
+    @action(detail=False, methods=['post'], permission_classes=[IsAuthenticated])
+    def mark_notifications_read(self, request):
+        """Mark the given ids, or all unread notifications, read"""
+        ids = request.data.get('ids')
+        if ids is None and not request.data.get('all'):
+            return Response({'detail': 'Provide ids or all=true'}, status=status.HTTP_400_BAD_REQUEST)
+        if ids is not None and (not isinstance(ids, list) or not all(isinstance(i, int) for i in ids)):
+            return Response({'ids': 'Must be a list of integers'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'updated': mark_read(request.user, ids)})
 
     @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated])
     def mark_notification_read(self, request, pk=None):
@@ -111,7 +241,7 @@ class UserViewSet(viewsets.ModelViewSet):
         )
 
     def perform_update(self, serializer):
-        old_instance = self.get_object()
+        old_role = serializer.instance.role
         user = serializer.save()
         # Log user modification
         log_user_action(
@@ -121,7 +251,7 @@ class UserViewSet(viewsets.ModelViewSet):
             resource_id=user.id,
             details={
                 'modified_username': user.username,
-                'old_role': old_instance.role,
+                'old_role': old_role,
                 'new_role': user.role
             },
             request=self.request
@@ -150,9 +280,8 @@ class UserViewSet(viewsets.ModelViewSet):
             details={'status': 'success'},
             request=request
         )
-        # Invalidate tokens if using a blacklist (Simple JWT handles this automatically on token refresh/verify if blacklist is enabled)
-        # For explicit invalidation, you might need to import Token model from simple_jwt.token_blacklist.models
-        # Or, if not using a blacklist, simply rely on client-side token removal.
+        # Bump the token version: every access/refresh token issued so far stops authenticating
+        revoke_user_tokens(request.user)
         return Response({'detail': 'Successfully logged out.'}, status=status.HTTP_200_OK)
 
     @action(detail=False, methods=['post'], permission_classes=[IsAuthenticated])
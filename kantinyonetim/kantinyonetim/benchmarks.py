@@ -0,0 +1,249 @@
+"""
+In-process API benchmarks for the order, stock and menu hot paths.
+
+Each scenario drives real requests through the full middleware/DRF stack with
+APIClient and records wall-clock latency and the number of SQL queries per
+request. Run through `manage.py run_benchmarks`, which builds a throwaway
+database filled by generate_synthetic_data.
+"""
+import math
+import statistics
+import threading
+import time
+from collections import Counter
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from apps.menu.models import MenuItem
+from apps.stock.models import Stock
+from apps.users.models import User
+
+SYNTHETIC_PASSWORD = 'synthetic'
+
+
+def percentile(sorted_values, pct):
+    """
+    Linear-interpolated percentile of an already sorted list
+    """
+    if not sorted_values:
+        return 0.0
+    rank = (len(sorted_values) - 1) * pct / 100
+    low = math.floor(rank)
+    high = math.ceil(rank)
+    return sorted_values[low] + (sorted_values[high] - sorted_values[low]) * (rank - low)
+
+
+class Samples:
+    def __init__(self):
+        self.latencies = []
+        self.queries = []
+        self.statuses = Counter()
+        self._lock = threading.Lock()
+
+    def add(self, seconds, queries, status_code):
+        with self._lock:
+            self.latencies.append(seconds)
+            self.queries.append(queries)
+            self.statuses[status_code] += 1
+
+    def summary(self, wall_seconds, ok_statuses):
+        latencies = sorted(self.latencies)
+        ms = [value * 1000 for value in latencies]
+        errors = sum(count for code, count in self.statuses.items() if code not in ok_statuses)
+        return {
+            'requests': len(latencies),
+            'errors': errors,
+            'status_codes': {str(code): count for code, count in sorted(self.statuses.items())},
+            'mean_ms': round(statistics.fmean(ms), 3) if ms else 0.0,
+            'p50_ms': round(percentile(ms, 50), 3),
+            'p90_ms': round(percentile(ms, 90), 3),
+            'p99_ms': round(percentile(ms, 99), 3),
+            'max_ms': round(ms[-1], 3) if ms else 0.0,
+            'throughput_rps': round(len(latencies) / wall_seconds, 2) if wall_seconds else 0.0,
+            'queries_mean': round(statistics.fmean(self.queries), 2) if self.queries else 0.0,
+            'queries_max': max(self.queries) if self.queries else 0,
+        }
+
+
+def timed_request(samples, send):
+    with CaptureQueriesContext(connection) as ctx:
+        started = time.perf_counter()
+        response = send()
+        # streaming/lazy bodies are consumed so their cost is included
+        if getattr(response, 'streaming', False):
+            for _ in response.streaming_content:
+                pass
+        elapsed = time.perf_counter() - started
+    samples.add(elapsed, len(ctx.captured_queries), response.status_code)
+    return response
+
+
+def authenticated_client(user):
+    client = APIClient()
+    response = client.post('/api/token/', {'username': user.username, 'password': SYNTHETIC_PASSWORD})
+    if response.status_code != 200:
+        raise RuntimeError(f'Could not log in {user.username}: {response.status_code} {response.data}')
+    client.credentials(HTTP_AUTHORIZATION=f"Bearer {response.data['access']}")
+    return client
+
+
+class Scenario:
+    name = None
+    ok_statuses = (200,)
+
+    def __init__(self, iterations, warmup):
+        self.iterations = iterations
+        self.warmup = warmup
+
+    def setup(self):
+        pass
+
+    def request(self, samples):
+        raise NotImplementedError
+
+    def run(self):
+        self.setup()
+        for _ in range(self.warmup):
+            self.request(Samples())
+        samples = Samples()
+        started = time.perf_counter()
+        for _ in range(self.iterations):
+            self.request(samples)
+        return samples.summary(time.perf_counter() - started, self.ok_statuses)
+
+
+class GetScenario(Scenario):
+    path = None
+    role = 'staff'
+
+    def setup(self):
+        self.client = authenticated_client(User.objects.filter(role=self.role, is_active=True).order_by('id').first())
+
+    def request(self, samples):
+        timed_request(samples, lambda: self.client.get(self.path))
+
+
+class TokenLogin(Scenario):
+    name = 'token_login'
+
+    def setup(self):
+        self.client = APIClient()
+        self.username = User.objects.filter(role='customer').order_by('id').values_list('username', flat=True).first()
+
+    def request(self, samples):
+        timed_request(samples, lambda: self.client.post('/api/token/', {'username': self.username, 'password': SYNTHETIC_PASSWORD}))
+
+
+class MenuItems(GetScenario):
+    name = 'menu_items_list'
+    path = '/api/menu-items/'
+
+
+class StaffOrders(GetScenario):
+    name = 'orders_list_staff'
+    path = '/api/orders/'
+
+
+class AuditLogs(GetScenario):
+    name = 'audit_logs'
+    path = '/api/audit-logs/'
+    role = 'admin'
+
+
+class Notifications(GetScenario):
+    name = 'notifications_list'
+    path = '/api/notifications/'
+
+
+class CreateFromCart(Scenario):
+    ok_statuses = (201,)
+
+    def __init__(self, iterations, warmup, lines):
+        super().__init__(iterations, warmup)
+        self.lines = lines
+        self.name = f'create_from_cart_{lines}_lines'
+
+    def setup(self):
+        menu_ids = list(MenuItem.objects.order_by('id').values_list('id', flat=True)[:self.lines])
+        if len(menu_ids) < self.lines:
+            raise RuntimeError(f'{self.name} needs {self.lines} menu items, found {len(menu_ids)}')
+        Stock.objects.filter(menu_item_id__in=menu_ids).update(quantity=10 ** 6)
+        self.cart = {'items': [{'menu_item': menu_id, 'qty': 1} for menu_id in menu_ids]}
+        self.client = authenticated_client(User.objects.filter(role='customer').order_by('id').first())
+
+    def request(self, samples):
+        timed_request(samples, lambda: self.client.post('/api/orders/create-from-cart/', self.cart, format='json'))
+
+
+class ContendedCreateFromCart(Scenario):
+    """
+    `threads` customers placing the same small cart at once, so every request
+    competes for the same stock rows
+    """
+    ok_statuses = (201,)
+
+    def __init__(self, iterations, warmup, threads, lines=3):
+        super().__init__(iterations, warmup)
+        self.threads = threads
+        self.lines = lines
+        self.name = f'create_from_cart_contended_{threads}_threads'
+
+    def setup(self):
+        menu_ids = list(MenuItem.objects.order_by('id').values_list('id', flat=True)[:self.lines])
+        Stock.objects.filter(menu_item_id__in=menu_ids).update(quantity=10 ** 6)
+        self.cart = {'items': [{'menu_item': menu_id, 'qty': 1} for menu_id in menu_ids]}
+        customers = list(User.objects.filter(role='customer').order_by('id')[:self.threads])
+        self.clients = [authenticated_client(user) for user in customers]
+        connection.close()
+
+    def run(self):
+        self.setup()
+        samples = Samples()
+        barrier = threading.Barrier(len(self.clients) + 1)
+
+        def worker(client):
+            try:
+                barrier.wait()
+                for _ in range(self.iterations):
+                    timed_request(samples, lambda: client.post('/api/orders/create-from-cart/', self.cart, format='json'))
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker, args=(client,)) for client in self.clients]
+        for thread in threads:
+            thread.start()
+        barrier.wait()
+        started = time.perf_counter()
+        for thread in threads:
+            thread.join()
+        return samples.summary(time.perf_counter() - started, self.ok_statuses)
+
+
+def build_scenarios(iterations, warmup, cart_sizes=(1, 5, 20, 50), threads=8):
+    scenarios = [
+        TokenLogin(iterations, warmup),
+        MenuItems(iterations, warmup),
+        StaffOrders(iterations, warmup),
+        AuditLogs(iterations, warmup),
+        Notifications(iterations, warmup),
+    ]
+    scenarios += [CreateFromCart(iterations, warmup, lines) for lines in cart_sizes]
+    scenarios.append(ContendedCreateFromCart(max(1, iterations // 2), 0, threads))
+    return scenarios
+
+
+def compare(baseline, current, keys=('p50_ms', 'p90_ms', 'queries_mean')):
+    """
+    Rows of (scenario, key, before, after, change %) for scenarios present in both runs
+    """
+    rows = []
+    for name, result in current.get('scenarios', {}).items():
+        before = baseline.get('scenarios', {}).get(name)
+        if not before:
+            continue
+        for key in keys:
+            old = before.get(key, 0)
+            new = result.get(key, 0)
+            change = ((new - old) / old * 100) if old else 0.0
+            rows.append((name, key, old, new, round(change, 1)))
+    return rows
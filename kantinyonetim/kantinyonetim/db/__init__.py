@@ -0,0 +1,3 @@
+from .transactions import write_transaction, retry_on_locked
+
+__all__ = ['write_transaction', 'retry_on_locked']
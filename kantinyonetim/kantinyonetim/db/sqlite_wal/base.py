@@ -0,0 +1,30 @@
+"""
+SQLite backend tuned for a single-node deployment with concurrent requests.
+
+Every new connection is switched to WAL (readers no longer block the writer),
+gets an explicit busy_timeout and synchronous=NORMAL. Transactions opened with
+kantinyonetim.db.write_transaction start with BEGIN IMMEDIATE so the write lock
+is taken up front instead of failing on lock upgrade halfway through.
+"""
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.begin_immediate = False
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        busy_timeout_ms = int(float(conn_params.get('timeout', 5)) * 1000)
+        conn.execute(f'PRAGMA busy_timeout = {busy_timeout_ms}')
+        if not self.is_in_memory_db():
+            conn.execute('PRAGMA journal_mode = WAL')
+        conn.execute('PRAGMA synchronous = NORMAL')
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        if self.begin_immediate and self.transaction_mode is None:
+            self.cursor().execute('BEGIN IMMEDIATE')
+        else:
+            super()._start_transaction_under_autocommit()
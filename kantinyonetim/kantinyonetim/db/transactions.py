@@ -0,0 +1,69 @@
+import functools
+import random
+import time
+from contextlib import ContextDecorator
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connections, transaction
+
+LOCKED_ERRORS = ('database is locked', 'database table is locked')
+# attempts retry_on_locked makes by default; apps/sync sizes its change-token overlap from it
+RETRY_ATTEMPTS = 5
+
+
+class write_transaction(ContextDecorator):
+    """
+    transaction.atomic() for code paths that will write.
+
+    On the sqlite_wal backend the outermost block starts with BEGIN IMMEDIATE,
+    taking the write lock before any reads so the transaction cannot fail later
+    on a lock upgrade. On other backends it is a plain atomic block.
+    """
+
+    def __init__(self, using=None):
+        self.using = using or DEFAULT_DB_ALIAS
+
+    def _recreate_cm(self):
+        # decorator kullaniminda her cagri kendi atomic blogunu tutuyor (thread-safe)
+        return type(self)(self.using)
+
+    def __enter__(self):
+        connection = connections[self.using]
+        immediate = not connection.in_atomic_block and hasattr(connection, 'begin_immediate')
+        self._atomic = transaction.atomic(using=self.using)
+        if immediate:
+            connection.begin_immediate = True
+        try:
+            self._atomic.__enter__()
+        finally:
+            if immediate:
+                connection.begin_immediate = False
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return self._atomic.__exit__(exc_type, exc_value, traceback)
+
+
+def is_locked_error(exc):
+    return isinstance(exc, OperationalError) and any(msg in str(exc) for msg in LOCKED_ERRORS)
+
+
+def retry_on_locked(attempts=RETRY_ATTEMPTS, base_delay=0.05, max_delay=1.0, using=None):
+    """
+    Retry the wrapped transaction when SQLite reports the database as locked,
+    sleeping with full-jitter exponential backoff between attempts.
+
+    Only retries when called outside an atomic block; inside one the outer
+    transaction is already broken and the error must propagate.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            connection = connections[using or DEFAULT_DB_ALIAS]
+            for attempt in range(attempts):
+                try:
+                    return func(*args, **kwargs)
+                except OperationalError as exc:
+                    if not is_locked_error(exc) or connection.in_atomic_block or attempt == attempts - 1:
+                        raise
+                    time.sleep(random.uniform(0, min(max_delay, base_delay * 2 ** attempt)))
+        return wrapper
+    return decorator
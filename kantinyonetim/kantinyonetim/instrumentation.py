@@ -0,0 +1,258 @@
+"""
+Per-request timing and query instrumentation.
+
+InstrumentationMiddleware wraps every database call of a request with an
+execute_wrapper, so the request knows its wall time, DB time, query count and
+repeated query shapes (N+1 signatures). InstrumentedViewMixin adds serializer
+time for DRF views. Results go to a Server-Timing header and to per-route
+histograms in `metrics`, rendered in Prometheus text format by
+apps.analytics.views.metrics.
+"""
+import bisect
+import logging
+import threading
+import time
+from collections import Counter, OrderedDict, deque
+from contextlib import ExitStack
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+# histogram bucket upper bounds, seconds
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+RECENT_SAMPLES = 1024
+
+
+class RequestMetrics:
+    __slots__ = ('started', 'db_time', 'query_count', 'shapes', 'serializer_time')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.db_time = 0.0
+        self.query_count = 0
+        self.shapes = Counter()
+        self.serializer_time = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        # connection.execute_wrapper hook
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - started
+            self.query_count += 1
+            # sql is the parameterized template, so equal text means equal shape
+            self.shapes[sql] += 1
+
+    def repeated_queries(self, threshold):
+        return [(sql, count) for sql, count in self.shapes.items() if count >= threshold]
+
+
+class Histogram:
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.total = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.total += value
+
+    def cumulative(self):
+        running = 0
+        for bound, count in zip(self.bounds + (float('inf'),), self.counts):
+            running += count
+            yield bound, running
+
+
+class RouteStats:
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.n_plus_one = 0
+        self.db_seconds = 0.0
+        self.serializer_seconds = 0.0
+        self.duration = Histogram(DURATION_BUCKETS)
+        self.queries = Histogram(QUERY_BUCKETS)
+        self.recent = deque(maxlen=RECENT_SAMPLES)
+
+
+class MetricsRegistry:
+    """
+    Per (method, route) counters and histograms; at most max_routes routes are kept
+    """
+
+    def __init__(self, max_routes=500):
+        self.max_routes = max_routes
+        self._routes = OrderedDict()
+        self._lock = threading.Lock()
+
+    def record(self, method, route, status_code, metrics, duration, n_plus_one):
+        key = (method, route)
+        with self._lock:
+            stats = self._routes.get(key)
+            if stats is None:
+                if len(self._routes) >= self.max_routes:
+                    self._routes.popitem(last=False)
+                stats = self._routes[key] = RouteStats()
+            stats.requests += 1
+            stats.errors += status_code >= 500
+            stats.n_plus_one += bool(n_plus_one)
+            stats.db_seconds += metrics.db_time
+            stats.serializer_seconds += metrics.serializer_time
+            stats.duration.observe(duration)
+            stats.queries.observe(metrics.query_count)
+            stats.recent.append(duration)
+
+    def snapshot(self):
+        with self._lock:
+            return [
+                (method, route, stats.requests, stats.errors, stats.n_plus_one, stats.db_seconds,
+                 stats.serializer_seconds, list(stats.duration.cumulative()), stats.duration.total,
+                 list(stats.queries.cumulative()), stats.queries.total, sorted(stats.recent))
+                for (method, route), stats in self._routes.items()
+            ]
+
+    def clear(self):
+        with self._lock:
+            self._routes.clear()
+
+    def render_prometheus(self):
+        lines = []
+
+        def metric(name, kind, help_text):
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+
+        def labels(method, route, **extra):
+            pairs = {'method': method, 'route': route, **extra}
+            return ','.join(f'{key}="{_escape(value)}"' for key, value in pairs.items())
+
+        rows = self.snapshot()
+        metric('kantin_http_requests_total', 'counter', 'Requests handled per route.')
+        for method, route, requests, *_ in rows:
+            lines.append(f'kantin_http_requests_total{{{labels(method, route)}}} {requests}')
+        metric('kantin_http_server_errors_total', 'counter', 'Responses with status >= 500.')
+        for method, route, _, errors, *_ in rows:
+            lines.append(f'kantin_http_server_errors_total{{{labels(method, route)}}} {errors}')
+        metric('kantin_http_n_plus_one_total', 'counter', 'Requests that repeated one query shape past the threshold.')
+        for method, route, _, _, n_plus_one, *_ in rows:
+            lines.append(f'kantin_http_n_plus_one_total{{{labels(method, route)}}} {n_plus_one}')
+        metric('kantin_db_seconds_total', 'counter', 'Time spent in database calls.')
+        for method, route, _, _, _, db_seconds, *_ in rows:
+            lines.append(f'kantin_db_seconds_total{{{labels(method, route)}}} {db_seconds:.6f}')
+        metric('kantin_serializer_seconds_total', 'counter', 'Time spent in DRF serializers.')
+        for method, route, _, _, _, _, serializer_seconds, *_ in rows:
+            lines.append(f'kantin_serializer_seconds_total{{{labels(method, route)}}} {serializer_seconds:.6f}')
+
+        metric('kantin_http_request_duration_seconds', 'histogram', 'Request wall time.')
+        for method, route, requests, _, _, _, _, buckets, total, *_ in rows:
+            for bound, count in buckets:
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                lines.append(f'kantin_http_request_duration_seconds_bucket{{{labels(method, route, le=le)}}} {count}')
+            lines.append(f'kantin_http_request_duration_seconds_sum{{{labels(method, route)}}} {total:.6f}')
+            lines.append(f'kantin_http_request_duration_seconds_count{{{labels(method, route)}}} {requests}')
+
+        metric('kantin_db_queries_per_request', 'histogram', 'SQL queries issued per request.')
+        for method, route, requests, _, _, _, _, _, _, buckets, total, _ in rows:
+            for bound, count in buckets:
+                le = '+Inf' if bound == float('inf') else str(bound)
+                lines.append(f'kantin_db_queries_per_request_bucket{{{labels(method, route, le=le)}}} {count}')
+            lines.append(f'kantin_db_queries_per_request_sum{{{labels(method, route)}}} {int(total)}')
+            lines.append(f'kantin_db_queries_per_request_count{{{labels(method, route)}}} {requests}')
+
+        metric('kantin_http_request_duration_recent_seconds', 'summary', f'Request wall time over the last {RECENT_SAMPLES} requests.')
+        for method, route, *_, recent in rows:
+            for quantile in (0.5, 0.9, 0.99):
+                value = recent[min(len(recent) - 1, int(quantile * len(recent)))] if recent else 0.0
+                lines.append(f'kantin_http_request_duration_recent_seconds{{{labels(method, route, quantile=quantile)}}} {value:.6f}')
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+metrics = MetricsRegistry(max_routes=getattr(settings, 'INSTRUMENTATION_MAX_ROUTES', 500))
+
+
+def route_for(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unmatched'
+    if not match.route:
+        return match.view_name or 'unknown'
+    # router urls are regex fragments joined together
+    return match.route.replace('^', '').replace('$', '')
+
+
+class InstrumentationMiddleware:
+    """
+    Measures each request; adds a Server-Timing header and feeds `metrics`
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = getattr(settings, 'INSTRUMENTATION_ENABLED', True)
+        self.server_timing = getattr(settings, 'INSTRUMENTATION_SERVER_TIMING', True)
+        self.n_plus_one_threshold = getattr(settings, 'INSTRUMENTATION_N_PLUS_ONE_THRESHOLD', 5)
+
+    def __call__(self, request):
+        if not self.enabled:
+            return self.get_response(request)
+
+        request_metrics = RequestMetrics()
+        request.metrics = request_metrics
+        with ExitStack() as stack:
+            for connection in connections.all(initialized_only=True) or [connections['default']]:
+                stack.enter_context(connection.execute_wrapper(request_metrics))
+            response = self.get_response(request)
+        duration = time.perf_counter() - request_metrics.started
+
+        route = route_for(request)
+        repeated = request_metrics.repeated_queries(self.n_plus_one_threshold)
+        if repeated:
+            sql, count = max(repeated, key=lambda item: item[1])
+            logger.warning('Possible N+1 on %s %s: %d x %s', request.method, route, count, sql[:200])
+        metrics.record(request.method, route, response.status_code, request_metrics, duration, repeated)
+
+        if self.server_timing:
+            parts = [
+                f'app;dur={duration * 1000:.1f}',
+                f'db;dur={request_metrics.db_time * 1000:.1f};desc="{request_metrics.query_count} queries"',
+            ]
+            if request_metrics.serializer_time:
+                parts.append(f'ser;dur={request_metrics.serializer_time * 1000:.1f}')
+            response['Server-Timing'] = ', '.join(parts)
+        return response
+
+
+def time_serializer(serializer, request):
+    """
+    Make serializer.data add its to_representation time to the request's metrics
+    """
+    request_metrics = getattr(request, 'metrics', None)
+    if request_metrics is None:
+        return serializer
+    to_representation = serializer.to_representation
+
+    def timed(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return to_representation(*args, **kwargs)
+        finally:
+            request_metrics.serializer_time += time.perf_counter() - started
+
+    serializer.to_representation = timed
+    return serializer
+
+
+class InstrumentedViewMixin:
+    """
+    DRF view mixin: serializers from get_serializer() report their time to the middleware
+    """
+
+    def get_serializer(self, *args, **kwargs):
+        return time_serializer(super().get_serializer(*args, **kwargs), self.request)
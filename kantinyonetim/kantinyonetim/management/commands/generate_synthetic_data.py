@@ -0,0 +1,275 @@
+import random
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from decimal import Decimal
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from apps.menu.models import MenuItem
+from apps.orders.models import Order, OrderItem
+from apps.stock.models import Stock
+from apps.users.models import AuditLog, Notification, User, UserAgent
+from apps.users.user_agents import agent_digest
+
+# saat -> siparis agirligi: kahvalti, ogle ve ikindi tepe noktalari
+HOURLY_WEIGHTS = {
+    7: 2, 8: 6, 9: 5, 10: 3, 11: 6, 12: 14, 13: 12, 14: 5,
+    15: 5, 16: 4, 17: 3, 18: 2, 19: 1,
+}
+WEEKEND_FACTOR = 0.35
+
+MENU_CATEGORIES = {
+    'ana_yemek': (Decimal('60'), Decimal('180')),
+    'icecek': (Decimal('10'), Decimal('60')),
+    'tatli': (Decimal('30'), Decimal('90')),
+    'aperatif': (Decimal('20'), Decimal('80')),
+}
+
+USER_AGENTS = [
+    'KantinKiosk/2.1 (Linux; Android 11)',
+    'KantinKiosk/2.0 (Linux; Android 9)',
+    'Mozilla/5.0 (Linux; Android 13; SM-A536B) AppleWebKit/537.36 Chrome/120.0 Mobile Safari/537.36',
+    'Mozilla/5.0 (iPhone; CPU iPhone OS 17_2 like Mac OS X) AppleWebKit/605.1.15 Mobile/15E148',
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 Chrome/120.0 Safari/537.36',
+    'Dart/3.2 (dart:io)',
+]
+
+
+@contextmanager
+def explicit_timestamps(*fields):
+    """
+    Let bulk_create keep the created_at/updated_at values we generate instead of
+    auto_now/auto_now_add overwriting them with the current time
+    """
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field, _, _ in saved:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now = auto_now
+            field.auto_now_add = auto_now_add
+
+
+class Command(BaseCommand):
+    help = 'Generates a deterministic synthetic dataset (users, menu, stock, orders, audit logs, notifications) for load testing.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--customers', type=int, default=2000)
+        parser.add_argument('--staff', type=int, default=40)
+        parser.add_argument('--admins', type=int, default=3)
+        parser.add_argument('--menu-items', type=int, default=60)
+        parser.add_argument('--orders', type=int, default=100000)
+        parser.add_argument('--days', type=int, default=90, help='Spread orders over this many days before --end.')
+        parser.add_argument('--end', help='Last day of generated history, YYYY-MM-DD (default: today).')
+        parser.add_argument('--max-items', type=int, default=4, help='Maximum order lines per order.')
+        parser.add_argument(
+            '--staff-notifications', type=int,
+            help='New-order notifications per order (default: every staff and admin user, as notify_staff_new_order does).',
+        )
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--prefix', default='syn', help='Prefix for generated usernames and menu items.')
+        parser.add_argument('--reset', action='store_true', help='Delete data generated earlier with the same prefix first.')
+        parser.add_argument('--rollups', action='store_true', help='Rebuild the sales rollup tables afterwards.')
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.prefix = options['prefix']
+        self.batch_size = max(1, options['batch_size'])
+        if options['end']:
+            try:
+                end_day = datetime.strptime(options['end'], '%Y-%m-%d').date()
+            except ValueError:
+                raise CommandError('--end must be YYYY-MM-DD.')
+        else:
+            end_day = timezone.localdate()
+
+        if User.objects.filter(username__startswith=f'{self.prefix}_').exists():
+            if not options['reset']:
+                raise CommandError(f'"{self.prefix}_" önekli veriler zaten var; --reset veya başka bir --prefix kullanın.')
+            self._reset()
+
+        started = time.monotonic()
+        customers, staff = self._create_users(options['customers'], options['staff'], options['admins'])
+        menu = self._create_menu(options['menu_items'])
+        agent_ids = self._create_user_agents()
+        counts = self._create_orders(
+            options['orders'], customers, staff, menu, agent_ids,
+            end_day, options['days'], options['max_items'], options['staff_notifications'],
+        )
+
+        if options['rollups']:
+            from apps.analytics.rollups import rebuild_rollups
+            rebuild_rollups()
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(customers) + len(staff) + options['admins']} kullanıcı, {len(menu)} ürün, "
+            f"{counts['orders']} sipariş, {counts['items']} sipariş ögesi, {counts['audit']} denetim kaydı, "
+            f"{counts['notifications']} bildirim {elapsed:.1f} sn içinde oluşturuldu."
+        ))
+
+    def _reset(self):
+        self.stdout.write(self.style.WARNING(f'"{self.prefix}_" önekli veriler siliniyor...'))
+        with transaction.atomic():
+            users = User.objects.filter(username__startswith=f'{self.prefix}_')
+            AuditLog.objects.filter(user__in=users).delete()
+            Notification.objects.filter(recipient__in=users).delete()
+            Order.objects.filter(user__in=users).delete()
+            users.delete()
+            MenuItem.objects.filter(name__startswith=f'{self.prefix} ').delete()
+
+    def _create_users(self, customer_count, staff_count, admin_count):
+        # tek bir hash; her kullanici icin PBKDF2 calistirmak dakikalar surer
+        password = make_password('synthetic')
+        joined = timezone.now() - timedelta(days=365)
+        users = []
+        for role, count in (('customer', customer_count), ('staff', staff_count), ('admin', admin_count)):
+            for i in range(count):
+                username = f'{self.prefix}_{role}_{i:06d}'
+                users.append(User(
+                    username=username, email=f'{username}@example.com', password=password,
+                    role=role, is_staff=role != 'customer', date_joined=joined,
+                ))
+        User.objects.bulk_create(users, batch_size=self.batch_size)
+        rows = User.objects.filter(username__startswith=f'{self.prefix}_').values_list('id', 'role', 'username')
+        customers = [user_id for user_id, role, _ in rows if role == 'customer']
+        staff = [user_id for user_id, role, _ in rows if role in ('staff', 'admin')]
+        # yeni siparis bildirimlerinin mesaji musteri adini iceriyor
+        self.usernames = {user_id: username for user_id, _, username in rows}
+        self.stdout.write(f'{len(users)} kullanıcı oluşturuldu.')
+        return customers, staff
+
+    def _create_menu(self, count):
+        categories = list(MENU_CATEGORIES)
+        items = []
+        for i in range(count):
+            category = categories[i % len(categories)]
+            low, high = MENU_CATEGORIES[category]
+            price = (low + (high - low) * Decimal(self.rng.random())).quantize(Decimal('1'))
+            items.append(MenuItem(
+                name=f'{self.prefix} {category} {i:03d}', description='Sentetik ürün',
+                price=price, category=category, is_available=True,
+            ))
+        items = MenuItem.objects.bulk_create(items)
+        Stock.objects.bulk_create([Stock(menu_item=item, quantity=self.rng.randint(50, 500)) for item in items])
+        # Zipf benzeri populerlik: az sayida urun siparislerin cogunu aliyor
+        weights = [1 / (rank + 1) for rank in range(len(items))]
+        self.rng.shuffle(weights)
+        self.stdout.write(f'{len(items)} menü ürünü ve stok kaydı oluşturuldu.')
+        return [(item.id, item.price, weight) for item, weight in zip(items, weights)]
+
+    def _create_user_agents(self):
+        ids = []
+        for value in USER_AGENTS:
+            agent, _ = UserAgent.objects.get_or_create(digest=agent_digest(value), defaults={'value': value})
+            ids.append(agent.id)
+        return ids
+
+    def _order_times(self, count, end_day, days):
+        # gun ve saat agirliklari ile siparis zamanlari, kronolojik sirada
+        day_list = [end_day - timedelta(days=offset) for offset in range(days)]
+        day_weights = [WEEKEND_FACTOR if day.weekday() >= 5 else 1.0 for day in day_list]
+        hours = list(HOURLY_WEIGHTS)
+        hour_weights = list(HOURLY_WEIGHTS.values())
+        chosen_days = self.rng.choices(day_list, day_weights, k=count)
+        chosen_hours = self.rng.choices(hours, hour_weights, k=count)
+        tz = timezone.get_current_timezone()
+        times = [
+            timezone.make_aware(datetime.combine(day, datetime.min.time()), tz)
+            + timedelta(hours=hour, seconds=self.rng.randrange(3600))
+            for day, hour in zip(chosen_days, chosen_hours)
+        ]
+        times.sort()
+        return times
+
+    def _status_for(self, created_at, now):
+        age = now - created_at
+        if age > timedelta(hours=6):
+            return 'cancelled' if self.rng.random() < 0.08 else 'completed'
+        return self.rng.choice(['pending', 'preparing', 'ready', 'completed'])
+
+    def _create_orders(self, count, customers, staff, menu, agent_ids, end_day, days, max_items, staff_notifications):
+        if not customers or not menu:
+            raise CommandError('Sipariş üretmek için en az bir müşteri ve bir menü ürünü gerekir.')
+        now = timezone.now()
+        menu_weights = [weight for _, _, weight in menu]
+        counts = {'orders': 0, 'items': 0, 'audit': 0, 'notifications': 0}
+        times = self._order_times(count, end_day, max(1, days))
+
+        timestamp_fields = [
+            Order._meta.get_field('created_at'), Order._meta.get_field('updated_at'),
+            OrderItem._meta.get_field('created_at'),
+            AuditLog._meta.get_field('timestamp'), Notification._meta.get_field('created_at'),
+        ]
+        with explicit_timestamps(*timestamp_fields):
+            for start in range(0, count, self.batch_size):
+                batch_times = times[start:start + self.batch_size]
+                with transaction.atomic():
+                    self._create_order_batch(batch_times, now, customers, staff, menu, menu_weights, agent_ids, max_items, staff_notifications, counts)
+                self.stdout.write(f"{counts['orders']}/{count} sipariş...")
+        return counts
+
+    def _create_order_batch(self, batch_times, now, customers, staff, menu, menu_weights, agent_ids, max_items, staff_notifications, counts):
+        rng = self.rng
+        orders = []
+        lines = []
+        for created_at in batch_times:
+            status = self._status_for(created_at, now)
+            picks = rng.choices(menu, menu_weights, k=rng.randint(1, max(1, max_items)))
+            order_lines = [(menu_id, rng.choice((1, 1, 1, 2, 2, 3)), price) for menu_id, price, _ in picks]
+            total = sum(quantity * price for _, quantity, price in order_lines)
+            finished = created_at + timedelta(minutes=rng.randint(3, 25)) if status in ('completed', 'cancelled') else created_at
+            orders.append(Order(
+                user_id=rng.choice(customers), status=status, total=total,
+                created_at=created_at, updated_at=finished,
+            ))
+            lines.append(order_lines)
+        orders = Order.objects.bulk_create(orders)
+
+        items = []
+        audit = []
+        notifications = []
+        for order, order_lines in zip(orders, lines):
+            for menu_id, quantity, price in order_lines:
+                items.append(OrderItem(
+                    order_id=order.id, menu_item_id=menu_id, quantity=quantity,
+                    price_at_order_time=price, line_total=quantity * price, created_at=order.created_at,
+                ))
+            ip_address = f'10.{rng.randrange(256)}.{rng.randrange(256)}.{rng.randrange(1, 255)}'
+            agent_id = rng.choice(agent_ids)
+            audit.append(AuditLog(
+                user_id=order.user_id, action='order_placed', resource_type='order', resource_id=order.id,
+                details={'order_id': order.id, 'items_count': len(order_lines), 'total_price': str(order.total)},
+                ip_address=ip_address, agent_id=agent_id, timestamp=order.created_at,
+            ))
+            if order.status in ('completed', 'cancelled') and staff:
+                audit.append(AuditLog(
+                    user_id=rng.choice(staff), action='order_status_changed', resource_type='order', resource_id=order.id,
+                    details={'order_id': order.id, 'old_status': 'pending', 'new_status': order.status},
+                    ip_address=ip_address, agent_id=agent_id, timestamp=order.updated_at,
+                ))
+            # uygulama (notify_staff_new_order) her siparisi tum staff ve adminlere bildiriyor
+            if staff_notifications is None:
+                recipients = staff
+            else:
+                recipients = rng.sample(staff, min(staff_notifications, len(staff)))
+            for recipient in recipients:
+                notifications.append(Notification(
+                    recipient_id=recipient, notification_type='order_new', title='New Order Received',
+                    message=f'Customer {self.usernames[order.user_id]} has placed a new order #{order.id}', priority='high',
+                    resource_type='order', resource_id=order.id,
+                    read=order.status in ('completed', 'cancelled'), created_at=order.created_at,
+                ))
+
+        OrderItem.objects.bulk_create(items, batch_size=self.batch_size)
+        AuditLog.objects.bulk_create(audit, batch_size=self.batch_size)
+        Notification.objects.bulk_create(notifications, batch_size=self.batch_size)
+        counts['orders'] += len(orders)
+        counts['items'] += len(items)
+        counts['audit'] += len(audit)
+        counts['notifications'] += len(notifications)
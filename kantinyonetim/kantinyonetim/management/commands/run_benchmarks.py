@@ -0,0 +1,104 @@
+import json
+import os
+import platform
+import shutil
+import subprocess
+import tempfile
+import django
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+from django.utils import timezone
+from kantinyonetim.benchmarks import build_scenarios, compare
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+            cwd=settings.BASE_DIR,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = 'Runs the API benchmark suite against a throwaway synthetic database and writes the results as JSON.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', default='bench_results.json')
+        parser.add_argument('--compare', help='Earlier results file to print deltas against.')
+        parser.add_argument('--iterations', type=int, default=30)
+        parser.add_argument('--warmup', type=int, default=3)
+        parser.add_argument('--threads', type=int, default=8, help='Concurrent clients in the contended cart scenario.')
+        parser.add_argument('--only', action='append', default=[], help='Run only scenarios whose name contains this text.')
+        parser.add_argument('--orders', type=int, default=5000, help='Synthetic order history size.')
+        parser.add_argument('--customers', type=int, default=500)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options['compare']:
+            try:
+                with open(options['compare'], encoding='utf-8') as fh:
+                    baseline = json.load(fh)
+            except (OSError, ValueError) as e:
+                raise CommandError(f'--compare dosyası okunamadı: {e}')
+
+        # mevcut veritabanina dokunmadan ayri bir test veritabani
+        tmpdir = tempfile.mkdtemp(prefix='kantin-bench-')
+        if connection.vendor == 'sqlite':
+            connection.settings_dict.setdefault('TEST', {})['NAME'] = os.path.join(tmpdir, 'bench.sqlite3')
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            self.stdout.write('Sentetik veri oluşturuluyor...')
+            with open(os.devnull, 'w') as devnull:
+                call_command(
+                    'generate_synthetic_data', orders=options['orders'], customers=options['customers'],
+                    seed=options['seed'], stdout=self.stdout if options['verbosity'] > 1 else devnull,
+                )
+            # hiz sinirlari olcumu bozmasin
+            with override_settings(RATE_LIMITS={}):
+                results = self.run_scenarios(options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+            shutil.rmtree(tmpdir, ignore_errors=True)
+
+        report = {
+            'meta': {
+                'revision': git_revision(),
+                'created_at': timezone.now().isoformat(),
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'database': connection.vendor,
+                'dataset': {'orders': options['orders'], 'customers': options['customers'], 'seed': options['seed']},
+                'iterations': options['iterations'],
+            },
+            'scenarios': results,
+        }
+        with open(options['output'], 'w', encoding='utf-8') as fh:
+            json.dump(report, fh, indent=2)
+        self.stdout.write(self.style.SUCCESS(f"Sonuçlar {options['output']} dosyasına yazıldı."))
+
+        if baseline:
+            self.stdout.write(f"\n{'senaryo':<40} {'ölçüt':<14} {'önce':>10} {'sonra':>10} {'değişim':>9}")
+            for name, key, old, new, change in compare(baseline, report):
+                style = self.style.ERROR if change > 10 else self.style.SUCCESS if change < -10 else str
+                self.stdout.write(style(f'{name:<40} {key:<14} {old:>10} {new:>10} {change:>+8.1f}%'))
+
+    def run_scenarios(self, options):
+        results = {}
+        for scenario in build_scenarios(options['iterations'], options['warmup'], threads=options['threads']):
+            if options['only'] and not any(text in scenario.name for text in options['only']):
+                continue
+            summary = scenario.run()
+            results[scenario.name] = summary
+            self.stdout.write(
+                f"{scenario.name:<40} p50 {summary['p50_ms']:>8.2f} ms  p99 {summary['p99_ms']:>8.2f} ms  "
+                f"{summary['throughput_rps']:>8.1f} req/s  {summary['queries_mean']:>6.1f} sorgu  {summary['errors']} hata"
+            )
+        return results
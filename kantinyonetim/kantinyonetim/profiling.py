@@ -0,0 +1,201 @@
+"""
+Opt-in sampling profiler for live requests.
+
+ProfilingMiddleware profiles a PROFILING_SAMPLE_RATE fraction of requests and,
+when PROFILING_SLOW_MS is set, keeps the profile of any request slower than
+that. One daemon thread samples the stacks of the threads currently serving a
+profiled request every PROFILING_INTERVAL_MS; a request only registers its
+thread id. With PROFILING_ENABLED off, or both settings at 0, the middleware
+is not loaded at all.
+
+Profiles are written to PROFILING_DIR as collapsed stacks ("frame;frame;frame
+count" per line, readable by flamegraph.pl and speedscope) with a JSON
+sidecar, and the directory is trimmed to PROFILING_MAX_FILES profiles. Staff
+list and download them through /api/profiles/.
+"""
+import json
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timezone as dt_timezone
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from .instrumentation import route_for
+
+logger = logging.getLogger(__name__)
+
+PROFILE_NAME = re.compile(r'^[0-9TZ]+-[a-z0-9_-]+-[0-9a-f]{8}$')
+
+
+def get_profile_dir():
+    return getattr(settings, 'PROFILING_DIR', os.path.join(settings.BASE_DIR, 'profiles'))
+
+
+class StackSampler:
+    """
+    Samples the stacks of registered threads from a single background thread
+    """
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self._active = {}
+        self._labels = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self, ident=None):
+        ident = ident or threading.get_ident()
+        with self._lock:
+            self._active[ident] = Counter()
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='request-profiler', daemon=True)
+                self._thread.start()
+
+    def stop(self, ident=None):
+        with self._lock:
+            return self._active.pop(ident or threading.get_ident(), Counter())
+
+    def _label(self, code):
+        label = self._labels.get(code)
+        if label is None:
+            filename = code.co_filename
+            for prefix in sorted({str(settings.BASE_DIR), *sys.path}, key=len, reverse=True):
+                if prefix and filename.startswith(prefix + os.sep):
+                    filename = filename[len(prefix) + 1:]
+                    break
+            label = f'{code.co_name} ({filename}:{code.co_firstlineno})'.replace(';', ':')
+            self._labels[code] = label
+        return label
+
+    def collapse(self, frame):
+        labels = []
+        while frame is not None:
+            labels.append(self._label(frame.f_code))
+            frame = frame.f_back
+        return ';'.join(reversed(labels))
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            with self._lock:
+                if not self._active:
+                    continue
+                # under the lock so stop() never hands out a counter still being written
+                frames = sys._current_frames()
+                for ident, stacks in self._active.items():
+                    frame = frames.get(ident)
+                    if frame is not None:
+                        stacks[self.collapse(frame)] += 1
+                del frames
+
+
+sampler = StackSampler(interval=getattr(settings, 'PROFILING_INTERVAL_MS', 5) / 1000)
+
+
+def _slug(method, route):
+    return re.sub(r'[^a-z0-9]+', '-', f'{method} {route}'.lower()).strip('-')[:80] or 'unknown'
+
+
+def save_profile(stacks, meta, directory=None):
+    """
+    Write one collapsed-stack profile and its metadata sidecar; returns the profile name
+    """
+    directory = directory or get_profile_dir()
+    os.makedirs(directory, exist_ok=True)
+    stamp = datetime.now(dt_timezone.utc).strftime('%Y%m%dT%H%M%S%fZ')
+    name = f"{stamp}-{_slug(meta['method'], meta['route'])}-{uuid.uuid4().hex[:8]}"
+    with open(os.path.join(directory, f'{name}.collapsed'), 'w', encoding='utf-8') as fh:
+        for stack, count in stacks.most_common():
+            fh.write(f'{stack} {count}\n')
+    meta = {**meta, 'name': name, 'samples': sum(stacks.values()), 'created_at': datetime.now(dt_timezone.utc).isoformat()}
+    with open(os.path.join(directory, f'{name}.json'), 'w', encoding='utf-8') as fh:
+        json.dump(meta, fh)
+    rotate_profiles(directory, getattr(settings, 'PROFILING_MAX_FILES', 200))
+    return name
+
+
+def rotate_profiles(directory, max_files):
+    names = sorted(entry[:-5] for entry in os.listdir(directory) if entry.endswith('.json'))
+    for name in names[:max(0, len(names) - max_files)]:
+        for suffix in ('.json', '.collapsed'):
+            try:
+                os.remove(os.path.join(directory, name + suffix))
+            except FileNotFoundError:
+                pass
+
+
+def list_profiles(route=None, limit=100, directory=None):
+    """
+    Metadata of stored profiles, newest first, optionally for one route
+    """
+    directory = directory or get_profile_dir()
+    if not os.path.isdir(directory):
+        return []
+    profiles = []
+    for entry in sorted(os.listdir(directory), reverse=True):
+        if not entry.endswith('.json'):
+            continue
+        try:
+            with open(os.path.join(directory, entry), encoding='utf-8') as fh:
+                meta = json.load(fh)
+        except (OSError, ValueError):
+            continue
+        if route and meta.get('route') != route:
+            continue
+        profiles.append(meta)
+        if len(profiles) >= limit:
+            break
+    return profiles
+
+
+def profile_path(name, directory=None):
+    """
+    Path of a stored collapsed profile, or None for unknown or malformed names
+    """
+    if not PROFILE_NAME.match(name):
+        return None
+    path = os.path.join(directory or get_profile_dir(), f'{name}.collapsed')
+    return path if os.path.isfile(path) else None
+
+
+class ProfilingMiddleware:
+    def __init__(self, get_response):
+        self.sample_rate = getattr(settings, 'PROFILING_SAMPLE_RATE', 0.0)
+        self.slow_ms = getattr(settings, 'PROFILING_SLOW_MS', 0)
+        if not getattr(settings, 'PROFILING_ENABLED', False) or (self.sample_rate <= 0 and not self.slow_ms):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        sampled = self.sample_rate > 0 and random.random() < self.sample_rate
+        if not sampled and not self.slow_ms:
+            return self.get_response(request)
+
+        started = time.perf_counter()
+        sampler.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            stacks = sampler.stop()
+        duration_ms = (time.perf_counter() - started) * 1000
+
+        slow = bool(self.slow_ms) and duration_ms >= self.slow_ms
+        if stacks and (sampled or slow):
+            try:
+                save_profile(stacks, {
+                    'method': request.method,
+                    'route': route_for(request),
+                    'path': request.path,
+                    'status': response.status_code,
+                    'duration_ms': round(duration_ms, 1),
+                    'reason': 'slow' if slow else 'sampled',
+                })
+            except OSError as e:
+                logger.warning('Could not write request profile: %s', e)
+        return response
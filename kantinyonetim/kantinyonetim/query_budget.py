@@ -0,0 +1,146 @@
+"""
+Query budgets for the test suite.
+
+Every API ViewSet declares `query_budgets`, the most SQL queries one request to
+each of its actions may issue (authentication and throttling included), sized
+so it holds no matter how many rows a list returns. Tests enforce them with
+
+    with query_budget(4):
+        self.client.get('/api/stock/')
+
+    with self.assertActionBudget(StockViewSet, 'list'):
+        self.client.get('/api/stock/')
+
+    self.assertRequestWithinBudget(StockViewSet, 'list', 'get', '/api/stock/')
+
+or `@query_budget(4)` on a test method. Going over budget fails with every
+captured query, repeated shapes first, each with the project frames that
+issued it.
+"""
+import traceback
+from collections import Counter
+from contextlib import ContextDecorator
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connections
+
+# standard ModelViewSet actions, in addition to each ViewSet's @action methods
+MODEL_ACTIONS = ('list', 'create', 'retrieve', 'update', 'partial_update', 'destroy')
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def _project_frames(stack):
+    root = str(settings.BASE_DIR)
+    return [
+        frame for frame in stack
+        if frame.filename.startswith(root) and 'site-packages' not in frame.filename
+        and not frame.filename.endswith(('query_budget.py', 'instrumentation.py'))
+    ]
+
+
+class CapturedQuery:
+    __slots__ = ('sql', 'params', 'frames')
+
+    def __init__(self, sql, params, frames):
+        self.sql = sql
+        self.params = params
+        self.frames = frames
+
+
+class query_budget(ContextDecorator):
+    """
+    Fail when the block issues more than max_queries queries on `using`
+    """
+
+    def __init__(self, max_queries, using='default', label=None):
+        self.max_queries = max_queries
+        self.using = using
+        self.label = label
+        self.queries = []
+
+    def _capture(self, execute, sql, params, many, context):
+        self.queries.append(CapturedQuery(sql, params, _project_frames(traceback.extract_stack()[:-1])))
+        return execute(sql, params, many, context)
+
+    def __enter__(self):
+        self.queries = []
+        self._wrapper = connections[self.using].execute_wrapper(self._capture)
+        self._wrapper.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._wrapper.__exit__(exc_type, exc, tb)
+        if exc_type is None and len(self.queries) > self.max_queries:
+            raise QueryBudgetExceeded(self.report())
+        return False
+
+    def report(self):
+        label = f'{self.label}: ' if self.label else ''
+        lines = [f'{label}{len(self.queries)} queries, budget {self.max_queries}.']
+        shapes = Counter(query.sql for query in self.queries)
+        # repeated shapes (likely N+1) first
+        order = sorted(range(len(self.queries)), key=lambda i: (-shapes[self.queries[i].sql], i))
+        seen = set()
+        for i in order:
+            query = self.queries[i]
+            if query.sql in seen:
+                continue
+            seen.add(query.sql)
+            lines.append('')
+            lines.append(f'{shapes[query.sql]}x {query.sql}')
+            for frame in query.frames[-6:]:
+                lines.append(f'    {frame.filename}:{frame.lineno} in {frame.name}')
+                if frame.line:
+                    lines.append(f'        {frame.line}')
+        return '\n'.join(lines)
+
+
+def budget_for(viewset, action):
+    budgets = getattr(viewset, 'query_budgets', None) or {}
+    if action not in budgets:
+        raise ImproperlyConfigured(f'{viewset.__name__}.query_budgets has no entry for {action!r}')
+    return budgets[action]
+
+
+def viewset_actions(viewset):
+    """
+    Every action name a ViewSet routes: the ModelViewSet ones it implements plus its @action methods
+    """
+    actions = [name for name in MODEL_ACTIONS if hasattr(viewset, name)]
+    return actions + [method.__name__ for method in viewset.get_extra_actions()]
+
+
+def missing_budgets(viewset):
+    budgets = getattr(viewset, 'query_budgets', None) or {}
+    return [action for action in viewset_actions(viewset) if action not in budgets]
+
+
+class QueryBudgetMixin:
+    """
+    TestCase mixin: assertQueryBudget(n) and assertActionBudget(ViewSet, action) context managers
+    """
+
+    def assertQueryBudget(self, max_queries, using='default', label=None):
+        return query_budget(max_queries, using=using, label=label)
+
+    def assertActionBudget(self, viewset, action, using='default'):
+        return query_budget(budget_for(viewset, action), using=using, label=f'{viewset.__name__}.{action}')
+
+    def assertRequestWithinBudget(self, viewset, action, method, path, data=None, format='json'):
+        """
+        Send one request with self.client under the action's budget and expect a non-error response.
+        The JWT user cache is cleared first so the budget covers a cold authentication.
+        """
+        from apps.users.authentication import user_cache
+        user_cache.clear()
+        response = None
+        with self.subTest(action=action):
+            with self.assertActionBudget(viewset, action):
+                response = getattr(self.client, method)(path, data, format=format)
+                if getattr(response, 'streaming', False):
+                    b''.join(response.streaming_content)
+            self.assertLess(response.status_code, 400, getattr(response, 'data', None))
+        return response
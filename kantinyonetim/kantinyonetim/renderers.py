@@ -0,0 +1,49 @@
+"""
+JSON renderer backed by orjson when it is installed.
+
+orjson encodes the serializer output several times faster than the stdlib
+json module. Values it does not handle itself (Decimal, datetimes, lazy
+strings) go through DRF's JSONEncoder, so the output decodes to the same JSON
+as JSONRenderer's; it is not byte-identical (orjson writes 1e16, not 1e+16).
+Data orjson cannot encode as JSONRenderer would (integers beyond 64 bits, and
+NaN/inf, which orjson writes as null) is rendered by JSONRenderer itself.
+"""
+import math
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # optional; without it the stdlib encoder is used
+    orjson = None
+
+
+class FastJSONRenderer(JSONRenderer):
+    def __init__(self):
+        self._default = JSONEncoder().default
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None:
+            return super().render(data, accepted_media_type, renderer_context)
+        if self.get_indent(accepted_media_type, renderer_context or {}):
+            # orjson only indents by 2 spaces
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            # datetimes go through the encoder so they keep DRF's 'Z' suffix format
+            rendered = orjson.dumps(data, default=self._default, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME)
+        except TypeError:  # orjson.JSONEncodeError, e.g. an int outside 64 bits
+            return super().render(data, accepted_media_type, renderer_context)
+        # only a payload with nulls can hide a NaN/inf that JSONRenderer would reject (or keep)
+        if b'null' in rendered and _has_non_finite(data):
+            return super().render(data, accepted_media_type, renderer_context)
+        return rendered
+
+
+def _has_non_finite(value):
+    if isinstance(value, float):
+        return not math.isfinite(value)
+    if isinstance(value, dict):
+        return any(_has_non_finite(item) for item in value.values())
+    if isinstance(value, (list, tuple)):
+        return any(_has_non_finite(item) for item in value)
+    return False
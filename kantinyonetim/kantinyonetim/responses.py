@@ -0,0 +1,114 @@
+"""
+Response pipeline: compression, Cache-Control/Vary policies and cheap ETags.
+
+CompressionMiddleware gzips bodies of at least RESPONSE_COMPRESSION_MIN_BYTES.
+CachePolicyMixin gives each DRF ViewSet a `cache_policy` (public for the menu,
+private everywhere else) and, for ViewSets that set `etag_field`, a weak list
+ETag built from the row count and the maximum of each listed field. Lists whose
+serializers read related rows (menu item names on stock, usernames on orders)
+list those rows' timestamps too. A matching If-None-Match is answered with 304
+before the list query runs.
+"""
+import hashlib
+from django.conf import settings
+from django.db.models import Count, Max
+from django.middleware.gzip import GZipMiddleware
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.http import parse_etags
+from rest_framework import status
+from rest_framework.response import Response
+
+# the same for everyone, so shared caches may keep it; everything else is per user and revalidated by ETag
+PUBLIC = {'public': True, 'max_age': getattr(settings, 'MENU_CACHE_MAX_AGE', 60)}
+PRIVATE = {'private': True, 'no_cache': True}
+
+
+class CompressionMiddleware(GZipMiddleware):
+    """
+    GZipMiddleware with a configurable size threshold; small bodies are not worth the CPU
+    """
+
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        self.min_length = getattr(settings, 'RESPONSE_COMPRESSION_MIN_BYTES', 1024)
+
+    def process_response(self, request, response):
+        if not response.streaming and len(response.content) < self.min_length:
+            return response
+        return super().process_response(request, response)
+
+
+def etag_matches(request, etag):
+    """
+    If-None-Match check with weak comparison (RFC 9110 13.1.2)
+    """
+    header = request.headers.get('If-None-Match')
+    if not header or not etag:
+        return False
+    tags = parse_etags(header)
+    return '*' in tags or etag.removeprefix('W/') in {tag.removeprefix('W/') for tag in tags}
+
+
+def queryset_etag(request, queryset, fields, per_user=True):
+    """
+    Weak ETag for a list: one aggregate query for the row count and max() of each
+    field (a name or a tuple of names, related lookups allowed), scoped to the
+    request's path and media type (and user, for per-user lists)
+    """
+    if isinstance(fields, str):
+        fields = (fields,)
+    # related lookups through reverse relations join several rows per list row
+    aggregates = {f'latest_{i}': Max(field) for i, field in enumerate(fields)}
+    stats = queryset.order_by().aggregate(count=Count('pk', distinct=True), **aggregates)
+    parts = [
+        request.get_full_path(),
+        str(getattr(request.user, 'pk', None)) if per_user else '',
+        getattr(request, 'accepted_media_type', '') or '',
+        str(stats['count']),
+    ]
+    for name in aggregates:
+        parts.append(stats[name].isoformat() if stats[name] is not None else '')
+    digest = hashlib.md5('|'.join(parts).encode(), usedforsecurity=False).hexdigest()
+    return f'W/"{digest}"'
+
+
+def not_modified(etag):
+    response = Response(status=status.HTTP_304_NOT_MODIFIED)
+    response['ETag'] = etag
+    return response
+
+
+class CachePolicyMixin:
+    """
+    DRF ViewSet mixin: Cache-Control/Vary on GET responses and 304s for matching ETags
+    """
+
+    cache_policy = PRIVATE
+    # field (or tuple of fields) whose max() feeds the weak list ETag, e.g. 'updated_at'; None disables it.
+    # include the timestamps of related rows the serializer reads, or edits to them never change the ETag
+    etag_field = None
+
+    def list(self, request, *args, **kwargs):
+        if self.etag_field is None:
+            return super().list(request, *args, **kwargs)
+        queryset = self.filter_queryset(self.get_queryset())
+        etag = queryset_etag(request, queryset, self.etag_field, per_user=bool(self.cache_policy.get('private')))
+        if etag_matches(request, etag):
+            return not_modified(etag)
+        response = super().list(request, *args, **kwargs)
+        response['ETag'] = etag
+        return response
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if request.method not in ('GET', 'HEAD'):
+            return response
+        if response.status_code == status.HTTP_200_OK and etag_matches(request, response.get('ETag')):
+            # detail ETags set by the view (e.g. order versions) get the same 304 treatment
+            response.status_code = status.HTTP_304_NOT_MODIFIED
+            response.data = None
+        if response.status_code in (status.HTTP_200_OK, status.HTTP_304_NOT_MODIFIED):
+            patch_cache_control(response, **self.cache_policy)
+            # one url serves different users and formats (json / browsable api)
+            patch_vary_headers(response, ('Accept', 'Authorization') if self.cache_policy.get('private') else ('Accept',))
+        return response
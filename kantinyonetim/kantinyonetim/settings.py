@@ -26,9 +26,10 @@ SECRET_KEY = os.getenv('SECRET_KEY')
 # SECURITY WARNING: keep the secret key used in production secret!
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+# DEBUG also makes Django keep every executed query in memory, so production sets DEBUG=False.
+DEBUG = os.getenv('DEBUG', 'True').lower() in ('1', 'true', 'yes')
 
-ALLOWED_HOSTS = ['*']
+ALLOWED_HOSTS = os.getenv('ALLOWED_HOSTS', '*').split(',')
 
 
 # Application definition
@@ -46,6 +47,8 @@ INSTALLED_APPS = [
     'apps.users',
     'apps.stock',
     'apps.webui',
+    'apps.analytics',
+    'apps.sync',
     'rest_framework',
     'django_extensions',
     'rest_framework_simplejwt',
@@ -60,12 +63,41 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'apps.users.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
     ),
+    # orjson when installed, DRF's encoder otherwise
+    'DEFAULT_RENDERER_CLASSES': (
+        'kantinyonetim.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+}
+
+# Token bucket limits per throttle scope (apps/users/throttling.py). 'user' is a bucket per
+# user (or client IP), 'endpoint' is shared by everyone hitting the scope.
+RATE_LIMITS = {
+    'order_create': {
+        'user': os.getenv('RATE_LIMIT_ORDER_USER', '10/min'),
+        'endpoint': os.getenv('RATE_LIMIT_ORDER_ENDPOINT', '600/min'),
+    },
+    'voice_order': {
+        'user': os.getenv('RATE_LIMIT_VOICE_USER', '5/min'),
+        'endpoint': os.getenv('RATE_LIMIT_VOICE_ENDPOINT', '60/min'),
+    },
 }
+# 'local' keeps buckets in process memory; 'cache' shares them through CACHES['default']
+RATE_LIMIT_STORE = os.getenv('RATE_LIMIT_STORE', 'local')
+
+# Voice transcription admission control: concurrent transcriptions and queued requests
+# beyond which parse-voice-order is shed with 429.
+VOICE_MAX_CONCURRENT = int(os.getenv('VOICE_MAX_CONCURRENT', '1'))
+VOICE_MAX_WAITING = int(os.getenv('VOICE_MAX_WAITING', '4'))
+VOICE_WAIT_TIMEOUT_SECONDS = int(os.getenv('VOICE_WAIT_TIMEOUT_SECONDS', '30'))
+# Global load: while a process serves this many requests at once, voice requests are shed
+# first so cheap endpoints keep answering (0 disables; counted by InFlightMiddleware)
+VOICE_SHED_AT_IN_FLIGHT = int(os.getenv('VOICE_SHED_AT_IN_FLIGHT', '16'))
 
 from datetime import timedelta
 
@@ -75,8 +107,102 @@ SIMPLE_JWT = {
     'BLACKLIST_AFTER_ROTATION': True,
 }
 
+# Authenticated users are cached per process for AUTH_USER_CACHE_TTL seconds
+# (apps/users/authentication.py). With JWT_STATELESS_ROLE_CLAIMS the request user is built
+# from the token's role claim, so role changes apply on the next login; the token version and
+# is_active are still checked against the cached row. Logout and deactivation take effect at
+# once in the process that handled them and within AUTH_USER_CACHE_TTL in the others.
+AUTH_USER_CACHE_TTL = int(os.getenv('AUTH_USER_CACHE_TTL', '30'))
+AUTH_USER_CACHE_SIZE = int(os.getenv('AUTH_USER_CACHE_SIZE', '1024'))
+JWT_STATELESS_ROLE_CLAIMS = os.getenv('JWT_STATELESS_ROLE_CLAIMS', 'False').lower() in ('1', 'true', 'yes')
+
+# User.last_activity is buffered in memory and bulk-written this often by a background thread
+# in each server process (GET /api/users/active/ flushes first)
+ACTIVITY_FLUSH_INTERVAL_SECONDS = int(os.getenv('ACTIVITY_FLUSH_INTERVAL_SECONDS', '60'))
+
+# Login brute-force protection (apps/users/login_guard.py): failures are counted per
+# username and per IP within LOGIN_FAILURE_WINDOW_SECONDS; crossing a limit locks it out
+LOGIN_MAX_FAILURES = int(os.getenv('LOGIN_MAX_FAILURES', '5'))
+LOGIN_IP_MAX_FAILURES = int(os.getenv('LOGIN_IP_MAX_FAILURES', '20'))
+LOGIN_FAILURE_WINDOW_SECONDS = int(os.getenv('LOGIN_FAILURE_WINDOW_SECONDS', '900'))
+LOGIN_LOCKOUT_SECONDS = int(os.getenv('LOGIN_LOCKOUT_SECONDS', '900'))
+
+# User search (apps/users/search.py): 'auto' uses pg_trgm on PostgreSQL and an
+# in-memory prefix trie on SQLite; 'index' uses the lower(username) index only
+USER_SEARCH_BACKEND = os.getenv('USER_SEARCH_BACKEND', 'auto')
+USER_SEARCH_TRIE_TTL = int(os.getenv('USER_SEARCH_TRIE_TTL', '300'))
+
+# Audit log retention: `manage.py archive_audit_logs` moves rows older than
+# AUDIT_RETENTION_DAYS into monthly gzip JSONL files; /api/users/audit_logs/?archived=1 reads them back
+AUDIT_RETENTION_DAYS = int(os.getenv('AUDIT_RETENTION_DAYS', '90'))
+AUDIT_ARCHIVE_DIR = os.getenv('AUDIT_ARCHIVE_DIR', os.path.join(BASE_DIR, 'audit_archive'))
+# distinct user agents whose UserAgent id is kept in process (apps/users/user_agents.py)
+USER_AGENT_CACHE_SIZE = int(os.getenv('USER_AGENT_CACHE_SIZE', '512'))
+
+# `manage.py purge_notifications` deletes read notifications older than this many days
+NOTIFICATION_RETENTION_DAYS = int(os.getenv('NOTIFICATION_RETENTION_DAYS', '30'))
+
+# Menu image derivatives (apps/menu/images.py): WebP thumb/card/full written next to
+# the original by a background pool; MenuItemSerializer.image_srcset exposes them
+MENU_IMAGE_WORKERS = int(os.getenv('MENU_IMAGE_WORKERS', '2'))
+MENU_IMAGE_WEBP_QUALITY = int(os.getenv('MENU_IMAGE_WEBP_QUALITY', '80'))
+# populate_menu download cache (content-addressed, reused on reruns and with --offline)
+MENU_IMAGE_CACHE_DIR = os.getenv('MENU_IMAGE_CACHE_DIR', os.path.join(BASE_DIR, '.image_cache'))
+
+# Stale order expiry: minutes after placement (created_at) after which the sweeper cancels an
+# order still in that status, however recently it got there; a 'ready' TTL must leave room for
+# the time spent pending and preparing (0 disables a status). Run `manage.py expire_stale_orders` from cron, or set
+# ORDER_EXPIRY_INTERVAL_SECONDS to sweep from a background thread in each server (WSGI/ASGI) process.
+ORDER_EXPIRY_TTL_MINUTES = {
+    'pending': int(os.getenv('ORDER_EXPIRY_PENDING_MINUTES', '120')),
+    'preparing': int(os.getenv('ORDER_EXPIRY_PREPARING_MINUTES', '0')),
+    'ready': int(os.getenv('ORDER_EXPIRY_READY_MINUTES', '240')),
+}
+ORDER_EXPIRY_INTERVAL_SECONDS = int(os.getenv('ORDER_EXPIRY_INTERVAL_SECONDS', '0'))
+
+
+# Request instrumentation: Server-Timing header, per-route histograms served at /api/metrics/
+# (staff only, Prometheus text format) and a warning when one query shape repeats
+# INSTRUMENTATION_N_PLUS_ONE_THRESHOLD times in a request.
+INSTRUMENTATION_ENABLED = os.getenv('INSTRUMENTATION_ENABLED', 'True').lower() in ('1', 'true', 'yes')
+INSTRUMENTATION_SERVER_TIMING = os.getenv('INSTRUMENTATION_SERVER_TIMING', 'True').lower() in ('1', 'true', 'yes')
+INSTRUMENTATION_N_PLUS_ONE_THRESHOLD = int(os.getenv('INSTRUMENTATION_N_PLUS_ONE_THRESHOLD', '5'))
+INSTRUMENTATION_MAX_ROUTES = int(os.getenv('INSTRUMENTATION_MAX_ROUTES', '500'))
+
+# Sampling profiler (off by default): profile PROFILING_SAMPLE_RATE of requests plus any request
+# slower than PROFILING_SLOW_MS (0 = never). Collapsed-stack files go to PROFILING_DIR, newest
+# PROFILING_MAX_FILES kept, listed for staff at /api/profiles/.
+PROFILING_ENABLED = os.getenv('PROFILING_ENABLED', 'False').lower() in ('1', 'true', 'yes')
+PROFILING_SAMPLE_RATE = float(os.getenv('PROFILING_SAMPLE_RATE', '0.01'))
+PROFILING_SLOW_MS = int(os.getenv('PROFILING_SLOW_MS', '500'))
+PROFILING_INTERVAL_MS = float(os.getenv('PROFILING_INTERVAL_MS', '5'))
+PROFILING_DIR = os.getenv('PROFILING_DIR', os.path.join(BASE_DIR, 'profiles'))
+PROFILING_MAX_FILES = int(os.getenv('PROFILING_MAX_FILES', '200'))
+
+# Response pipeline (kantinyonetim/responses.py): bodies of at least RESPONSE_COMPRESSION_MIN_BYTES
+# are gzipped; the menu may be cached by shared caches for MENU_CACHE_MAX_AGE seconds, every
+# other API GET is private and revalidated with its ETag.
+RESPONSE_COMPRESSION_MIN_BYTES = int(os.getenv('RESPONSE_COMPRESSION_MIN_BYTES', '1024'))
+MENU_CACHE_MAX_AGE = int(os.getenv('MENU_CACHE_MAX_AGE', '60'))
+
+# Mobile sync (/api/sync/, apps/sync): deletions are kept as tombstones for SYNC_TOMBSTONE_DAYS
+# (`manage.py prune_sync_state`); an older change token gets a full snapshot, whose order history
+# covers SYNC_INITIAL_ORDER_DAYS. Stock is reported as out/low/available, low meaning at most
+# SYNC_LOW_STOCK_THRESHOLD units. Idempotency-Key responses are replayed for IDEMPOTENCY_KEY_TTL_HOURS.
+SYNC_TOMBSTONE_DAYS = int(os.getenv('SYNC_TOMBSTONE_DAYS', '30'))
+SYNC_INITIAL_ORDER_DAYS = int(os.getenv('SYNC_INITIAL_ORDER_DAYS', '30'))
+SYNC_LOW_STOCK_THRESHOLD = int(os.getenv('SYNC_LOW_STOCK_THRESHOLD', '5'))
+# how far each delta reaches back to catch rows committed after the previous sync; 0 derives it
+# from the database busy timeout and the retry_on_locked attempts (apps/sync/changes.token_overlap)
+SYNC_TOKEN_OVERLAP_SECONDS = int(os.getenv('SYNC_TOKEN_OVERLAP_SECONDS', '0'))
+IDEMPOTENCY_KEY_TTL_HOURS = int(os.getenv('IDEMPOTENCY_KEY_TTL_HOURS', '24'))
+
 
 MIDDLEWARE = [
+    'apps.users.throttling.InFlightMiddleware',
+    'kantinyonetim.instrumentation.InstrumentationMiddleware',
+    'kantinyonetim.profiling.ProfilingMiddleware',
+    'kantinyonetim.responses.CompressionMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -123,12 +249,45 @@ WSGI_APPLICATION = 'kantinyonetim.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# DB_ENGINE=sqlite (default) or postgresql. SQLite runs in WAL mode with a busy timeout
+# so readers do not block the single writer; PostgreSQL uses persistent connections
+# with health checks, or a psycopg connection pool when DB_POOL=True.
+DB_ENGINE = os.getenv('DB_ENGINE', 'sqlite')
+
+if DB_ENGINE == 'postgresql':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.getenv('DB_NAME', 'kantinyonetim'),
+            'USER': os.getenv('DB_USER', 'kantinyonetim'),
+            'PASSWORD': os.getenv('DB_PASSWORD', ''),
+            'HOST': os.getenv('DB_HOST', 'localhost'),
+            'PORT': os.getenv('DB_PORT', '5432'),
+            'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', '600')),
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {},
+        }
+    }
+    if os.getenv('DB_POOL', 'False').lower() in ('1', 'true', 'yes'):
+        # Django'nun psycopg pool destegi kalici baglantilarla birlikte kullanilamiyor
+        DATABASES['default']['CONN_MAX_AGE'] = 0
+        DATABASES['default']['OPTIONS']['pool'] = {
+            'min_size': int(os.getenv('DB_POOL_MIN_SIZE', '2')),
+            'max_size': int(os.getenv('DB_POOL_MAX_SIZE', '10')),
+            'timeout': int(os.getenv('DB_POOL_TIMEOUT', '10')),
+        }
+else:
+    DATABASES = {
+        'default': {
+            # sqlite3 + WAL, busy_timeout, synchronous=NORMAL and BEGIN IMMEDIATE write transactions
+            'ENGINE': 'kantinyonetim.db.sqlite_wal',
+            'NAME': os.getenv('DB_NAME', BASE_DIR / 'db.sqlite3'),
+            'OPTIONS': {
+                # seconds to wait on a locked database (busy_timeout)
+                'timeout': int(os.getenv('SQLITE_BUSY_TIMEOUT', '20')),
+            },
+        }
     }
-}
 
 AUTH_USER_MODEL = 'users.User'
 # Password validation
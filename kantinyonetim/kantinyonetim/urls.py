@@ -25,6 +25,8 @@ urlpatterns = [
     path('api/', include('apps.orders.urls')),
     path('api/', include('apps.stock.urls')),
     path('api/', include('apps.users.urls')),
+    path('api/', include('apps.analytics.urls')),
+    path('api/', include('apps.sync.urls')),
     path('', include('apps.webui.urls')),
     path('api/token/', CustomTokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
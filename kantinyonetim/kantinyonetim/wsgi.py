@@ -14,3 +14,10 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'kantinyonetim.settings')
 
 application = get_wsgi_application()
+
+# background work runs only in server processes, never in migrate/shell/test
+from apps.orders.expiry import start_expiry_scheduler  # noqa: E402
+from apps.users.activity import start_activity_flusher  # noqa: E402
+
+start_expiry_scheduler()
+start_activity_flusher()